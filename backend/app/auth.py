@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Who a request is made by, as resolved from its bearer token
+Principal = namedtuple('Principal', ['user_id', 'role'])
+
+
+class TokenCache:
+    """Bounded LRU of verified bearer tokens.
+
+    A token's signature and claims never change, so once it has been verified
+    the result (typically a Principal) can be reused until the token's ``exp``.
+    Entries are also re-verified after ``max_ttl`` seconds, so changes to what
+    ``load`` returns (such as a user's role) are picked up within that time.
+    """
+
+    def __init__(self, decode, maxsize=4096, max_ttl=3600):
+        self.decode = decode  # token -> verified claims, raising on invalid tokens
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # token -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token, load):
+        """Value for a token, calling load(claims) after verifying it on a miss.
+
+        Whatever ``decode`` raises for a token that fails verification propagates;
+        load may return None to reject a token, which is then not cached.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[token]
+            self.misses += 1
+
+        claims = self.decode(token)
+        value = load(claims)
+        if value is None:
+            return None
+
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._lock:
+            self._entries[token] = (expires_at, value)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate_user(self, user_id):
+        """Forget every cached token resolved for a user (e.g. after a role change)"""
+        with self._lock:
+            for token in [token for token, (_, value) in self._entries.items()
+                          if getattr(value, 'user_id', None) == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URI = 'sqlite:///quizgenix.db'
+
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def _env_int(environ, name, default):
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer, got {value!r}') from None
+
+
+def _env_choice(environ, name, default, choices):
+    # Validated here because the value is interpolated into a PRAGMA statement
+    value = (environ.get(name) or default).strip().upper()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, got {environ.get(name)!r}")
+    return value
+
+
+def database_config(environ=None):
+    """Build the SQLAlchemy settings for the app from environment variables.
+
+    SQLALCHEMY_DATABASE_URI (or DATABASE_URL) selects the database, so the same
+    code runs on the local SQLite file or on Postgres for multi-node deployments.
+    Raises ValueError for a malformed integer or an unknown SQLite mode.
+    """
+    environ = os.environ if environ is None else environ
+    uri = environ.get('SQLALCHEMY_DATABASE_URI') or environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+
+    is_sqlite = uri.startswith('sqlite')
+    in_memory = is_sqlite and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)
+
+    engine_options = {'pool_pre_ping': not is_sqlite}
+    if not in_memory:
+        engine_options.update({
+            'pool_size': _env_int(environ, 'DB_POOL_SIZE', 10),
+            'max_overflow': _env_int(environ, 'DB_MAX_OVERFLOW', 20),
+            'pool_timeout': _env_int(environ, 'DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _env_int(environ, 'DB_POOL_RECYCLE', 1800),
+        })
+    if is_sqlite:
+        # Pooled SQLite connections are shared across request threads
+        engine_options['connect_args'] = {'check_same_thread': False}
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+        'SQLITE_PRAGMAS': {
+            'journal_mode': _env_choice(environ, 'SQLITE_JOURNAL_MODE', 'WAL', SQLITE_JOURNAL_MODES),
+            'synchronous': _env_choice(environ, 'SQLITE_SYNCHRONOUS', 'NORMAL', SQLITE_SYNCHRONOUS_LEVELS),
+            'busy_timeout': _env_int(environ, 'SQLITE_BUSY_TIMEOUT_MS', 5000),
+            'mmap_size': _env_int(environ, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        },
+    }
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Apply the PRAGMAs to every new SQLite connection the engine opens"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout first so that switching journal mode waits for other writers
+            cursor.execute(f"PRAGMA busy_timeout={int(pragmas['busy_timeout'])}")
+            cursor.execute(f"PRAGMA journal_mode={pragmas['journal_mode']}")
+            cursor.execute(f"PRAGMA synchronous={pragmas['synchronous']}")
+            cursor.execute(f"PRAGMA mmap_size={int(pragmas['mmap_size'])}")
+        finally:
+            cursor.close()
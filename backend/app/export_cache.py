@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def export_cache_key(quiz_id, content_hash, fmt, template_version):
+    """Cache key (also used as the ETag) for one rendered export"""
+    raw = f'{quiz_id}:{content_hash}:{fmt}:{template_version}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ExportCache:
+    """Two-tier cache of rendered export documents.
+
+    Small documents stay in a bounded in-memory LRU; every document is also
+    written to a disk directory whose total size is capped by evicting the
+    least recently used files. Concurrent misses for the same key render once.
+    """
+
+    def __init__(self, directory, memory_items=64, memory_bytes=32 * 1024 * 1024,
+                 disk_bytes=512 * 1024 * 1024, max_memory_item_bytes=2 * 1024 * 1024):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_memory_item_bytes = max_memory_item_bytes
+
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        entries = []
+        for name in (os.listdir(directory) if os.path.isdir(directory) else ()):
+            path = os.path.join(directory, name)
+            if name.endswith('.bin') and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len('.bin')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.bin')
+
+    def get(self, key):
+        """Return ('memory', bytes), ('disk', path) or None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return 'memory', data
+            if key in self._disk:
+                self._disk.move_to_end(key)
+
+        path = self.path(key)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                if key not in self._disk:
+                    size = os.path.getsize(path)
+                    self._disk[key] = size
+                    self._disk_size += size
+                self.hits += 1
+            return 'disk', path
+
+        with self._lock:
+            if self._disk.pop(key, None) is not None:
+                self._disk_size = sum(self._disk.values())
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """Store rendered bytes in both tiers"""
+        self.put_rendered(key, lambda f: f.write(data))
+
+    def put_rendered(self, key, write):
+        """Store a document produced by ``write(fileobj)`` and return its cache entry.
+
+        The document is written straight to a temporary file in the cache
+        directory, so large exports never have to be held in memory; it is only
+        read back into the memory tier if it is small enough.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        size = os.path.getsize(self.path(key))
+
+        data = None
+        if size <= self.max_memory_item_bytes:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+
+        evicted = []
+        with self._lock:
+            self._disk_size += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_size -= old_size
+                evicted.append(old_key)
+
+            if data is not None:
+                self._memory_size += size - len(self._memory.pop(key, b''))
+                self._memory[key] = data
+                while self._memory and (len(self._memory) > self.memory_items
+                                        or self._memory_size > self.memory_bytes):
+                    _, old = self._memory.popitem(last=False)
+                    self._memory_size -= len(old)
+
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except FileNotFoundError:
+                pass
+
+        return ('memory', data) if data is not None else ('disk', self.path(key))
+
+    def get_or_render(self, key, render):
+        """Cached entry for key, rendering it with ``render(fileobj)`` on a miss"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                # Another request may have rendered it while we waited
+                with self._lock:
+                    data = self._memory.get(key)
+                if data is not None or os.path.exists(self.path(key)):
+                    cached = self.get(key)
+                    if cached is not None:
+                        return cached
+                return self.put_rendered(key, render)
+        finally:
+            with self._lock:
+                self._render_locks.pop(key, None)
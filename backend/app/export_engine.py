@@ -0,0 +1,341 @@
+import atexit
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from optional_imports import OPTIONAL_IMPORTS
+
+# Exporter dependencies are imported the first time a document is rendered;
+# FPDF_AVAILABLE, DOCX_AVAILABLE and XLSX_AVAILABLE are resolved on access.
+AVAILABILITY_FLAGS = {'FPDF_AVAILABLE': 'fpdf', 'DOCX_AVAILABLE': 'docx', 'XLSX_AVAILABLE': 'openpyxl'}
+
+
+def __getattr__(name):
+    if name in AVAILABILITY_FLAGS:
+        return OPTIONAL_IMPORTS.available(AVAILABILITY_FLAGS[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# What every format renders. ``questions`` is any iterable (possibly a generator)
+# of {'question', 'options', 'correct_answer', 'explanation'} dicts. correct_answer
+# is an option index, or the raw answer text when it names none of the options.
+ExportDocument = namedtuple('ExportDocument', ['title', 'subject', 'topic', 'difficulty', 'questions'])
+
+
+class ExportFormat:
+    """Base class for export format plugins.
+
+    ``setup()`` builds the layout state shared by every render (fonts, styles,
+    templates); it runs once per process, on first use, and its result is
+    passed to ``render(document, output, layout)``. ``requires`` names the
+    optional module the format needs (see optional_imports.py).
+    """
+
+    name = None
+    extension = None
+    mimetype = None
+    requires = None
+
+    @property
+    def available(self):
+        return self.requires is None or OPTIONAL_IMPORTS.available(self.requires)
+
+    def __init__(self):
+        self._layout = None
+        self._setup_lock = threading.Lock()
+
+    def setup(self):
+        return None
+
+    def layout(self):
+        if self._layout is None:
+            with self._setup_lock:
+                if self._layout is None:
+                    self._layout = self.setup() or {}
+        return self._layout
+
+    def render(self, document, output, layout):
+        raise NotImplementedError
+
+
+class ExportEngine:
+    """Registry of export formats, with streaming and managed-file output.
+
+    Temporary files are created in a private directory that is swept of
+    files older than ``temp_file_max_age`` seconds and removed at exit.
+    """
+
+    def __init__(self, temp_dir=None, temp_file_max_age=3600):
+        self._formats = {}
+        self._temp_dir = temp_dir
+        self._owns_temp_dir = temp_dir is None
+        self.temp_file_max_age = temp_file_max_age
+        self._temp_lock = threading.Lock()
+
+    def register(self, export_format):
+        """Register a format plugin instance (or class, so it can be used as a decorator)"""
+        instance = export_format() if isinstance(export_format, type) else export_format
+        self._formats[instance.name] = instance
+        return export_format
+
+    def formats(self):
+        return sorted(self._formats)
+
+    def supports(self, name):
+        return name in self._formats
+
+    def available(self, name):
+        return self.supports(name) and self._formats[name].available
+
+    def mimetype(self, name):
+        return self._formats[name].mimetype
+
+    def extension(self, name):
+        return self._formats[name].extension
+
+    def render(self, name, document, output):
+        """Stream a document into a writable binary file object"""
+        export_format = self._formats[name]
+        if not export_format.available:
+            raise RuntimeError(f'{name.upper()} generation not available')
+        export_format.render(document, output, export_format.layout())
+
+    def render_bytes(self, name, document):
+        output = io.BytesIO()
+        self.render(name, document, output)
+        return output.getvalue()
+
+    @property
+    def temp_dir(self):
+        with self._temp_lock:
+            if self._temp_dir is None:
+                self._temp_dir = tempfile.mkdtemp(prefix='quizgenix-exports-')
+                atexit.register(self.close)
+            os.makedirs(self._temp_dir, exist_ok=True)
+            return self._temp_dir
+
+    def render_to_file(self, name, document, filename=None):
+        """Render into the managed temp directory and return the file path"""
+        self.cleanup()
+        directory = self.temp_dir
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                self.render(name, document, f)
+            if filename is None:
+                path = tmp_path[:-len('.tmp')] + '.' + self.extension(name)
+            else:
+                path = os.path.join(directory, os.path.basename(filename))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def cleanup(self, max_age=None):
+        """Delete managed temp files older than max_age seconds (default temp_file_max_age)"""
+        if self._temp_dir is None or not os.path.isdir(self._temp_dir):
+            return 0
+        max_age = self.temp_file_max_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self._temp_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def close(self):
+        if self._owns_temp_dir and self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+
+def truncate(text, limit):
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+def option_marker(index, correct_answer):
+    return '[X]' if index == correct_answer else '[ ]'
+
+
+def answer_label(question):
+    """Letter of the correct option; the raw answer (or blank) when it names no option"""
+    correct_answer = question['correct_answer']
+    if type(correct_answer) is int:
+        return chr(65 + correct_answer) if 0 <= correct_answer < len(question['options']) else ''
+    return '' if correct_answer is None else str(correct_answer)
+
+
+class PdfFormat(ExportFormat):
+    name = 'pdf'
+    extension = 'pdf'
+    mimetype = 'application/pdf'
+    requires = 'fpdf'
+
+    def setup(self):
+        # Core font, so no font files are parsed or embedded per document
+        return {
+            'title': ('helvetica', 'B', 16),
+            'info': ('helvetica', '', 12),
+            'question': ('helvetica', 'B', 12),
+            'option': ('helvetica', '', 10),
+            'question_chars': 80,
+            'option_chars': 70
+        }
+
+    def render(self, document, output, layout):
+        pdf = OPTIONAL_IMPORTS.load('fpdf').FPDF()
+        pdf.add_page()
+        pdf.set_font(*layout['title'])
+        pdf.cell(0, 10, f'Quiz: {document.title}', 0, 1, 'C')
+
+        pdf.set_font(*layout['info'])
+        pdf.cell(0, 10, f'Subject: {document.subject}', 0, 1)
+        pdf.cell(0, 10, f'Topic: {document.topic}', 0, 1)
+        pdf.cell(0, 10, f'Difficulty: {document.difficulty}', 0, 1)
+        pdf.ln(5)
+
+        for i, q in enumerate(document.questions, 1):
+            pdf.set_font(*layout['question'])
+            pdf.cell(0, 10, f"Q{i}: {truncate(q['question'], layout['question_chars'])}", 0, 1)
+
+            pdf.set_font(*layout['option'])
+            for j, option in enumerate(q['options']):
+                marker = option_marker(j, q['correct_answer'])
+                pdf.cell(0, 6, f"  {marker} {chr(65+j)}) {truncate(option, layout['option_chars'])}", 0, 1)
+            pdf.ln(3)
+
+        pdf.output(output)
+
+
+# Characters that are not allowed anywhere in an XML 1.0 document
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+class DocxFormat(ExportFormat):
+    """Word documents built from a template package prepared once per process.
+
+    Opening python-docx's default template parses every part of the package
+    (styles alone are hundreds of KB of XML), which dominated the cost of a
+    small export. Instead the template is loaded once, its parts are kept as
+    bytes, and each render only writes the body paragraphs of
+    word/document.xml between the template's prefix and section properties.
+    """
+
+    name = 'docx'
+    extension = 'docx'
+    mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    requires = 'docx'
+
+    def setup(self):
+        template = OPTIONAL_IMPORTS.load('docx').Document()
+        title_style = template.styles['Title'].style_id
+        heading_style = template.styles['Heading 2'].style_id
+        package = io.BytesIO()
+        template.save(package)
+
+        parts = []
+        with zipfile.ZipFile(package) as archive:
+            for info in archive.infolist():
+                parts.append((info.filename, archive.read(info.filename)))
+
+        document_xml = dict(parts)['word/document.xml'].decode('utf-8')
+        body_start = document_xml.index('<w:body>') + len('<w:body>')
+        body_end = document_xml.index('<w:sectPr', body_start)
+        if document_xml[body_start:body_end].strip():
+            raise RuntimeError('DOCX template body is expected to be empty')
+
+        return {
+            'parts': parts,
+            'document_prefix': document_xml[:body_start].encode('utf-8'),
+            'document_suffix': document_xml[body_end:].encode('utf-8'),
+            'title_style': title_style,
+            'heading_style': heading_style
+        }
+
+    @staticmethod
+    def paragraph(text, style=None):
+        """One <w:p>; tabs and line breaks become <w:tab/> and <w:br/> like python-docx runs"""
+        properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+        pieces = []
+        for line_number, line in enumerate(INVALID_XML_CHARS.sub('', str(text)).replace('\r', '\n').split('\n')):
+            if line_number:
+                pieces.append('<w:br/>')
+            for tab_number, chunk in enumerate(line.split('\t')):
+                if tab_number:
+                    pieces.append('<w:tab/>')
+                if chunk:
+                    pieces.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+        return f'<w:p>{properties}<w:r>{"".join(pieces)}</w:r></w:p>'
+
+    def render(self, document, output, layout):
+        paragraph = self.paragraph
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for filename, data in layout['parts']:
+                if filename != 'word/document.xml':
+                    archive.writestr(filename, data)
+                    continue
+
+                with archive.open(filename, 'w') as body:
+                    body.write(layout['document_prefix'])
+                    header = [
+                        paragraph(f'Quiz: {document.title}', layout['title_style']),
+                        paragraph(f'Subject: {document.subject}'),
+                        paragraph(f'Topic: {document.topic}'),
+                        paragraph(f'Difficulty: {document.difficulty}')
+                    ]
+                    body.write(''.join(header).encode('utf-8'))
+
+                    for i, q in enumerate(document.questions, 1):
+                        chunk = [
+                            paragraph(f'Question {i}', layout['heading_style']),
+                            paragraph(q['question'])
+                        ]
+                        for j, option in enumerate(q['options']):
+                            chunk.append(paragraph(f"{option_marker(j, q['correct_answer'])} {chr(65+j)}) {option}"))
+                        chunk.append(paragraph(f"Explanation: {q.get('explanation', '')}"))
+                        body.write(''.join(chunk).encode('utf-8'))
+
+                    body.write(layout['document_suffix'])
+
+
+class XlsxFormat(ExportFormat):
+    name = 'xlsx'
+    extension = 'xlsx'
+    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    requires = 'openpyxl'
+
+    def setup(self):
+        return {
+            'header': ['Question_Number', 'Question', 'Option_A', 'Option_B', 'Option_C', 'Option_D',
+                       'Correct_Answer', 'Explanation']
+        }
+
+    def render(self, document, output, layout):
+        def rows():
+            for i, q in enumerate(document.questions, 1):
+                options = (list(q['options']) + [''] * 4)[:4]
+                yield [i, q['question'], *options, answer_label(q), q.get('explanation', '')]
+
+        # Streams rows into an openpyxl write-only workbook; xlsx_export imports
+        # openpyxl, so it is only loaded once a workbook is actually rendered
+        from xlsx_export import write_xlsx
+        write_xlsx(output, [(document.title, layout['header'], rows())])
+
+
+EXPORT_ENGINE = ExportEngine()
+EXPORT_ENGINE.register(PdfFormat)
+EXPORT_ENGINE.register(DocxFormat)
+EXPORT_ENGINE.register(XlsxFormat)
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+UNANSWERED = -1
+NO_KEY = -2  # a key entry no answer can match
+MAX_OPTION_INDEX = np.iinfo(np.int16).max
+
+
+def option_index(value):
+    """Integer option index for an answer value, or UNANSWERED.
+
+    Anything that compared equal to an integer index before (``1``, ``1.0``,
+    ``True``) maps to that index; anything else can never be correct.
+    """
+    if isinstance(value, (int, float)):
+        try:
+            index = int(value)
+        except (OverflowError, ValueError):
+            return UNANSWERED
+        if index == value and 0 <= index <= MAX_OPTION_INDEX:
+            return index
+    return UNANSWERED
+
+
+class AnswerKey:
+    """A quiz's answer key as a compact integer array.
+
+    Submissions ({question id: option index}, as stored in the ``answers``
+    JSON) are encoded into int16 rows aligned with the key, so grading one
+    submission or a whole batch is a single vectorised comparison.
+    """
+
+    def __init__(self, question_ids, correct_answers):
+        self.question_ids = tuple(str(question_id) for question_id in question_ids)
+        correct = [option_index(answer) for answer in correct_answers]
+        self.correct = np.array([NO_KEY if index == UNANSWERED else index for index in correct], dtype=np.int16)
+        self.correct.flags.writeable = False
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def encode(self, answers):
+        return self.encode_many([answers])[0]
+
+    def encode_many(self, submissions):
+        """int16 matrix with one row per submission and one column per key entry"""
+        question_ids = self.question_ids
+        cells = []
+        extend = cells.extend
+        count = 0
+        for count, answers in enumerate(submissions, 1):
+            # Plain in-range ints are by far the common case; None (unanswered) and
+            # anything unusual go through option_index
+            extend([value if type(value) is int and 0 <= value <= MAX_OPTION_INDEX else option_index(value)
+                    for value in map(answers.get, question_ids)])
+        return np.array(cells, dtype=np.int16).reshape(count, len(question_ids))
+
+    def grade(self, encoded):
+        """Boolean correctness mask for an encoded row or matrix"""
+        return encoded == self.correct
+
+    def score(self, answers):
+        """(score, per-question correctness mask) for one submission"""
+        correct = self.grade(self.encode(answers))
+        return int(correct.sum()), correct
+
+    def score_many(self, submissions):
+        """Scores for a batch of submissions, as an int array"""
+        return self.grade(self.encode_many(submissions)).sum(axis=1)
+
+
+class VersionedCache:
+    """Bounded LRU of one value per quiz, rebuilt when the quiz's version changes"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()  # quiz_id -> (version, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, quiz_id, version, build):
+        with self._lock:
+            entry = self._keys.get(quiz_id)
+            if entry is not None and entry[0] == version:
+                self._keys.move_to_end(quiz_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        key = build()
+        with self._lock:
+            self._keys[quiz_id] = (version, key)
+            self._keys.move_to_end(quiz_id)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+        return key
+
+    def invalidate(self, quiz_id):
+        with self._lock:
+            self._keys.pop(quiz_id, None)
+
+
+class AnswerKeyCache(VersionedCache):
+    """Answer keys per quiz, versioned by the quiz's content hash"""
@@ -0,0 +1,43 @@
+# Gunicorn settings for the API: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is loaded once in the master (preload_app) and forked into one
+# worker per core; each worker serves requests on a few threads. In-progress
+# quiz answers must be visible to every worker, so startup is refused with
+# SESSION_STORE=memory and more than one worker (see session_store.py).
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))  # bulk exports and batch generation are slow
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def on_starting(server):
+    """Create/upgrade the schema and run backfills once, before any worker starts"""
+    from main import db, init_db
+
+    app = server.app.wsgi()
+    if server.cfg.workers > 1 and app.config['SESSION_STORE'] == 'memory':
+        raise RuntimeError(
+            f"SESSION_STORE=memory keeps quiz answers inside one process and cannot serve "
+            f"{server.cfg.workers} workers; use SESSION_STORE=local-shared or WEB_CONCURRENCY=1"
+        )
+    with app.app_context():
+        init_db()
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Give each worker its own connections, pools and caches"""
+    from main import init_worker
+
+    init_worker(server.app.wsgi())
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Thresholds used to flag questions for review
+TOO_EASY_P_VALUE = 0.9
+TOO_HARD_P_VALUE = 0.2
+LOW_DISCRIMINATION = 0.2
+DEAD_DISTRACTOR_RATE = 0.05
+
+
+class ItemAnalysis:
+    """Classical item statistics over all attempts at a quiz.
+
+    Encoded answer matrices (one row per attempt, one int16 column per question,
+    see AnswerKey.encode_many) are folded in chunk by chunk, keeping only
+    per-question sums, so the whole answer matrix never has to be in memory:
+
+    * p-value: share of attempts answering the question correctly
+    * discrimination: point-biserial correlation between answering correctly and
+      the rest score (total score without that question)
+    * option selection rates, plus the share of attempts that left it unanswered
+    """
+
+    def __init__(self, key, option_counts):
+        self.key = key
+        self.option_counts = np.asarray(option_counts, dtype=np.int64)
+        if len(self.option_counts) != len(key):
+            raise ValueError('option_counts must have one entry per question')
+        # Column j's options occupy [offsets[j], offsets[j] + option_counts[j]) of
+        # the flat selection counts; the final slot collects unanswered/invalid cells
+        self._offsets = np.cumsum(self.option_counts) - self.option_counts
+        self._unanswered_slot = int(self.option_counts.sum())
+
+        self.attempt_count = 0
+        self.score_sum = 0
+        self.score_sq_sum = 0
+        self.correct_counts = np.zeros(len(key), dtype=np.int64)
+        self.correct_score_sums = np.zeros(len(key), dtype=np.int64)  # sum of total scores where correct
+        self.selection_counts = np.zeros(self._unanswered_slot + 1, dtype=np.int64)
+        self.unanswered_counts = np.zeros(len(key), dtype=np.int64)
+
+    def add(self, encoded):
+        """Fold in an encoded answer matrix"""
+        if not len(encoded):
+            return
+        correct = self.key.grade(encoded)
+        scores = correct.sum(axis=1, dtype=np.int64)
+
+        self.attempt_count += len(encoded)
+        self.score_sum += int(scores.sum())
+        self.score_sq_sum += int((scores * scores).sum())
+        self.correct_counts += correct.sum(axis=0)
+        self.correct_score_sums += scores @ correct
+
+        # Unanswered cells are negative; out-of-range indices count as unanswered too
+        valid = (encoded >= 0) & (encoded < self.option_counts)
+        slots = np.where(valid, encoded + self._offsets, self._unanswered_slot)
+        self.selection_counts += np.bincount(slots.ravel(), minlength=len(self.selection_counts))
+        self.unanswered_counts += (~valid).sum(axis=0)
+
+    def _discrimination(self):
+        """Corrected point-biserial per question (NaN where a variance is zero)"""
+        n = self.attempt_count
+        x_sum = self.correct_counts.astype(np.float64)
+        # Rest score y = total - x, with x in {0, 1} so x*x == x
+        y_sum = self.score_sum - x_sum
+        y_sq_sum = self.score_sq_sum - 2 * self.correct_score_sums + x_sum
+        xy_sum = self.correct_score_sums - x_sum
+
+        covariance = n * xy_sum - x_sum * y_sum
+        x_spread = n * x_sum - x_sum * x_sum
+        y_spread = n * y_sq_sum - y_sum * y_sum
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return covariance / np.sqrt(x_spread * y_spread)
+
+    def _reliability(self, p_values):
+        """KR-20 internal consistency, or None when it is undefined"""
+        k = len(self.key)
+        n = self.attempt_count
+        variance = self.score_sq_sum / n - (self.score_sum / n) ** 2
+        if k < 2 or variance <= 0:
+            return None
+        return round(float(k / (k - 1) * (1 - (p_values * (1 - p_values)).sum() / variance)), 3)
+
+    def result(self):
+        """JSON-ready summary with one entry per question, in key order"""
+        n = self.attempt_count
+        if not n:
+            return {'attempt_count': 0, 'mean_score': None, 'reliability_kr20': None, 'questions': []}
+
+        p_values = self.correct_counts / n
+        discrimination = self._discrimination()
+        selection_rates = self.selection_counts / n
+
+        questions = []
+        for j, question_id in enumerate(self.key.question_ids):
+            correct_option = int(self.key.correct[j])
+            start = self._offsets[j]
+            options = []
+            for option in range(int(self.option_counts[j])):
+                rate = float(selection_rates[start + option])
+                options.append({
+                    'option': option,
+                    'label': chr(65 + option) if option < 26 else str(option),
+                    'count': int(self.selection_counts[start + option]),
+                    'selection_rate': round(rate, 3),
+                    'is_correct': option == correct_option,
+                    'dead_distractor': option != correct_option and rate < DEAD_DISTRACTOR_RATE
+                })
+
+            p_value = float(p_values[j])
+            r = float(discrimination[j])
+            r = None if np.isnan(r) else round(r, 3)
+            flags = []
+            if p_value > TOO_EASY_P_VALUE:
+                flags.append('too_easy')
+            elif p_value < TOO_HARD_P_VALUE:
+                flags.append('too_hard')
+            if r is not None and r < LOW_DISCRIMINATION:
+                flags.append('low_discrimination')
+            if any(option['dead_distractor'] for option in options):
+                flags.append('dead_distractors')
+
+            questions.append({
+                'question_id': int(question_id) if question_id.isdigit() else question_id,
+                'p_value': round(p_value, 3),
+                'discrimination': r,
+                'unanswered_rate': round(float(self.unanswered_counts[j] / n), 3),
+                'options': options,
+                'flags': flags
+            })
+
+        return {
+            'attempt_count': n,
+            'mean_score': round(self.score_sum / n, 2),
+            'reliability_kr20': self._reliability(p_values),
+            'questions': questions
+        }
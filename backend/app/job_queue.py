@@ -0,0 +1,222 @@
+import datetime
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger('quizgenix')
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueue:
+    """Background jobs persisted in the database and run on a local thread pool.
+
+    A job row moves pending -> running -> succeeded/failed. Workers claim a job
+    with a conditional UPDATE that records a claim id and a lease, so a job
+    resubmitted by recover() (or by another process) never runs twice. While a
+    job runs, a heartbeat thread keeps renewing its lease; only jobs whose
+    lease expired (their process died) are handed back to pending, and the
+    final status is written only if the claim is still ours.
+
+    Handlers are ``handler(payload, user_id)`` and return a JSON-serialisable
+    result; long handlers may call report_progress(). The queue can be created
+    without an app and bound later with init_app().
+    """
+
+    def __init__(self, app, db, job_model, workers=2, poll_interval=0.5, lease_seconds=60):
+        self.app = app
+        self.db = db
+        self.Job = job_model
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._handlers = {}
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._finished = threading.Condition()
+        self._current = threading.local()
+        self._claims = {}  # job_id -> claim id, for jobs running in this process
+        self._heartbeat_stop = None
+
+    def init_app(self, app, workers=None, lease_seconds=None):
+        """Bind to an app and start from a fresh pool (e.g. in a newly forked worker)"""
+        self.app = app
+        if workers is not None:
+            self.workers = workers
+        if lease_seconds is not None:
+            self.lease_seconds = lease_seconds
+        with self._executor_lock:
+            self._executor = None
+            self._claims = {}
+            if self._heartbeat_stop is not None:
+                self._heartbeat_stop.set()
+            self._heartbeat_stop = None
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def handler(self, kind):
+        """Decorator form of register()"""
+        def decorator(func):
+            self.register(kind, func)
+            return func
+        return decorator
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+                self._heartbeat_stop = threading.Event()
+                threading.Thread(target=self._heartbeat, args=(self._heartbeat_stop,),
+                                 name='job-heartbeat', daemon=True).start()
+            return self._executor
+
+    def _lease_deadline(self):
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.lease_seconds)
+
+    def _heartbeat(self, stop):
+        """Renew the leases of the jobs running in this process until stopped"""
+        while not stop.wait(self.lease_seconds / 3):
+            claims = list(self._claims.items())
+            if not claims:
+                continue
+            try:
+                with self.app.app_context():
+                    for job_id, claim in claims:
+                        self.db.session.execute(
+                            self.db.update(self.Job)
+                            .where(self.Job.id == job_id, self.Job.claimed_by == claim)
+                            .values(lease_expires_at=self._lease_deadline())
+                        )
+                    self.db.session.commit()
+            except Exception:
+                log.exception('job lease renewal failed')
+
+    def submit(self, kind, user_id, payload):
+        """Persist a pending job, schedule it and return its id"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = self.Job(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            kind=kind,
+            status=JOB_PENDING,
+            payload=json.dumps(payload)
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        self._pool().submit(self._run, job.id)
+        return job.id
+
+    def _run(self, job_id):
+        Job = self.Job
+        db = self.db
+        claim = uuid.uuid4().hex
+        with self.app.app_context():
+            claimed = db.session.execute(
+                db.update(Job)
+                .where(Job.id == job_id, Job.status == JOB_PENDING)
+                .values(status=JOB_RUNNING, started_at=datetime.datetime.utcnow(),
+                        claimed_by=claim, lease_expires_at=self._lease_deadline())
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(Job, job_id)
+            self._claims[job_id] = claim
+            self._current.job_id = job_id
+            try:
+                result = self._handlers[job.kind](json.loads(job.payload), job.user_id)
+                values = {'status': JOB_SUCCEEDED, 'result': json.dumps(result)}
+            except Exception as e:
+                log.exception('job failed', extra={'job_id': job_id, 'kind': job.kind})
+                db.session.rollback()
+                values = {'status': JOB_FAILED, 'error': str(e)}
+            finally:
+                self._current.job_id = None
+                self._claims.pop(job_id, None)
+
+            values['finished_at'] = datetime.datetime.utcnow()
+            recorded = db.session.execute(
+                db.update(Job).where(Job.id == job_id, Job.claimed_by == claim).values(**values)
+            ).rowcount
+            db.session.commit()
+            if not recorded:
+                log.warning('job lease lost, result discarded', extra={'job_id': job_id, 'kind': job.kind})
+
+        with self._finished:
+            self._finished.notify_all()
+
+    def report_progress(self, **progress):
+        """Record progress (any JSON-serialisable fields) on the job running in this thread.
+
+        Commits the current session, so call it between units of work. Does
+        nothing when called outside a job, e.g. from a CLI command.
+        """
+        job_id = getattr(self._current, 'job_id', None)
+        if job_id is None:
+            return
+        self.db.session.execute(
+            self.db.update(self.Job)
+            .where(self.Job.id == job_id, self.Job.claimed_by == self._claims.get(job_id))
+            .values(progress=json.dumps(progress), lease_expires_at=self._lease_deadline())
+        )
+        self.db.session.commit()
+
+    def wait(self, job_id, timeout):
+        """Long-poll: return the job once it has finished or ``timeout`` seconds passed.
+
+        Jobs finishing in this process wake waiters immediately; jobs run by
+        other processes are noticed by re-reading the row every poll_interval.
+        """
+        deadline = time.monotonic() + max(timeout, 0)
+        while True:
+            self.db.session.expire_all()
+            job = self.db.session.get(self.Job, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED_STATUSES or remaining <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(min(remaining, self.poll_interval))
+
+    def recover(self, retention=datetime.timedelta(days=1), on_purge=None):
+        """Reschedule jobs left over from a previous run and purge old finished jobs.
+
+        Running jobs are only reset once their lease has expired, so jobs that
+        another live process is still running (and renewing) are left alone.
+        """
+        Job = self.Job
+        db = self.db
+        now = datetime.datetime.utcnow()
+        lease = datetime.timedelta(seconds=self.lease_seconds)
+
+        db.session.execute(
+            db.update(Job)
+            .where(Job.status == JOB_RUNNING, db.or_(
+                Job.lease_expires_at < now,
+                # Rows claimed before leases existed
+                db.and_(Job.lease_expires_at.is_(None), Job.started_at < now - lease)
+            ))
+            .values(status=JOB_PENDING, started_at=None, claimed_by=None, lease_expires_at=None)
+        )
+        expired = db.session.query(Job).filter(
+            Job.status.in_(FINISHED_STATUSES), Job.finished_at < now - retention
+        ).all()
+        for job in expired:
+            if on_purge:
+                on_purge(job)
+            db.session.delete(job)
+        db.session.commit()
+
+        pending = [row.id for row in db.session.query(Job.id).filter(Job.status == JOB_PENDING).order_by(Job.created_at)]
+        for job_id in pending:
+            self._pool().submit(self._run, job_id)
+        return len(pending)
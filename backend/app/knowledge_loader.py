@@ -0,0 +1,124 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from knowledge_store import KnowledgeStore
+
+DEFAULT_KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_base')
+
+log = logging.getLogger('quizgenix')
+
+
+def read_jsonl_shard(path):
+    """Decode one topic file into {difficulty: [question, ...]}.
+
+    Each line is a JSON question with a ``difficulty`` field and, optionally,
+    a ``subtopic`` field (questions with a subtopic are grouped under it).
+    The file is read through a read-only memory map.
+    """
+    shard = {}
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return shard
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b''):
+                line = line.strip()
+                if not line:
+                    continue
+                question = json.loads(line)
+                difficulty = question.pop('difficulty')
+                subtopic = question.pop('subtopic', None)
+                if subtopic is None:
+                    shard.setdefault(difficulty, []).append(question)
+                else:
+                    shard.setdefault(difficulty, {}).setdefault(subtopic, []).append(question)
+    return shard
+
+
+class KnowledgeBaseLoader:
+    """Lazily loads knowledge-base topic files (``<topic_key>.jsonl``) on first use.
+
+    Decoded topics are kept in a bounded LRU of KnowledgeStore shards. A topic
+    is re-read when its file's mtime or size changes, checked at most once per
+    ``check_interval`` seconds, so content updates need no restart. A file that
+    fails to decode is logged and the topic keeps its last good content (or
+    has none) until the file changes again.
+    """
+
+    def __init__(self, directory=DEFAULT_KNOWLEDGE_BASE_DIR, max_shards=32, check_interval=2.0):
+        self.directory = directory
+        self.max_shards = max_shards
+        self.check_interval = check_interval
+        self._shards = OrderedDict()  # topic_key -> (signature, checked_at, store)
+        self._topic_keys = None  # (directory mtime, keys)
+        self._lock = threading.Lock()
+
+    def _path(self, topic_key):
+        return os.path.join(self.directory, f'{topic_key}.jsonl')
+
+    def topic_keys(self):
+        """Topic keys available on disk (listing is refreshed when the directory changes)"""
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cached = self._topic_keys
+        if cached is None or cached[0] != dir_mtime:
+            keys = sorted(name[:-len('.jsonl')] for name in os.listdir(self.directory) if name.endswith('.jsonl'))
+            self._topic_keys = cached = (dir_mtime, keys)
+        return list(cached[1])
+
+    def store(self, topic_key):
+        """KnowledgeStore for one topic, or None if there is no (readable) file for it"""
+        if not topic_key or os.sep in topic_key or topic_key.startswith('.'):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._shards.get(topic_key)
+            if entry is not None:
+                self._shards.move_to_end(topic_key)
+                signature, checked_at, store = entry
+                if now - checked_at < self.check_interval:
+                    return store
+
+        path = self._path(topic_key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._shards.pop(topic_key, None)
+            return None
+        current_signature = (stat.st_mtime_ns, stat.st_size)
+
+        if entry is not None and entry[0] == current_signature:
+            store = entry[2]
+        else:
+            try:
+                store = KnowledgeStore({topic_key: read_jsonl_shard(path)})
+            except (OSError, ValueError, KeyError, AttributeError, TypeError):
+                log.exception('knowledge base file unreadable', extra={'topic_key': topic_key, 'path': path})
+                store = entry[2] if entry is not None else None
+
+        with self._lock:
+            self._shards[topic_key] = (current_signature, now, store)
+            self._shards.move_to_end(topic_key)
+            while len(self._shards) > self.max_shards:
+                self._shards.popitem(last=False)
+        return store
+
+    # KnowledgeStore-compatible accessors used by the generators
+
+    def sample(self, topic_key, difficulty, count):
+        store = self.store(topic_key)
+        return store.sample(topic_key, difficulty, count) if store else []
+
+    def pool(self, topic_key, difficulty, subtopic):
+        store = self.store(topic_key) or EMPTY_STORE
+        return store.pool(topic_key, difficulty, subtopic)
+
+
+EMPTY_STORE = KnowledgeStore({})
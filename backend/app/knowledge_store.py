@@ -0,0 +1,134 @@
+import random
+import sys
+from collections import namedtuple
+
+KEYWORD_CACHE_SIZE = 4096
+
+StoredQuestion = namedtuple(
+    'StoredQuestion',
+    ['qid', 'question', 'options', 'correct', 'explanation', 'references', 'tokens']
+)
+
+
+def _freeze_question(qid, data):
+    question = sys.intern(data['question'])
+    return StoredQuestion(
+        qid=qid,
+        question=question,
+        options=tuple(sys.intern(option) for option in data['options']),
+        correct=data['correct'],
+        explanation=data['explanation'],
+        references=tuple(data.get('references', ())),
+        # Whitespace tokens: a keyword without spaces occurs in the lowercased
+        # question text exactly when it occurs inside one of these tokens
+        tokens=frozenset(question.lower().split())
+    )
+
+
+class QuestionPool:
+    """Ordered, read-only view over stored questions used to build one quiz"""
+
+    def __init__(self, store, questions):
+        self._store = store
+        self.questions = tuple(questions)
+        self._position = {q.qid: i for i, q in enumerate(self.questions)}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def pick(self, keywords, used_ids, rng=random):
+        """Pick the first unused question matching any keyword, else a random unused one.
+
+        Matching is an inverted-index lookup; the random fallback is a single
+        reservoir-sampling pass, so no candidate list is rebuilt per pick.
+        """
+        position = self._position
+        matched = [position[qid] for qid in self._store.matching_ids(keywords)
+                   if qid in position and qid not in used_ids]
+        if matched:
+            return self.questions[min(matched)]
+
+        selected = None
+        seen = 0
+        for question in self.questions:
+            if question.qid in used_ids:
+                continue
+            seen += 1
+            if rng.randrange(seen) == 0:
+                selected = question
+        return selected
+
+
+class KnowledgeStore:
+    """Compact, immutable store built once from a {topic_key: {difficulty: [...]}} knowledge base.
+
+    Questions are frozen and interned once, and an inverted index maps each
+    lowercased question token to the ids of the questions containing it.
+    """
+
+    def __init__(self, knowledge_base):
+        self._questions = []
+        self._shards = {}
+        self._index = {}
+        self._keyword_cache = {}
+
+        for topic_key, difficulties in knowledge_base.items():
+            for difficulty, entries in difficulties.items():
+                self._shards[(topic_key, difficulty)] = self._freeze_entries(entries)
+
+        for question in self._questions:
+            for token in question.tokens:
+                self._index.setdefault(token, set()).add(question.qid)
+        self._index = {token: frozenset(ids) for token, ids in self._index.items()}
+
+    def _freeze_entries(self, entries):
+        # Either a flat list of questions or a {subtopic: [questions]} mapping
+        if isinstance(entries, dict):
+            return {subtopic: self._freeze_entries(items) for subtopic, items in entries.items()}
+        frozen = []
+        for data in entries:
+            question = _freeze_question(len(self._questions), data)
+            self._questions.append(question)
+            frozen.append(question)
+        return tuple(frozen)
+
+    def topic_keys(self):
+        return sorted({topic_key for topic_key, _ in self._shards})
+
+    def questions(self, topic_key, difficulty):
+        """All stored questions for a (topic_key, difficulty) pair, as a tuple"""
+        shard = self._shards.get((topic_key, difficulty), ())
+        if isinstance(shard, dict):
+            return tuple(q for items in shard.values() for q in items)
+        return shard
+
+    def sample(self, topic_key, difficulty, count, rng=random):
+        """Up to count distinct questions in random order, without copying the shard"""
+        questions = self.questions(topic_key, difficulty)
+        return rng.sample(questions, min(count, len(questions)))
+
+    def pool(self, topic_key, difficulty, subtopic):
+        """Questions for a subtopic first, then at most two from each other subtopic"""
+        shard = self._shards.get((topic_key, difficulty), ())
+        if not isinstance(shard, dict):
+            return QuestionPool(self, shard)
+        questions = list(shard.get(subtopic, ()))
+        for other_subtopic, items in shard.items():
+            if other_subtopic != subtopic:
+                questions.extend(items[:2])
+        return QuestionPool(self, questions)
+
+    def matching_ids(self, keywords):
+        """Ids of questions whose lowercased text contains any of the keywords"""
+        ids = set()
+        for keyword in keywords:
+            cached = self._keyword_cache.get(keyword)
+            if cached is None:
+                cached = frozenset().union(*(
+                    question_ids for token, question_ids in self._index.items() if keyword in token
+                ))
+                if len(self._keyword_cache) >= KEYWORD_CACHE_SIZE:
+                    self._keyword_cache.clear()
+                self._keyword_cache[keyword] = cached
+            ids.update(cached)
+        return ids
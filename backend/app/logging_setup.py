@@ -0,0 +1,82 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats a record and its ``extra`` fields as one JSON object or as key=value text"""
+
+    def __init__(self, style='json'):
+        super().__init__()
+        self.style = style
+
+    def format(self, record):
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if record.exc_text or record.exc_info:
+            fields['exc_info'] = record.exc_text or self.formatException(record.exc_info)
+        timestamp = self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}'
+
+        if self.style == 'json':
+            entry = {'ts': timestamp, 'level': record.levelname, 'logger': record.name,
+                     'event': record.getMessage(), **fields}
+            return json.dumps(entry, default=str, ensure_ascii=False)
+        pairs = ' '.join(f'{key}={value!r}' for key, value in fields.items() if key != 'exc_info')
+        line = f'{timestamp} {record.levelname:<7} {record.name}: {record.getMessage()} {pairs}'.rstrip()
+        return line + ('\n' + fields['exc_info'] if 'exc_info' in fields else '')
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback now, but keep extra fields as they are
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+_listener_pid = None
+
+
+def configure_logging(logger_name='quizgenix', level='INFO', style='json', stream=None):
+    """Send a logger's records to stderr through a background thread.
+
+    Request threads only enqueue records (calls below ``level`` cost a level
+    check), and a QueueListener does the formatting and the blocking write.
+    Safe to call again, e.g. in a forked worker, whose listener thread did not
+    survive the fork.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter(style))
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=False)
+    _listener_pid = os.getpid()
+    _listener.start()
+
+    logger = logging.getLogger(logger_name)
+    for old in [h for h in logger.handlers if isinstance(h, _QueueHandler)]:
+        logger.removeHandler(old)
+    logger.addHandler(_QueueHandler(records))
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    return logger
+
+
+@atexit.register
+def _flush_logs():
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
@@ -1,45 +1,107 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, current_app, g, has_request_context, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+import click
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import base64
+import hashlib
 import datetime
 import json
 import io
+import logging
 import os
 import random
 import re
+import shutil
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, wraps
 
-# Optional imports for file generation
-try:
-    from fpdf import FPDF
-    FPDF_AVAILABLE = True
-except ImportError:
-    FPDF_AVAILABLE = False
-    print("⚠️ FPDF not available - Install with: pip install fpdf2")
-
-try:
-    from docx import Document
-    from docx.shared import Inches
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    print("⚠️ python-docx not available - Install with: pip install python-docx")
-
-try:
-    import pandas as pd
-    XLSX_AVAILABLE = True
-except ImportError:
-    XLSX_AVAILABLE = False
-    print("⚠️ pandas not available - Install with: pip install pandas openpyxl")
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quizgenix.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-CORS(app)
+from auth import Principal, TokenCache
+from db_config import database_config, install_sqlite_pragmas
+from export_cache import ExportCache, export_cache_key
+from export_engine import EXPORT_ENGINE, ExportDocument
+from grading import AnswerKey, AnswerKeyCache, VersionedCache
+from item_analysis import ItemAnalysis
+from job_queue import FINISHED_STATUSES, JobQueue
+from knowledge_loader import DEFAULT_KNOWLEDGE_BASE_DIR, KnowledgeBaseLoader
+from logging_setup import configure_logging
+from metrics import CONTENT_TYPE, Registry
+from session_store import create_session_store
+from topic_resolver import resolve_domain, resolve_topic_key
+from zip_stream import map_as_completed, stream_zip
+
+def configure_app(app, config=None):
+    """Default settings, mostly read from the environment, then any overrides"""
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    # SQLALCHEMY_DATABASE_URI, engine/pool options and SQLite PRAGMAs (see db_config.py)
+    app.config.update(database_config())
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Session answers are held in the session store and written to QuizSession every N answers.
+    # 'local-shared' is visible to every worker process; 'memory' only suits a single process
+    app.config['SESSION_STORE'] = os.environ.get('SESSION_STORE', 'local-shared')
+    app.config['SESSION_STORE_PATH'] = os.environ.get(
+        'SESSION_STORE_PATH', os.path.join(app.instance_path, 'quiz_sessions.db')
+    )
+    app.config['SESSION_CHECKPOINT_EVERY'] = int(os.environ.get('SESSION_CHECKPOINT_EVERY', 5))
+    # Worker pool for POST /api/quizzes/batch
+    app.config['BATCH_GENERATION_EXECUTOR'] = os.environ.get('BATCH_GENERATION_EXECUTOR', 'thread')  # or 'process'
+    app.config['BATCH_GENERATION_WORKERS'] = int(os.environ.get('BATCH_GENERATION_WORKERS', os.cpu_count() or 4))
+    app.config['BATCH_MAX_QUIZZES'] = int(os.environ.get('BATCH_MAX_QUIZZES', 100))
+    # Background jobs (quiz generation and exports)
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['JOB_RESULTS_DIR'] = os.environ.get('JOB_RESULTS_DIR', os.path.join(app.instance_path, 'job_results'))
+    app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 60))
+    app.config['JOB_RETENTION_HOURS'] = int(os.environ.get('JOB_RETENTION_HOURS', 24))
+    app.config['JOB_MAX_WAIT_SECONDS'] = 60
+    # Rendered export cache (memory LRU + size-capped disk tier)
+    app.config['EXPORT_CACHE_DIR'] = os.environ.get('EXPORT_CACHE_DIR', os.path.join(app.instance_path, 'export_cache'))
+    app.config['EXPORT_CACHE_MEMORY_ITEMS'] = int(os.environ.get('EXPORT_CACHE_MEMORY_ITEMS', 64))
+    app.config['EXPORT_CACHE_DISK_BYTES'] = int(os.environ.get('EXPORT_CACHE_DISK_BYTES', 512 * 1024 * 1024))
+    # Bulk ZIP export: render pool size and how many rendered documents may wait for the archive
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', min(os.cpu_count() or 4, 4)))
+    app.config['EXPORT_MAX_IN_FLIGHT'] = int(os.environ.get('EXPORT_MAX_IN_FLIGHT', 2 * app.config['EXPORT_WORKERS']))
+    # Verified bearer tokens cached per process until they expire (re-verified at least hourly)
+    app.config['AUTH_TOKEN_CACHE_SIZE'] = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 4096))
+    app.config['AUTH_TOKEN_CACHE_TTL'] = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 3600))
+    # Structured logs on stderr, and who may scrape GET /metrics (loopback only unless public)
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')  # or 'text'
+    app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', '').lower() in ('1', 'true', 'yes')
+    app.config.update(config or {})
+
+db = SQLAlchemy()
+# Every HTTP route and CLI command; registered on the app by create_app()
+api = Blueprint('api', __name__, cli_group=None)
+log = logging.getLogger('quizgenix')
+
+# Per-process metrics, served by GET /metrics
+METRICS = Registry()
+REQUEST_LATENCY = METRICS.histogram(
+    'quizgenix_http_request_duration_seconds', 'Time to handle a request, by route',
+    ['method', 'route', 'status']
+)
+REQUEST_DB_QUERIES = METRICS.histogram(
+    'quizgenix_http_request_db_queries', 'SQL statements executed per request, by route',
+    ['method', 'route'], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+)
+REQUEST_DB_SECONDS = METRICS.histogram(
+    'quizgenix_http_request_db_seconds', 'Time spent executing SQL per request, by route',
+    ['method', 'route']
+)
+DB_QUERIES = METRICS.counter('quizgenix_db_queries_total', 'SQL statements executed, including background work')
+DB_SECONDS = METRICS.counter('quizgenix_db_seconds_total', 'Time spent executing SQL, including background work')
+GENERATION_SECONDS = METRICS.histogram(
+    'quizgenix_question_generation_seconds', 'Time to generate the questions of one quiz, by generator',
+    ['generator']
+)
+EXPORT_RENDER_SECONDS = METRICS.histogram(
+    'quizgenix_export_render_seconds', 'Time to render an export on a cache miss, by format',
+    ['format']
+)
 
 # Database Models
 class User(db.Model):
@@ -57,8 +119,44 @@ class Quiz(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     topic = db.Column(db.String(100), nullable=False)
     difficulty = db.Column(db.String(20), nullable=False)
-    questions = db.Column(db.Text, nullable=False)
+    # Legacy JSON copy of the questions, only set on quizzes created before the
+    # Question table existed and cleared once init_db has migrated them. New
+    # quizzes leave it NULL; reads go through the Question/Option tables.
+    questions = db.deferred(db.Column(db.Text))
+    question_count = db.Column(db.Integer, default=0)  # summary for list views
+    content_hash = db.Column(db.String(64))  # hash of title/metadata/questions, keys the export cache
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    
+    __table_args__ = (
+        # Serves the keyset-paginated /api/quizzes listing
+        db.Index('ix_quiz_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # question id exposed by the API
+    text = db.Column(db.Text, nullable=False)
+    correct_answer = db.Column(db.Integer, nullable=False)
+    explanation = db.Column(db.Text, default='')
+    references = db.Column(db.Text, default='[]')  # JSON list of reference dicts
+    meta = db.Column(db.Text, default='{}')  # JSON of generator metadata (difficulty, topic, domain...)
+    
+    options = db.relationship('Option', order_by='Option.position', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_question_quiz_position', 'quiz_id', 'position'),
+    )
+
+class Option(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_option_question_position', 'question_id', 'position'),
+    )
 
 class QuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,10 +167,18 @@ class QuizAttempt(db.Model):
     total_questions = db.Column(db.Integer, nullable=False)
     time_taken = db.Column(db.Integer, nullable=False)  # in seconds
     completed_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    percentage = db.Column(db.Float)  # stored with score, see attempt_grade()
+    grade = db.Column(db.String(1))
     
     # Relationships
     user = db.relationship('User', backref='quiz_attempts')
     quiz = db.relationship('Quiz', backref='attempts')
+    
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_quiz_completed', 'quiz_id', 'completed_at'),  # get_quiz_attempts
+        db.Index('ix_quiz_attempt_quiz_id', 'quiz_id', 'id'),  # regrade_quiz_attempts keyset scan
+        db.Index('ix_quiz_attempt_user_completed', 'user_id', 'completed_at'),  # get_my_results
+    )
 
 class QuizSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -84,46 +190,640 @@ class QuizSession(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     current_question = db.Column(db.Integer, default=0)
     answers_so_far = db.Column(db.Text, default='{}')  # JSON of answers
+    
+    __table_args__ = (
+        db.Index('ix_quiz_session_user_quiz_active', 'user_id', 'quiz_id', 'is_active'),  # start_quiz
+        # submit_answer / submit_quiz look sessions up through session_token's unique index
+    )
 
-# Enhanced Knowledge Base with Topic-Specific Content and Comprehensive References
-TOPIC_FOCUSED_KNOWLEDGE_BASE = {
-    'javascript_functions': {
-        'easy': [
-            {
-                'question': "Which keyword is used to declare a function in JavaScript?",
-                'options': [
-                    "function",
-                    "def",
-                    "lambda",
-                    "sub"
-                ],
-                'correct': 0,
-                'explanation': "The 'function' keyword is used in JavaScript to declare functions.",
-                'references': [
-                    {"title": "MDN - Functions", "url": "https://developer.mozilla.org/en-US/docs/Web/JavaScript/Guide/Functions"}
-                ]
-            },
-            {
-                'question': "How do you call a function named 'myFunc'?",
-                'options': [
-                    "myFunc();",
-                    "call myFunc;",
-                    "run myFunc()",
-                    "invoke myFunc"
-                ],
-                'correct': 0,
-                'explanation': "Functions are called by their name followed by parentheses.",
-                'references': [
-                    {"title": "MDN - Calling Functions", "url": "https://developer.mozilla.org/en-US/docs/Web/JavaScript/Guide/Functions#calling_functions"}
-                ]
-            },
-            # Add more diverse questions here...
-        ],
-        # Add medium and hard questions similarly...
-    },
-    # Add other topics/subjects...
-}
+class QuizStats(db.Model):
+    """Aggregates over a quiz's attempts, maintained incrementally by submit_quiz"""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    total_questions = db.Column(db.Integer, nullable=False)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_sq_sum = db.Column(db.Integer, nullable=False, default=0)  # running variance
+    time_taken_sum = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class QuizScoreCount(db.Model):
+    """Score histogram: one row per possible score of a quiz"""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizQuestionStats(db.Model):
+    """How many attempts answered each question of a quiz correctly"""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    payload = db.Column(db.Text, nullable=False)  # JSON job arguments
+    result = db.Column(db.Text)  # JSON result once succeeded
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    progress = db.Column(db.Text)  # JSON progress reported by long-running jobs
+    claimed_by = db.Column(db.String(32))  # claim id of the run that owns a running job
+    lease_expires_at = db.Column(db.DateTime)  # renewed by the owner's heartbeat
+    
+    __table_args__ = (
+        db.Index('ix_job_status_created', 'status', 'created_at'),  # recovery scan
+    )
+
+# Authentication: bearer token -> g.principal
+token_cache = None  # TokenCache, created by init_services()
+
+def decode_token(token):
+    return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+
+def load_principal(claims):
+    """Principal for verified token claims, or None if the user no longer exists"""
+    user = db.session.query(User.id, User.role).filter_by(id=claims.get('user_id')).first()
+    return Principal(user.id, user.role) if user else None
+
+def auth_required(view):
+    """Resolve the request's bearer token to g.principal before running the view.
+    
+    Verification and the user lookup happen once per token; later requests with
+    the same token are served from token_cache until it expires.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        if not token:
+            return jsonify({'error': 'No token provided'}), 401
+        try:
+            principal = token_cache.get(token, load_principal)
+        except jwt.InvalidTokenError as e:
+            return jsonify({'error': str(e)}), 401
+        if principal is None:
+            return jsonify({'error': 'Invalid token'}), 401
+        g.principal = principal
+        return view(*args, **kwargs)
+    return wrapper
+
+# Question storage helpers
+QUESTION_CORE_FIELDS = ('id', 'question', 'options', 'correct_answer', 'explanation', 'references')
+
+def save_quiz_questions(quiz_id, questions):
+    """Write generated questions into the Question/Option tables (caller commits)"""
+    for q in questions:
+        db.session.add(Question(
+            quiz_id=quiz_id,
+            position=q['id'],
+            text=q['question'],
+            correct_answer=q['correct_answer'],
+            explanation=q.get('explanation', ''),
+            references=json.dumps(q.get('references', [])),
+            meta=json.dumps({k: v for k, v in q.items() if k not in QUESTION_CORE_FIELDS}),
+            options=[Option(position=j, text=option) for j, option in enumerate(q['options'])]
+        ))
+
+def compute_quiz_content_hash(quiz, questions):
+    """Stable hash of everything an exported document shows for a quiz.
+    
+    ``questions`` may be any iterable; it is hashed one question at a time.
+    """
+    digest = hashlib.sha256(json.dumps({
+        'title': quiz.title,
+        'subject': quiz.subject,
+        'topic': quiz.topic,
+        'difficulty': quiz.difficulty
+    }, sort_keys=True).encode())
+    for question in questions:
+        digest.update(b'\n')
+        digest.update(json.dumps(question, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def migrate_quiz_questions(quiz_id):
+    """Copy one quiz's legacy JSON questions into the Question/Option tables and clear the blob"""
+    migrated = False
+    if not db.session.query(Question.id).filter_by(quiz_id=quiz_id).first():
+        blob = db.session.query(Quiz.questions).filter_by(id=quiz_id).scalar()
+        questions = json.loads(blob) if blob else []
+        if questions:
+            save_quiz_questions(quiz_id, questions)
+            db.session.query(Quiz).filter_by(id=quiz_id).update({'question_count': len(questions)})
+            migrated = True
+    
+    db.session.query(Quiz).filter_by(id=quiz_id).update({'questions': None})
+    db.session.commit()
+    return migrated
+
+def migrate_legacy_questions(batch_size=100):
+    """Move every quiz still stored as a JSON blob; run by init_db, never from a request"""
+    migrated = 0
+    last_id = 0
+    while True:
+        quiz_ids = [row.id for row in db.session.query(Quiz.id)
+                    .filter(Quiz.questions.isnot(None), Quiz.id > last_id)
+                    .order_by(Quiz.id)
+                    .limit(batch_size)]
+        if not quiz_ids:
+            break
+        for quiz_id in quiz_ids:
+            if migrate_quiz_questions(quiz_id):
+                migrated += 1
+        last_id = quiz_ids[-1]
+    return migrated
+
+def load_quiz_questions(quiz_id, include_answers=True, include_metadata=False):
+    """Load a quiz's questions in the API shape, selecting only the needed columns.
+    
+    With include_answers=False the correct answer, explanation and references are
+    never read from the database, which is what students see while taking a quiz.
+    """
+    columns = [Question.id, Question.position, Question.text]
+    if include_answers:
+        columns += [Question.correct_answer, Question.explanation, Question.references]
+    if include_metadata:
+        columns.append(Question.meta)
+    
+    rows = db.session.query(*columns).filter(Question.quiz_id == quiz_id).order_by(Question.position).all()
+    if not rows:
+        return []
+    
+    options_by_question = {}
+    option_rows = (db.session.query(Option.question_id, Option.text)
+                   .join(Question, Option.question_id == Question.id)
+                   .filter(Question.quiz_id == quiz_id)
+                   .order_by(Option.question_id, Option.position))
+    for question_id, text in option_rows:
+        options_by_question.setdefault(question_id, []).append(text)
+    
+    questions = []
+    for row in rows:
+        question = {}
+        if include_metadata:
+            question.update(json.loads(row.meta or '{}'))
+        question.update({
+            'id': row.position,
+            'question': row.text,
+            'options': options_by_question.get(row.id, [])
+        })
+        if include_answers:
+            question['correct_answer'] = row.correct_answer
+            question['explanation'] = row.explanation or ''
+            question['references'] = json.loads(row.references or '[]')
+        questions.append(question)
+    
+    return questions
 
+def iter_quiz_questions(quiz_id, batch_size=500):
+    """Yield a quiz's questions (with answers) in position order, one batch of rows at a time.
+    
+    Used by the exporters so that a large question bank is never materialised
+    as a single list; only ``batch_size`` questions and their options are held
+    in memory at once.
+    """
+    last_position = -1
+    while True:
+        rows = (db.session.query(Question.id, Question.position, Question.text, Question.correct_answer,
+                                 Question.explanation, Question.references)
+                .filter(Question.quiz_id == quiz_id, Question.position > last_position)
+                .order_by(Question.position)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            return
+        
+        options_by_question = {}
+        option_rows = (db.session.query(Option.question_id, Option.text)
+                       .filter(Option.question_id.in_([row.id for row in rows]))
+                       .order_by(Option.question_id, Option.position))
+        for question_id, text in option_rows:
+            options_by_question.setdefault(question_id, []).append(text)
+        
+        for row in rows:
+            yield {
+                'id': row.position,
+                'question': row.text,
+                'options': options_by_question.get(row.id, []),
+                'correct_answer': row.correct_answer,
+                'explanation': row.explanation or '',
+                'references': json.loads(row.references or '[]')
+            }
+        last_position = rows[-1].position
+
+def attempt_grade(score, total_questions):
+    """(percentage, letter grade) for a score, as stored on QuizAttempt"""
+    percentage = round((score / total_questions) * 100, 1) if total_questions else 0.0
+    grade = 'A' if percentage >= 90 else 'B' if percentage >= 80 else 'C' if percentage >= 70 else 'D' if percentage >= 60 else 'F'
+    return percentage, grade
+
+answer_keys = AnswerKeyCache()
+
+def load_answer_key(quiz, questions=None):
+    """Cached grading key for a quiz; rebuilt whenever the quiz's content hash changes"""
+    def build():
+        if questions is not None:
+            return AnswerKey([q['id'] for q in questions], [q['correct_answer'] for q in questions])
+        rows = (db.session.query(Question.position, Question.correct_answer)
+                .filter(Question.quiz_id == quiz.id)
+                .order_by(Question.position)
+                .all())
+        return AnswerKey([row.position for row in rows], [row.correct_answer for row in rows])
+    
+    return answer_keys.get(quiz.id, quiz.content_hash, build)
+
+def apply_answer_key_corrections(quiz, corrections):
+    """Set new correct answers ({question id: option index}) and re-hash the quiz.
+    
+    The new content hash invalidates the cached answer key and any cached exports.
+    Raises ValueError for unknown questions or out-of-range options.
+    """
+    questions = {q['id']: q for q in load_quiz_questions(quiz.id)}
+    updates = []
+    for question_id, correct_answer in corrections.items():
+        question = questions.get(int(question_id))
+        if question is None:
+            raise ValueError(f'Unknown question: {question_id}')
+        if type(correct_answer) is not int or not 0 <= correct_answer < len(question['options']):
+            raise ValueError(f'Invalid correct_answer for question {question_id}')
+        updates.append((question['id'], correct_answer))
+    
+    for position, correct_answer in updates:
+        db.session.execute(
+            db.update(Question)
+            .where(Question.quiz_id == quiz.id, Question.position == position)
+            .values(correct_answer=correct_answer)
+        )
+    quiz.content_hash = compute_quiz_content_hash(quiz, iter_quiz_questions(quiz.id))
+    db.session.commit()
+    answer_keys.invalidate(quiz.id)
+    return len(updates)
+
+def regrade_quiz_attempts(quiz_id, chunk_size=1000, on_progress=None):
+    """Re-score every attempt at a quiz against its current answer key.
+    
+    Attempts are streamed in id order, chunk_size at a time (only id, answers
+    and the stored score are read), scored as one NumPy batch per chunk and
+    written back with a single executemany UPDATE for the rows that changed.
+    on_progress(processed=, total=, changed=) is called after every chunk.
+    """
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        raise ValueError('Quiz not found')
+    key = load_answer_key(quiz)
+    total_questions = len(key)
+    total = db.session.query(db.func.count(QuizAttempt.id)).filter(QuizAttempt.quiz_id == quiz_id).scalar()
+    
+    processed = changed = 0
+    last_id = 0
+    while True:
+        rows = (db.session.query(QuizAttempt.id, QuizAttempt.answers, QuizAttempt.score, QuizAttempt.total_questions)
+                .filter(QuizAttempt.quiz_id == quiz_id, QuizAttempt.id > last_id)
+                .order_by(QuizAttempt.id)
+                .limit(chunk_size)
+                .all())
+        if not rows:
+            break
+        
+        scores = key.score_many(json.loads(row.answers or '{}') for row in rows).tolist()
+        updates = [
+            dict(zip(('id', 'score', 'total_questions', 'percentage', 'grade'),
+                     (row.id, score, total_questions, *attempt_grade(score, total_questions))))
+            for row, score in zip(rows, scores)
+            if row.score != score or row.total_questions != total_questions
+        ]
+        if updates:
+            db.session.execute(db.update(QuizAttempt), updates)
+        db.session.commit()
+        
+        processed += len(rows)
+        changed += len(updates)
+        last_id = rows[-1].id
+        if on_progress:
+            on_progress(processed=processed, total=total, changed=changed)
+    
+    rebuild_quiz_stats(quiz_id, chunk_size)
+    return {'quiz_id': quiz_id, 'attempts': processed, 'changed': changed}
+
+# Materialised per-quiz analytics. Every row a quiz needs (one per possible score
+# and one per question) exists from the start, so recording an attempt is a few
+# atomic "SET x = x + n" UPDATEs in the submitting transaction.
+
+def insert_quiz_stats(quiz_id, positions, attempt_count=0, score_sum=0, score_sq_sum=0, time_taken_sum=0,
+                      histogram=None, correct_counts=None):
+    """Insert a quiz's stats rows, zeroed unless totals are given (caller commits)"""
+    positions = list(positions)
+    histogram = histogram or [0] * (len(positions) + 1)
+    correct_counts = correct_counts or [0] * len(positions)
+    db.session.execute(db.insert(QuizStats).values(
+        quiz_id=quiz_id,
+        total_questions=len(positions),
+        attempt_count=attempt_count,
+        score_sum=score_sum,
+        score_sq_sum=score_sq_sum,
+        time_taken_sum=time_taken_sum,
+        updated_at=datetime.datetime.utcnow()
+    ))
+    db.session.execute(db.insert(QuizScoreCount), [
+        {'quiz_id': quiz_id, 'score': score, 'count': count} for score, count in enumerate(histogram)
+    ])
+    if positions:
+        db.session.execute(db.insert(QuizQuestionStats), [
+            {'quiz_id': quiz_id, 'position': position, 'correct_count': count}
+            for position, count in zip(positions, correct_counts)
+        ])
+
+def record_attempt_stats(quiz_id, key, score, correct_mask, time_taken):
+    """Fold one attempt into the quiz's stats inside the caller's transaction.
+    
+    Returns False when the stats rows are missing or were built for a different
+    number of questions; the caller should then rebuild_quiz_stats() after commit.
+    """
+    total_questions = db.session.query(QuizStats.total_questions).filter_by(quiz_id=quiz_id).scalar()
+    if total_questions is None or total_questions != len(key):
+        return False
+    
+    db.session.execute(
+        db.update(QuizStats).where(QuizStats.quiz_id == quiz_id).values(
+            attempt_count=QuizStats.attempt_count + 1,
+            score_sum=QuizStats.score_sum + score,
+            score_sq_sum=QuizStats.score_sq_sum + score * score,
+            time_taken_sum=QuizStats.time_taken_sum + time_taken,
+            updated_at=datetime.datetime.utcnow()
+        )
+    )
+    db.session.execute(
+        db.update(QuizScoreCount)
+        .where(QuizScoreCount.quiz_id == quiz_id, QuizScoreCount.score == score)
+        .values(count=QuizScoreCount.count + 1)
+    )
+    positions = [int(key.question_ids[i]) for i in correct_mask.nonzero()[0]]
+    if positions:
+        db.session.execute(
+            db.update(QuizQuestionStats)
+            .where(QuizQuestionStats.quiz_id == quiz_id, QuizQuestionStats.position.in_(positions))
+            .values(correct_count=QuizQuestionStats.correct_count + 1)
+        )
+    return True
+
+def rebuild_quiz_stats(quiz_id, chunk_size=1000):
+    """Recompute a quiz's stats rows from all of its attempts (backfill, re-grades)"""
+    quiz = db.session.get(Quiz, quiz_id)
+    key = load_answer_key(quiz)
+    total_questions = len(key)
+    
+    attempt_count = score_sum = score_sq_sum = time_taken_sum = 0
+    histogram = np.zeros(total_questions + 1, dtype=np.int64)
+    correct_counts = np.zeros(total_questions, dtype=np.int64)
+    last_id = 0
+    while True:
+        rows = (db.session.query(QuizAttempt.id, QuizAttempt.answers, QuizAttempt.score, QuizAttempt.time_taken)
+                .filter(QuizAttempt.quiz_id == quiz_id, QuizAttempt.id > last_id)
+                .order_by(QuizAttempt.id)
+                .limit(chunk_size)
+                .all())
+        if not rows:
+            break
+        correct_counts += key.grade(key.encode_many(json.loads(row.answers or '{}') for row in rows)).sum(axis=0)
+        scores = np.clip(np.array([row.score for row in rows], dtype=np.int64), 0, total_questions)
+        histogram += np.bincount(scores, minlength=total_questions + 1)
+        attempt_count += len(rows)
+        score_sum += int(scores.sum())
+        score_sq_sum += int((scores * scores).sum())
+        time_taken_sum += sum(row.time_taken for row in rows)
+        last_id = rows[-1].id
+    
+    for model in (QuizStats, QuizScoreCount, QuizQuestionStats):
+        db.session.execute(db.delete(model).where(model.quiz_id == quiz_id))
+    insert_quiz_stats(
+        quiz_id, [int(question_id) for question_id in key.question_ids],
+        attempt_count=attempt_count,
+        score_sum=score_sum,
+        score_sq_sum=score_sq_sum,
+        time_taken_sum=time_taken_sum,
+        histogram=histogram.tolist(),
+        correct_counts=correct_counts.tolist()
+    )
+    db.session.commit()
+
+def backfill_quiz_stats():
+    """Build stats for quizzes that have attempts but no stats rows yet"""
+    quiz_ids = [row.quiz_id for row in db.session.query(QuizAttempt.quiz_id)
+                .outerjoin(QuizStats, QuizStats.quiz_id == QuizAttempt.quiz_id)
+                .filter(QuizStats.quiz_id.is_(None))
+                .distinct()]
+    for quiz_id in quiz_ids:
+        rebuild_quiz_stats(quiz_id)
+    return len(quiz_ids)
+
+def quiz_stats_payload(quiz_id):
+    """Summary statistics for a quiz, read from the materialised stats tables"""
+    stats = db.session.get(QuizStats, quiz_id)
+    if stats is None or not stats.attempt_count:
+        return {
+            'attempt_count': 0,
+            'total_questions': stats.total_questions if stats else None,
+            'mean_score': None,
+            'median_score': None,
+            'score_variance': None,
+            'score_std_dev': None,
+            'mean_percentage': None,
+            'average_time_taken': None,
+            'score_distribution': [],
+            'questions': []
+        }
+    
+    count = stats.attempt_count
+    mean = stats.score_sum / count
+    variance = max(stats.score_sq_sum / count - mean * mean, 0.0)
+    
+    distribution = [{'score': row.score, 'count': row.count} for row in
+                    db.session.query(QuizScoreCount.score, QuizScoreCount.count)
+                    .filter_by(quiz_id=quiz_id).order_by(QuizScoreCount.score)]
+    
+    # Median from the histogram: mean of the values at ranks floor((n+1)/2) and ceil((n+1)/2)
+    ranks = ((count + 1) // 2, count // 2 + 1)
+    median_values = []
+    seen = 0
+    for bucket in distribution:
+        seen += bucket['count']
+        while len(median_values) < 2 and seen >= ranks[len(median_values)]:
+            median_values.append(bucket['score'])
+    
+    questions = [{
+        'question_id': row.position,
+        'correct_count': row.correct_count,
+        'correct_rate': round(row.correct_count / count, 3)
+    } for row in db.session.query(QuizQuestionStats.position, QuizQuestionStats.correct_count)
+        .filter_by(quiz_id=quiz_id).order_by(QuizQuestionStats.position)]
+    
+    return {
+        'attempt_count': count,
+        'total_questions': stats.total_questions,
+        'mean_score': round(mean, 2),
+        'median_score': sum(median_values) / 2,
+        'score_variance': round(variance, 2),
+        'score_std_dev': round(variance ** 0.5, 2),
+        'mean_percentage': round(mean / stats.total_questions * 100, 1) if stats.total_questions else None,
+        'average_time_taken': round(stats.time_taken_sum / count, 1),
+        'score_distribution': distribution,
+        'questions': questions
+    }
+
+item_analyses = VersionedCache(maxsize=256)
+
+def compute_item_analysis(quiz, chunk_size=1000):
+    """Item statistics for every question of a quiz, computed from all its attempts.
+    
+    Attempts are read in id order, chunk_size at a time, and encoded into the
+    answer key's int16 matrix layout before being folded into an ItemAnalysis.
+    """
+    key = load_answer_key(quiz)
+    option_counts = dict(
+        db.session.query(Question.position, db.func.count(Option.id))
+        .join(Option, Option.question_id == Question.id)
+        .filter(Question.quiz_id == quiz.id)
+        .group_by(Question.position)
+        .all()
+    )
+    analysis = ItemAnalysis(key, [option_counts.get(int(question_id), 0) for question_id in key.question_ids])
+    
+    last_id = 0
+    while True:
+        rows = (db.session.query(QuizAttempt.id, QuizAttempt.answers)
+                .filter(QuizAttempt.quiz_id == quiz.id, QuizAttempt.id > last_id)
+                .order_by(QuizAttempt.id)
+                .limit(chunk_size)
+                .all())
+        if not rows:
+            break
+        analysis.add(key.encode_many(json.loads(row.answers or '{}') for row in rows))
+        last_id = rows[-1].id
+    return analysis.result()
+
+def quiz_item_analysis(quiz):
+    """Cached item analysis; a new attempt, re-grade or answer-key change invalidates it.
+    
+    The version combines the content hash with the attempt count and update time
+    of the quiz's stats row, both of which change whenever an attempt is recorded.
+    """
+    stats = db.session.query(QuizStats.attempt_count, QuizStats.updated_at).filter_by(quiz_id=quiz.id).first()
+    version = (quiz.content_hash, stats.attempt_count, stats.updated_at) if stats else (quiz.content_hash, None, None)
+    return item_analyses.get(quiz.id, version, lambda: compute_item_analysis(quiz))
+
+# Indexes earlier versions created that no query needs any more
+OBSOLETE_INDEXES = (
+    'ix_quiz_attempt_quiz_user',  # replaced by ix_quiz_attempt_quiz_completed
+    'ix_quiz_session_token_active',  # duplicated the unique index on session_token
+)
+
+def upgrade_schema():
+    """Apply schema changes (new columns and indexes, dropped indexes) to an existing database file"""
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    
+    for name in OBSOLETE_INDEXES:
+        db.session.execute(db.text(f'DROP INDEX IF EXISTS {preparer.quote(name)}'))
+    db.session.commit()
+    
+    for table in db.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(
+                    f'ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} {column_type}'
+                ))
+                log.info('schema column added', extra={'table': table.name, 'column': column.name})
+        db.session.commit()
+        
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    relax_legacy_questions_column()
+
+def relax_legacy_questions_column():
+    """Drop the NOT NULL that older databases still carry on quiz.questions"""
+    columns = {column['name']: column for column in db.inspect(db.engine).get_columns('quiz')}
+    if columns['questions']['nullable']:
+        return
+    
+    preparer = db.engine.dialect.identifier_preparer
+    if db.engine.dialect.name != 'sqlite':
+        db.session.execute(db.text(f'ALTER TABLE quiz ALTER COLUMN {preparer.quote("questions")} DROP NOT NULL'))
+        db.session.commit()
+        return
+    
+    # SQLite cannot alter a column in place: copy the rows into a table built
+    # from the model, swap it in and recreate the indexes
+    metadata = db.MetaData()
+    for foreign_key in Quiz.__table__.foreign_keys:
+        foreign_key.column.table.to_metadata(metadata)
+    rebuilt = Quiz.__table__.to_metadata(metadata, name='quiz_rebuild')
+    names = ', '.join(preparer.quote(column.name) for column in Quiz.__table__.columns)
+    db.session.execute(db.schema.CreateTable(rebuilt))
+    db.session.execute(db.text(f'INSERT INTO quiz_rebuild ({names}) SELECT {names} FROM quiz'))
+    db.session.execute(db.text('DROP TABLE quiz'))
+    db.session.execute(db.text('ALTER TABLE quiz_rebuild RENAME TO quiz'))
+    db.session.commit()
+    for index in Quiz.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    log.info('schema column relaxed', extra={'table': 'quiz', 'column': 'questions'})
+
+def backfill_question_counts():
+    """Fill Quiz.question_count for rows created before the column existed"""
+    count_subquery = (db.select(db.func.count(Question.id))
+                      .where(Question.quiz_id == Quiz.id)
+                      .scalar_subquery())
+    result = db.session.execute(
+        db.update(Quiz).where(Quiz.question_count.is_(None)).values(question_count=count_subquery)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def backfill_content_hashes(batch_size=100):
+    """Fill Quiz.content_hash for rows created before the column existed"""
+    filled = 0
+    while True:
+        quizzes = Quiz.query.filter(Quiz.content_hash.is_(None)).order_by(Quiz.id).limit(batch_size).all()
+        if not quizzes:
+            break
+        for quiz in quizzes:
+            quiz.content_hash = compute_quiz_content_hash(quiz, iter_quiz_questions(quiz.id))
+        db.session.commit()
+        filled += len(quizzes)
+    return filled
+
+def backfill_attempt_grades(chunk_size=1000):
+    """Fill QuizAttempt.percentage/grade for attempts stored before the columns existed"""
+    filled = 0
+    last_id = 0
+    while True:
+        rows = (db.session.query(QuizAttempt.id, QuizAttempt.score, QuizAttempt.total_questions)
+                .filter(QuizAttempt.percentage.is_(None), QuizAttempt.id > last_id)
+                .order_by(QuizAttempt.id)
+                .limit(chunk_size)
+                .all())
+        if not rows:
+            break
+        db.session.execute(db.update(QuizAttempt), [
+            dict(zip(('id', 'percentage', 'grade'), (row.id, *attempt_grade(row.score, row.total_questions))))
+            for row in rows
+        ])
+        db.session.commit()
+        filled += len(rows)
+        last_id = rows[-1].id
+    return filled
+
+# Enhanced Knowledge Base with Topic-Specific Content and Comprehensive References.
+# Questions live in knowledge_base/<topic_key>.jsonl and are loaded per topic on first use.
+KNOWLEDGE_BASE = KnowledgeBaseLoader(
+    os.environ.get('KNOWLEDGE_BASE_DIR', DEFAULT_KNOWLEDGE_BASE_DIR),
+    max_shards=int(os.environ.get('KNOWLEDGE_BASE_MAX_SHARDS', 32))
+)
+
+@GENERATION_SECONDS.timed(generator='topic_focused')
 def generate_topic_focused_questions(quiz_data):
     """Generate questions specifically focused on the given topic"""
     try:
@@ -132,7 +832,7 @@ def generate_topic_focused_questions(quiz_data):
         subject = quiz_data.get('subject', '').lower().strip()
         difficulty = quiz_data.get('difficulty', 'medium').lower()
         
-        print(f"🎯 Generating topic-focused questions for: '{topic}' in subject '{subject}' (difficulty: {difficulty})")
+        log.debug('generating topic-focused questions', extra={'topic': topic, 'subject': subject, 'difficulty': difficulty})
         
         # Create topic-specific key
         topic_key = create_topic_key(topic, subject)
@@ -148,105 +848,57 @@ def generate_topic_focused_questions(quiz_data):
             )
             questions.extend(contextual_questions)
         
-        print(f"✅ Generated {len(questions)} topic-focused questions for '{topic}'")
+        log.debug('generated topic-focused questions', extra={'topic': topic, 'count': len(questions)})
         return questions[:count]
         
     except Exception as e:
-        print(f"❌ Error in topic-focused question generation: {e}")
+        log.exception('topic-focused question generation failed, using fallback questions')
         return generate_fallback_questions(quiz_data)
 
 def create_topic_key(topic, subject):
-    """Create a specific topic key based on topic and subject combination"""
-    topic_lower = topic.lower()
-    subject_lower = subject.lower()
-    
-    # Topic-specific mapping with subject context
-    topic_mappings = {
-        # JavaScript topics
-        ('function', 'javascript'): 'javascript_functions',
-        ('function', 'computer'): 'javascript_functions',
-        ('function', 'programming'): 'javascript_functions',
-        ('javascript function', 'any'): 'javascript_functions',
-        
-        # Python topics  
-        ('function', 'python'): 'python_functions',
-        ('python function', 'any'): 'python_functions',
-        ('def', 'python'): 'python_functions',
-        
-        # Math topics
-        ('algebra', 'math'): 'algebra_equations',
-        ('equation', 'math'): 'algebra_equations',
-        ('linear equation', 'any'): 'algebra_equations',
-        ('quadratic', 'math'): 'algebra_equations',
-        
-        # Chemistry topics
-        ('compound', 'chemistry'): 'chemistry_compounds',
-        ('salt', 'chemistry'): 'chemistry_compounds',
-        ('ionic', 'chemistry'): 'chemistry_compounds',
-        ('chemical compound', 'any'): 'chemistry_compounds',
-    }
-    
-    # First, try exact topic-subject match
-    for (topic_key, subject_key), result in topic_mappings.items():
-        if (topic_key in topic_lower and (subject_key == 'any' or subject_key in subject_lower)):
-            return result
-    
-    # Fallback: general topic matching
-    if 'function' in topic_lower:
-        if any(js_term in subject_lower for js_term in ['javascript', 'js', 'computer', 'programming']):
-            return 'javascript_functions'
-        elif 'python' in subject_lower:
-            return 'python_functions'
-    
-    if any(math_term in topic_lower for math_term in ['algebra', 'equation']):
-        return 'algebra_equations'
-    
-    if any(chem_term in topic_lower for chem_term in ['compound', 'chemistry', 'chemical']):
-        return 'chemistry_compounds'
+    """Create a specific topic key based on topic and subject combination.
     
-    return None
+    Resolution uses the keyword automaton precompiled in topic_resolver, so it
+    costs one pass over the topic and subject and is memoized per pair.
+    """
+    return resolve_topic_key(topic, subject)
 
 def get_topic_specific_questions(topic_key, difficulty, count, original_topic, original_subject):
     """Get questions from the topic-specific knowledge base"""
     questions = []
     
-    if not topic_key or topic_key not in TOPIC_FOCUSED_KNOWLEDGE_BASE:
+    if not topic_key:
         return questions
     
-    topic_data = TOPIC_FOCUSED_KNOWLEDGE_BASE[topic_key]
-    
-    # Get questions for the specific difficulty
-    if difficulty in topic_data:
-        available_questions = topic_data[difficulty][:]
-        random.shuffle(available_questions)
+    # Random subset in random order, sampled straight from the frozen shard
+    for i, q_data in enumerate(KNOWLEDGE_BASE.sample(topic_key, difficulty, count)):
+        # Randomize answer positions
+        options = list(q_data.options)
+        correct_answer = q_data.correct
         
-        for i, q_data in enumerate(available_questions[:count]):
-            # Randomize answer positions
-            options = q_data['options'][:]
-            correct_answer = q_data['correct']
-            
-            randomized_correct = random.randint(0, 3)
-            if randomized_correct != correct_answer:
-                options[randomized_correct], options[correct_answer] = options[correct_answer], options[randomized_correct]
-            
-            question = {
-                'id': i + 1,
-                'question': q_data['question'],
-                'options': options,
-                'correct_answer': randomized_correct,
-                'explanation': q_data['explanation'],
-                'references': q_data['references'],
-                'ai_generated': False,
-                'verified': True,
-                'difficulty': difficulty,
-                'topic': original_topic,
-                'subject': original_subject,
-                'topic_key': topic_key
-            }
-            questions.append(question)
+        randomized_correct = random.randint(0, 3)
+        if randomized_correct != correct_answer:
+            options[randomized_correct], options[correct_answer] = options[correct_answer], options[randomized_correct]
+        
+        question = {
+            'id': i + 1,
+            'question': q_data.question,
+            'options': options,
+            'correct_answer': randomized_correct,
+            'explanation': q_data.explanation,
+            'references': list(q_data.references),
+            'ai_generated': False,
+            'verified': True,
+            'difficulty': difficulty,
+            'topic': original_topic,
+            'subject': original_subject,
+            'topic_key': topic_key
+        }
+        questions.append(question)
     
     return questions
 
+@GENERATION_SECONDS.timed(generator='contextual_topic')
 def generate_contextual_topic_questions(topic, subject, difficulty, count, start_id):
     """Generate contextual questions when specific topic questions aren't available"""
     questions = []
@@ -482,7 +1134,7 @@ def generate_advanced_ai_questions_with_references(quiz_data):
     return generate_topic_focused_questions(quiz_data)
 
 # Add endpoint to get available topics for a subject
-@app.route('/api/topics/<subject>', methods=['GET'])
+@api.route('/api/topics/<subject>', methods=['GET'])
 def get_available_topics(subject):
     """Get available topics for a given subject"""
     try:
@@ -527,9 +1179,10 @@ def get_available_topics(subject):
         })
         
     except Exception as e:
-        print(f"❌ Get topics error: {e}")
+        log.exception('get topics failed')
         return jsonify({'error': str(e)}), 500
 
+@GENERATION_SECONDS.timed(generator='intelligent')
 def generate_intelligent_questions(quiz_data):
     """Generate intelligent, domain-specific questions with proper resources"""
     try:
@@ -538,7 +1191,7 @@ def generate_intelligent_questions(quiz_data):
         difficulty = quiz_data.get('difficulty', 'medium').lower()
         subject = quiz_data.get('subject', '').lower().strip()
         
-        print(f"🧠 Generating intelligent questions for: {topic} in {subject} ({difficulty})")
+        log.debug('generating intelligent questions', extra={'topic': topic, 'subject': subject, 'difficulty': difficulty})
         
         # Determine domain and subtopic
         domain, subtopic = determine_intelligent_domain(topic, subject)
@@ -564,132 +1217,32 @@ def generate_intelligent_questions(quiz_data):
                 )
                 questions.append(fallback_question)
         
-        print(f"✅ Generated {len(questions)} intelligent questions with verified resources")
+        log.debug('generated intelligent questions', extra={'topic': topic, 'count': len(questions)})
         return questions
         
     except Exception as e:
-        print(f"❌ Error in intelligent question generation: {e}")
+        log.exception('intelligent question generation failed, using fallback questions')
         return generate_fallback_questions(quiz_data)
 
 def determine_intelligent_domain(topic, subject):
-    """Intelligently determine domain and subtopic"""
-    topic_lower = topic.lower()
-    subject_lower = subject.lower()
-    
-    # JavaScript domain mapping
-    js_mapping = {
-        'function': 'functions',
-        'variable': 'variables',
-        'array': 'arrays',
-        'closure': 'closures',
-        'promise': 'promises',
-        'async': 'async',
-        'dom': 'dom',
-        'object': 'objects'
-    }
-    
-    # Python domain mapping
-    python_mapping = {
-        'function': 'functions',
-        'list': 'basics',
-        'dictionary': 'basics',
-        'comprehension': 'comprehensions',
-        'class': 'oop',
-        'module': 'modules'
-    }
-    
-    # Math domain mapping
-    math_mapping = {
-        'algebra': 'algebra',
-        'calculus': 'calculus',
-        'geometry': 'geometry',
-        'arithmetic': 'arithmetic',
-        'percentage': 'arithmetic',
-        'equation': 'algebra',
-        'derivative': 'calculus',
-        'integral': 'calculus'
-    }
-    
-    # Science domain mapping
-    science_mapping = {
-        'chemistry': 'chemistry',
-        'physics': 'physics',
-        'biology': 'biology',
-        'cell': 'biology',
-        'atom': 'chemistry',
-        'force': 'physics',
-        'energy': 'physics'
-    }
-    
-    # Determine domain
-    if any(keyword in topic_lower or keyword in subject_lower for keyword in js_mapping.keys()) or 'javascript' in topic_lower:
-        domain = 'javascript'
-        subtopic = next((js_mapping[k] for k in js_mapping.keys() if k in topic_lower), 'functions')
-    elif any(keyword in topic_lower or keyword in subject_lower for keyword in python_mapping.keys()) or 'python' in topic_lower:
-        domain = 'python'
-        subtopic = next((python_mapping[k] for k in python_mapping.keys() if k in topic_lower), 'basics')
-    elif any(keyword in topic_lower or keyword in subject_lower for keyword in math_mapping.keys()) or 'math' in subject_lower:
-        domain = 'mathematics'
-        subtopic = next((math_mapping[k] for k in math_mapping.keys() if k in topic_lower), 'arithmetic')
-    elif any(keyword in topic_lower or keyword in subject_lower for keyword in science_mapping.keys()) or 'science' in subject_lower:
-        domain = 'science'
-        subtopic = next((science_mapping[k] for k in science_mapping.keys() if k in topic_lower), 'chemistry')
-    else:
-        # Default mapping
-        if 'computer' in subject_lower or 'programming' in subject_lower:
-            domain, subtopic = 'javascript', 'functions'
-        elif 'math' in subject_lower:
-            domain, subtopic = 'mathematics', 'arithmetic'
-        else:
-            domain, subtopic = 'science', 'chemistry'
-    
-    return domain, subtopic
+    """Intelligently determine domain and subtopic (shares the topic_resolver index)"""
+    return resolve_domain(topic, subject)
 
 def get_relevant_questions(domain, difficulty, subtopic, topic):
-    """Get relevant questions from the enhanced knowledge base"""
-    question_pool = []
-    
-    # Get questions from the specific domain and difficulty
-    if domain in TOPIC_FOCUSED_KNOWLEDGE_BASE and difficulty in TOPIC_FOCUSED_KNOWLEDGE_BASE[domain]:  # Fixed this line
-        difficulty_data = TOPIC_FOCUSED_KNOWLEDGE_BASE[domain][difficulty]  # Fixed this line
-        
-        # First, try to get questions from the specific subtopic
-        if subtopic in difficulty_data:
-            question_pool.extend(difficulty_data[subtopic])
-        
-        # Add questions from other subtopics in the same domain/difficulty
-        for other_subtopic, questions in difficulty_data.items():
-            if other_subtopic != subtopic:
-                question_pool.extend(questions[:2])  # Add max 2 from each other subtopic
-    
-    return question_pool
+    """Get relevant questions from the enhanced knowledge base as a QuestionPool"""
+    return KNOWLEDGE_BASE.pool(domain, difficulty, subtopic)
 
 def select_and_customize_question(question_pool, used_questions, topic, subject, difficulty, question_num):
-    """Select and customize a question from the pool"""
-    available_questions = [q for q in question_pool if id(q) not in used_questions]
-    
-    if not available_questions:
+    """Select and customize a question from the pool (prefers exact topic matches)"""
+    selected = question_pool.pick(topic.lower().split(), used_questions)
+    if selected is None:
         return None
     
-    # Select question (prefer exact topic matches)
-    selected = None
-    topic_lower = topic.lower()
-    
-    # First try to find questions that match the topic
-    for q in available_questions:
-        if any(keyword in q['question'].lower() for keyword in topic_lower.split()):
-            selected = q
-            break
-    
-    # If no topic match, select randomly
-    if not selected:
-        selected = random.choice(available_questions)
-    
-    used_questions.add(id(selected))
+    used_questions.add(selected.qid)
     
     # Randomize answer positions
-    options = selected['options'][:]
-    correct_answer = selected['correct']
+    options = list(selected.options)
+    correct_answer = selected.correct
     
     # Create new randomized positions
     randomized_correct = random.randint(0, 3)
@@ -698,11 +1251,11 @@ def select_and_customize_question(question_pool, used_questions, topic, subject,
     
     return {
         'id': question_num,
-        'question': selected['question'],
+        'question': selected.question,
         'options': options,
         'correct_answer': randomized_correct,
-        'explanation': selected['explanation'],
-        'references': selected['references'],
+        'explanation': selected.explanation,
+        'references': list(selected.references),
         'ai_generated': True,
         'verified': True,
         'difficulty': difficulty,
@@ -860,6 +1413,7 @@ def generate_smart_contextual_question(topic, subject, difficulty, domain, quest
         'domain': domain
     }
 
+@GENERATION_SECONDS.timed(generator='fallback')
 def generate_fallback_questions(quiz_data):
     """Fallback question generation if all else fails"""
     count = int(quiz_data.get('questionCount', 5))
@@ -896,187 +1450,521 @@ def generate_advanced_ai_questions_with_references(quiz_data):
     """Main function to generate advanced AI questions with proper references"""
     return generate_topic_focused_questions(quiz_data)
 
-def generate_pdf(quiz, questions):
-    if not FPDF_AVAILABLE:
-        return jsonify({'error': 'PDF generation not available'}), 500
-        
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, f'Quiz: {quiz.title}', 0, 1, 'C')
-    
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 10, f'Subject: {quiz.subject}', 0, 1)
-    pdf.cell(0, 10, f'Topic: {quiz.topic}', 0, 1)
-    pdf.cell(0, 10, f'Difficulty: {quiz.difficulty}', 0, 1)
-    pdf.ln(5)
-    
-    for i, q in enumerate(questions, 1):
-        pdf.set_font('Arial', 'B', 12)
-        # Handle long questions by splitting them
-        question_text = q["question"][:80] + "..." if len(q["question"]) > 80 else q["question"]
-        pdf.cell(0, 10, f'Q{i}: {question_text}', 0, 1)
-        
-        pdf.set_font('Arial', '', 10)
-        for j, option in enumerate(q['options']):
-            marker = '[X]' if j == q['correct_answer'] else '[ ]'
-            option_text = option[:70] + "..." if len(option) > 70 else option
-            pdf.cell(0, 6, f'  {marker} {chr(65+j)}) {option_text}', 0, 1)
-        pdf.ln(3)
-    
-    output = io.BytesIO()
-    pdf.output(output, 'S')
-    output.seek(0)
-    
-    return send_file(output, mimetype='application/pdf', 
-                    as_attachment=True, download_name=f'{quiz.title}.pdf')
-
-def generate_docx(quiz, questions):
-    if not DOCX_AVAILABLE:
-        return jsonify({'error': 'Word generation not available'}), 500
-        
-    doc = Document()
-    doc.add_heading(f'Quiz: {quiz.title}', 0)
-    
-    doc.add_paragraph(f'Subject: {quiz.subject}')
-    doc.add_paragraph(f'Topic: {quiz.topic}')
-    doc.add_paragraph(f'Difficulty: {quiz.difficulty}')
-    
-    for i, q in enumerate(questions, 1):
-        doc.add_heading(f'Question {i}', level=2)
-        doc.add_paragraph(q['question'])
-        
-        for j, option in enumerate(q['options']):
-            marker = '[X]' if j == q['correct_answer'] else '[ ]'
-            doc.add_paragraph(f'{marker} {chr(65+j)}) {option}')
-        
-        doc.add_paragraph(f'Explanation: {q["explanation"]}')
-    
-    output = io.BytesIO()
-    doc.save(output)
-    output.seek(0)
-    
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                    as_attachment=True, download_name=f'{quiz.title}.docx')
-
-def generate_xlsx(quiz, questions):
-    if not XLSX_AVAILABLE:
-        return jsonify({'error': 'Excel generation not available'}), 500
-        
-    data = []
-    for i, q in enumerate(questions, 1):
-        data.append({
-            'Question_Number': i,
-            'Question': q['question'],
-            'Option_A': q['options'][0],
-            'Option_B': q['options'][1],
-            'Option_C': q['options'][2],
-            'Option_D': q['options'][3],
-            'Correct_Answer': chr(65 + q['correct_answer']),
-            'Explanation': q['explanation']
-        })
-    
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    df.to_excel(output, index=False, sheet_name=quiz.title[:31])
-    output.seek(0)
+EXPORT_TEMPLATE_VERSION = '3'  # bump whenever a renderer's layout changes
+
+export_cache = None  # ExportCache, created by init_services()
+
+def quiz_export_document(quiz):
+    """ExportDocument for a quiz, streaming its questions from the database"""
+    return ExportDocument(quiz.title, quiz.subject, quiz.topic, quiz.difficulty, iter_quiz_questions(quiz.id))
+
+def quiz_export_cache_key(quiz, format):
+    """Export cache key / ETag for a quiz; rows init_db has not hashed yet are hashed here without saving"""
+    content_hash = quiz.content_hash or compute_quiz_content_hash(quiz, iter_quiz_questions(quiz.id))
+    return export_cache_key(quiz.id, content_hash, format, EXPORT_TEMPLATE_VERSION)
+
+def render_quiz_export(quiz, format):
+    """Rendered document for a quiz from the export cache: ('memory', bytes) or ('disk', path).
     
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True, download_name=f'{quiz.title}.xlsx')
+    Questions are streamed to the renderer and the renderer writes straight
+    into the cache file, so a miss never builds the whole document in memory
+    on our side (the XLSX writer keeps memory flat end to end).
+    """
+    return export_cache.get_or_render(
+        quiz_export_cache_key(quiz, format),
+        lambda output: render_export_timed(format, quiz_export_document(quiz), output)
+    )
+
+def render_export_timed(format, document, output):
+    """Render an export document, recording how long it took per format"""
+    with EXPORT_RENDER_SECONDS.time(format=format):
+        return EXPORT_ENGINE.render(format, document, output)
 
 # Add download endpoint
-@app.route('/api/quiz/<int:quiz_id>/download/<format>', methods=['GET'])
+@api.route('/api/quiz/<int:quiz_id>/download/<format>', methods=['GET'])
+@auth_required
 def download_quiz(quiz_id, format):
+    """Download a quiz document; repeat downloads are served from the export cache.
+    
+    Responses carry an ETag, and If-None-Match requests for an unchanged
+    document get a 304 without touching the renderer or the cache.
+    """
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
         
         quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
         if not quiz:
             return jsonify({'error': 'Quiz not found'}), 404
-            
-        questions = json.loads(quiz.questions)
-        
-        if format == 'pdf':
-            return generate_pdf(quiz, questions)
-        elif format == 'docx':
-            return generate_docx(quiz, questions)
-        elif format == 'xlsx':
-            return generate_xlsx(quiz, questions)
-        else:
+        
+        if not EXPORT_ENGINE.supports(format):
             return jsonify({'error': 'Unsupported format'}), 400
+        if not EXPORT_ENGINE.available(format):
+            return jsonify({'error': f'{format.upper()} generation not available'}), 500
+        
+        etag = quiz_export_cache_key(quiz, format)
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        tier, value = render_quiz_export(quiz, format)
+        response = send_file(
+            io.BytesIO(value) if tier == 'memory' else value,
+            mimetype=EXPORT_ENGINE.mimetype(format),
+            as_attachment=True,
+            download_name=f'{quiz.title}.{format}',
+            etag=etag,
+            conditional=True
+        )
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+def get_export_executor():
+    """Shared worker pool for bulk export rendering, created on first use"""
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            workers = max(current_app.config['EXPORT_WORKERS'], 1)
+            _export_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-export')
+        return _export_executor
+
+def export_archive_name(quiz_id, title, format):
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', title or '').strip('_.')[:60] or 'quiz'
+    return f'{quiz_id}_{slug}.{format}'
+
+def render_archive_entry(app, item):
+    """Export-pool worker: one (arcname, bytes or open file) archive entry, or None if the quiz is gone"""
+    quiz_id, format = item
+    with app.app_context():
+        quiz = db.session.get(Quiz, quiz_id)
+        if quiz is None:
+            return None
+        name = export_archive_name(quiz.id, quiz.title, format)
+        try:
+            tier, value = render_quiz_export(quiz, format)
+        except Exception as e:
+            log.exception('bulk export entry failed', extra={'quiz_id': quiz_id, 'format': format})
+            return f'{name}.error.txt', f'Export failed: {e}\n'.encode()
+    # Open cached files here: the handle stays readable even if the cache evicts the file meanwhile
+    return name, value if tier == 'memory' else open(value, 'rb')
+
+def discard_archive_entry(entry):
+    if entry is not None and hasattr(entry[1], 'close'):
+        entry[1].close()
+
+@api.route('/api/quizzes/export', methods=['GET'])
+@auth_required
+def export_quizzes_archive():
+    """Stream every quiz the user owns, in each requested format, as one ZIP archive.
+    
+    Documents render in parallel on the export pool (reusing the export cache)
+    and are written to the archive as they finish. At most EXPORT_MAX_IN_FLIGHT
+    rendered documents wait at a time and the archive itself is never buffered.
+    """
+    try:
+        user_id = g.principal.user_id
+        
+        formats = request.args.get('formats')
+        formats = [f for f in formats.split(',') if f] if formats else [
+            f for f in EXPORT_ENGINE.formats() if EXPORT_ENGINE.available(f)
+        ]
+        for format in formats:
+            if not EXPORT_ENGINE.supports(format):
+                return jsonify({'error': f'Unsupported format: {format}'}), 400
+            if not EXPORT_ENGINE.available(format):
+                return jsonify({'error': f'{format.upper()} generation not available'}), 500
+        
+        quiz_ids = [row.id for row in db.session.query(Quiz.id).filter_by(user_id=user_id).order_by(Quiz.id)]
+        items = [(quiz_id, format) for quiz_id in quiz_ids for format in formats]
+        log.info('bulk export started', extra={'user_id': user_id, 'quizzes': len(quiz_ids), 'formats': formats})
+        
+        # The response body is produced after the request context is gone
+        executor = get_export_executor()
+        render = partial(render_archive_entry, current_app._get_current_object())
+        max_in_flight = max(current_app.config['EXPORT_MAX_IN_FLIGHT'], 1)
+        
+        def generate():
+            entries = map_as_completed(executor, render, items, max_in_flight, discard=discard_archive_entry)
+            try:
+                yield from stream_zip(entry for entry in entries if entry is not None)
+            finally:
+                entries.close()
+        
+        response = current_app.response_class(generate(), mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=quizzes.zip'
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def create_quiz_for_user(user_id, quiz_data):
+    """Generate and store a quiz; returns the API representation of the new quiz"""
+    log.info('creating quiz', extra={'title': quiz_data.get('title'), 'user_id': user_id})
+    
+    # Use enhanced AI question generation with references
+    questions = generate_advanced_ai_questions_with_references(quiz_data)
+    
+    quiz = Quiz(
+        user_id=user_id,
+        title=quiz_data.get('title'),
+        subject=quiz_data.get('subject'),
+        topic=quiz_data.get('topic'),
+        difficulty=quiz_data.get('difficulty'),
+        question_count=len(questions)
+    )
+    quiz.content_hash = compute_quiz_content_hash(quiz, questions)
+    
+    db.session.add(quiz)
+    db.session.flush()
+    save_quiz_questions(quiz.id, questions)
+    insert_quiz_stats(quiz.id, [q['id'] for q in questions])
+    db.session.commit()
+    
+    log.info('quiz created', extra={'quiz_id': quiz.id, 'questions': len(questions)})
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'subject': quiz.subject,
+        'topic': quiz.topic,
+        'difficulty': quiz.difficulty,
+        'questions': questions,
+        'created_at': quiz.created_at.isoformat(),
+        'ai_powered': True,
+        'verified': True,
+        'knowledge_domains': list(set([q.get('domain', 'general') for q in questions])),
+        'reference_count': sum(len(q.get('references', [])) for q in questions)
+    }
+
 # Update the existing quiz creation endpoint
-@app.route('/api/quiz', methods=['POST'])
+@api.route('/api/quiz', methods=['POST'])
+@auth_required
 def create_quiz():
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
         
         quiz_data = request.get_json()
-        print(f"🤖 Creating verified AI quiz with references: {quiz_data.get('title')} by user {user_id}")
+        return jsonify(create_quiz_for_user(user_id, quiz_data))
         
-        # Use enhanced AI question generation with references
-        questions = generate_advanced_ai_questions_with_references(quiz_data)
+    except Exception as e:
+        log.exception('create quiz failed')
+        return jsonify({'error': str(e)}), 500
+
+BATCH_REQUIRED_FIELDS = ('title', 'subject', 'topic', 'difficulty')
+
+_generation_executor = None
+_generation_executor_lock = threading.Lock()
+
+def get_generation_executor():
+    """Shared worker pool for question generation, created on first use"""
+    global _generation_executor
+    with _generation_executor_lock:
+        if _generation_executor is None:
+            workers = max(current_app.config['BATCH_GENERATION_WORKERS'], 1)
+            if current_app.config['BATCH_GENERATION_EXECUTOR'] == 'process':
+                _generation_executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _generation_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-generation')
+        return _generation_executor
+
+@api.route('/api/quizzes/batch', methods=['POST'])
+@auth_required
+def create_quizzes_batch():
+    """Create many quizzes in one request.
+    
+    Generation fans out over the worker pool; every successfully generated quiz
+    is inserted in a single transaction. Returns a status for each spec.
+    """
+    try:
+        user_id = g.principal.user_id
+        
+        specs = (request.get_json() or {}).get('quizzes')
+        if not isinstance(specs, list) or not specs:
+            return jsonify({'error': 'Expected a non-empty "quizzes" list'}), 400
+        if len(specs) > current_app.config['BATCH_MAX_QUIZZES']:
+            return jsonify({'error': f"At most {current_app.config['BATCH_MAX_QUIZZES']} quizzes per batch"}), 400
+        
+        log.info('batch quiz creation started', extra={'user_id': user_id, 'quizzes': len(specs)})
+        
+        results = [None] * len(specs)
+        futures = {}
+        executor = get_generation_executor()
+        for index, spec in enumerate(specs):
+            if not isinstance(spec, dict):
+                results[index] = {'index': index, 'status': 'error', 'error': 'Quiz spec must be an object'}
+                continue
+            missing = [field for field in BATCH_REQUIRED_FIELDS if not spec.get(field)]
+            if missing:
+                results[index] = {'index': index, 'status': 'error', 'error': f"Missing fields: {', '.join(missing)}"}
+                continue
+            futures[index] = executor.submit(generate_advanced_ai_questions_with_references, spec)
+        
+        generated = []
+        for index, future in futures.items():
+            try:
+                generated.append((index, specs[index], future.result()))
+            except Exception as e:
+                results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+        
+        # One transaction for every quiz row and its questions
+        quizzes = [
+            Quiz(
+                user_id=user_id,
+                title=spec['title'],
+                subject=spec['subject'],
+                topic=spec['topic'],
+                difficulty=spec['difficulty'],
+                question_count=len(questions)
+            )
+            for _, spec, questions in generated
+        ]
+        for quiz, (_, _, questions) in zip(quizzes, generated):
+            quiz.content_hash = compute_quiz_content_hash(quiz, questions)
+        if quizzes:
+            db.session.add_all(quizzes)
+            db.session.flush()
+            for quiz, (_, _, questions) in zip(quizzes, generated):
+                save_quiz_questions(quiz.id, questions)
+                insert_quiz_stats(quiz.id, [q['id'] for q in questions])
+            db.session.commit()
+        
+        for quiz, (index, _, _) in zip(quizzes, generated):
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'id': quiz.id,
+                'title': quiz.title,
+                'question_count': quiz.question_count,
+                'created_at': quiz.created_at.isoformat()
+            }
         
-        quiz = Quiz(
-            user_id=user_id,
-            title=quiz_data.get('title'),
-            subject=quiz_data.get('subject'),
-            topic=quiz_data.get('topic'),
-            difficulty=quiz_data.get('difficulty'),
-            questions=json.dumps(questions)
-        )
+        created = len(quizzes)
+        log.info('batch quiz creation finished', extra={'quizzes_created': created, 'quizzes_failed': len(specs) - created})
+        return jsonify({
+            'created': created,
+            'failed': len(specs) - created,
+            'results': results
+        })
         
-        db.session.add(quiz)
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.exception('batch quiz creation failed')
+        return jsonify({'error': str(e)}), 500
+
+job_queue = JobQueue(None, db, Job)  # bound to the app by init_services()
+
+@job_queue.handler('generate_quiz')
+def run_generate_quiz_job(payload, user_id):
+    return create_quiz_for_user(user_id, payload)
+
+@job_queue.handler('export_quiz')
+def run_export_quiz_job(payload, user_id):
+    quiz = Quiz.query.filter_by(id=payload['quiz_id'], user_id=user_id).first()
+    if not quiz:
+        raise ValueError('Quiz not found')
+    
+    if not EXPORT_ENGINE.available(payload['format']):
+        raise RuntimeError(f"{payload['format'].upper()} generation not available")
+    
+    tier, value = render_quiz_export(quiz, payload['format'])
+    os.makedirs(current_app.config['JOB_RESULTS_DIR'], exist_ok=True)
+    path = os.path.join(current_app.config['JOB_RESULTS_DIR'], f"{payload['job_token']}.{payload['format']}")
+    if tier == 'memory':
+        with open(path, 'wb') as f:
+            f.write(value)
+    else:
+        shutil.copyfile(value, path)
+    
+    return {
+        'file': os.path.basename(path),
+        'filename': f"{quiz.title}.{payload['format']}",
+        'mimetype': EXPORT_ENGINE.mimetype(payload['format'])
+    }
+
+def remove_job_result_file(job):
+    """Delete the rendered file of an export job that is being purged"""
+    if job.kind == 'export_quiz' and job.result:
+        path = os.path.join(current_app.config['JOB_RESULTS_DIR'], json.loads(job.result)['file'])
+        if os.path.exists(path):
+            os.remove(path)
+
+def recover_jobs():
+    """Reschedule jobs whose owner died (lease expired) and purge expired ones"""
+    return job_queue.recover(
+        retention=datetime.timedelta(hours=current_app.config['JOB_RETENTION_HOURS']),
+        on_purge=remove_job_result_file
+    )
+
+def job_status_payload(job):
+    status = {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    if job.progress:
+        status['progress'] = json.loads(job.progress)
+    if job.status == 'failed':
+        status['error'] = job.error
+    if job.status == 'succeeded':
+        status['result_url'] = f'/api/jobs/{job.id}/result'
+    return status
+
+@job_queue.handler('regrade_quiz')
+def run_regrade_quiz_job(payload, user_id):
+    if not db.session.query(Quiz.id).filter_by(id=payload['quiz_id'], user_id=user_id).first():
+        raise ValueError('Quiz not found')
+    return regrade_quiz_attempts(payload['quiz_id'], payload.get('chunk_size', 1000), job_queue.report_progress)
+
+@api.route('/api/jobs/quiz', methods=['POST'])
+@auth_required
+def submit_quiz_generation_job():
+    """Queue quiz generation; returns a job id to poll instead of blocking the request"""
+    try:
+        user_id = g.principal.user_id
         
-        print(f"✅ Verified AI Quiz created: {quiz.title} with {len(questions)} questions and references")
-        return jsonify({
-            'id': quiz.id,
-            'title': quiz.title,
-            'subject': quiz.subject,
-            'topic': quiz.topic,
-            'difficulty': quiz.difficulty,
-            'questions': questions,
-            'created_at': quiz.created_at.isoformat(),
-            'ai_powered': True,
-            'verified': True,
-            'knowledge_domains': list(set([q.get('domain', 'general') for q in questions])),
-            'reference_count': sum(len(q.get('references', [])) for q in questions)
+        job_id = job_queue.submit('generate_quiz', user_id, request.get_json() or {})
+        return jsonify({'job_id': job_id, 'status': 'pending', 'status_url': f'/api/jobs/{job_id}'}), 202
+        
+    except Exception as e:
+        log.exception('submit generation job failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/jobs/quiz/<int:quiz_id>/export/<format>', methods=['POST'])
+@auth_required
+def submit_quiz_export_job(quiz_id, format):
+    """Queue rendering of a quiz document; the file is fetched from the job result"""
+    try:
+        user_id = g.principal.user_id
+        
+        if not EXPORT_ENGINE.supports(format):
+            return jsonify({'error': 'Unsupported format'}), 400
+        if not db.session.query(Quiz.id).filter_by(id=quiz_id, user_id=user_id).first():
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        job_id = job_queue.submit('export_quiz', user_id, {
+            'quiz_id': quiz_id,
+            'format': format,
+            'job_token': os.urandom(16).hex()
         })
+        return jsonify({'job_id': job_id, 'status': 'pending', 'status_url': f'/api/jobs/{job_id}'}), 202
         
     except Exception as e:
-        print(f"❌ Verified AI Quiz creation error: {e}")
+        log.exception('submit export job failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/quiz/<int:quiz_id>/regrade', methods=['POST'])
+@auth_required
+def regrade_quiz(quiz_id):
+    """Optionally correct the answer key, then re-score all attempts in a background job.
+    
+    Body: {"corrections": {"<question id>": <option index>}, "chunk_size": 1000};
+    both fields are optional. Poll the returned job for progress.
+    """
+    try:
+        user_id = g.principal.user_id
+        
+        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        if not quiz:
+            return jsonify({'error': 'Quiz not found or access denied'}), 403
+        
+        body = request.get_json(silent=True) or {}
+        chunk_size = body.get('chunk_size', 1000)
+        if type(chunk_size) is not int or chunk_size < 1:
+            return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+        
+        corrected = 0
+        if body.get('corrections'):
+            try:
+                corrected = apply_answer_key_corrections(quiz, body['corrections'])
+            except (ValueError, AttributeError) as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
+            log.info('answer key corrected', extra={'quiz_id': quiz_id, 'corrected': corrected})
+        
+        job_id = job_queue.submit('regrade_quiz', user_id, {'quiz_id': quiz_id, 'chunk_size': chunk_size})
+        return jsonify({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': f'/api/jobs/{job_id}',
+            'corrected_questions': corrected
+        }), 202
+        
+    except Exception as e:
+        log.exception('regrade quiz failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+@auth_required
+def get_job_status(job_id):
+    """Job status; pass ?wait=<seconds> to long-poll until the job finishes"""
+    try:
+        user_id = g.principal.user_id
+        
+        try:
+            wait = min(float(request.args.get('wait', 0)), current_app.config['JOB_MAX_WAIT_SECONDS'])
+        except ValueError:
+            return jsonify({'error': 'wait must be a number'}), 400
+        
+        job = db.session.get(Job, job_id)
+        if not job or job.user_id != user_id:
+            return jsonify({'error': 'Job not found'}), 404
+        if wait > 0 and job.status not in FINISHED_STATUSES:
+            job = job_queue.wait(job_id, wait)
+        
+        return jsonify(job_status_payload(job))
+        
+    except Exception as e:
+        log.exception('get job status failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/jobs/<job_id>/result', methods=['GET'])
+@auth_required
+def get_job_result(job_id):
+    """Result of a finished job: the quiz JSON, or the rendered file for exports"""
+    try:
+        user_id = g.principal.user_id
+        
+        job = db.session.get(Job, job_id)
+        if not job or job.user_id != user_id:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.status != 'succeeded':
+            return jsonify(job_status_payload(job)), 409
+        
+        result = json.loads(job.result)
+        if job.kind == 'export_quiz':
+            return send_file(os.path.join(current_app.config['JOB_RESULTS_DIR'], result['file']),
+                             mimetype=result['mimetype'], as_attachment=True, download_name=result['filename'])
+        return jsonify(result)
+        
+    except Exception as e:
+        log.exception('get job result failed')
         return jsonify({'error': str(e)}), 500
 
 # Keep all your other existing endpoints (health_check, login, register, get_quizzes, download functions, etc.)
-@app.route('/', methods=['GET'])
+@api.route('/', methods=['GET'])
 def health_check():
     return jsonify({
         'message': 'Quizgenix Advanced AI Backend is running! 🤖',
         'status': 'healthy',
         'version': '2.0.0',
         'features': ['Advanced AI Question Generation', 'Knowledge Base Matching', 'Logical Answer Distribution'],
-        'supported_domains': list(TOPIC_FOCUSED_KNOWLEDGE_BASE.keys())  # Fixed this line
+        'supported_domains': KNOWLEDGE_BASE.topic_keys()
     })
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
-        print(f"🔐 Login attempt: {data.get('email')}")
+        log.debug('login attempt', extra={'email': data.get('email')})
         
         user = User.query.filter_by(email=data.get('email')).first()
         
@@ -1084,9 +1972,9 @@ def login():
             token = jwt.encode({
                 'user_id': user.id,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
-            }, app.config['SECRET_KEY'], algorithm='HS256')
+            }, current_app.config['SECRET_KEY'], algorithm='HS256')
             
-            print(f"✅ Login successful: {user.email}")
+            log.info('login succeeded', extra={'user_id': user.id})
             return jsonify({
                 'message': 'Login successful',
                 'token': token,
@@ -1098,18 +1986,18 @@ def login():
                 }
             })
         else:
-            print(f"❌ Invalid credentials for: {data.get('email')}")
+            log.warning('login failed: invalid credentials', extra={'email': data.get('email')})
             return jsonify({'error': 'Invalid email or password'}), 401
             
     except Exception as e:
-        print(f"❌ Login error: {e}")
+        log.exception('login failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
-        print(f"📝 Registration attempt: {data.get('email')}")
+        log.debug('registration attempt', extra={'email': data.get('email')})
         
         if User.query.filter_by(email=data.get('email')).first():
             return jsonify({'error': 'Email already exists'}), 400
@@ -1127,9 +2015,9 @@ def register():
         token = jwt.encode({
             'user_id': user.id,
             'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        }, current_app.config['SECRET_KEY'], algorithm='HS256')
         
-        print(f"✅ Registration successful: {user.email}")
+        log.info('user registered', extra={'user_id': user.id, 'role': user.role})
         return jsonify({
             'message': 'Registration successful',
             'token': token,
@@ -1142,51 +2030,147 @@ def register():
         })
         
     except Exception as e:
-        print(f"❌ Registration error: {e}")
+        log.exception('registration failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/quizzes', methods=['GET'])
+QUIZ_LIST_FIELDS = ('id', 'title', 'subject', 'topic', 'difficulty', 'question_count', 'created_at', 'questions')
+QUIZ_LIST_DEFAULT_FIELDS = ('id', 'title', 'subject', 'topic', 'difficulty', 'question_count', 'created_at')
+QUIZ_LIST_DEFAULT_LIMIT = 20
+QUIZ_LIST_MAX_LIMIT = 100
+
+def encode_keyset_cursor(timestamp, row_id):
+    """Encode a keyset position on (timestamp, id) as an opaque cursor"""
+    return base64.urlsafe_b64encode(f'{timestamp.isoformat()}|{row_id}'.encode()).decode()
+
+def decode_keyset_cursor(cursor):
+    """Decode a cursor produced by encode_keyset_cursor, raising ValueError if malformed"""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+@api.route('/api/quizzes', methods=['GET'])
+@auth_required
 def get_quizzes():
+    """List the user's quizzes newest first, one keyset page at a time.
+    
+    Query parameters: ``limit`` (default 20, max 100), ``cursor`` (``next_cursor``
+    from the previous page) and ``fields`` (comma-separated; questions are only
+    included when explicitly requested).
+    """
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
+        
+        fields_param = request.args.get('fields')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            unknown = [f for f in fields if f not in QUIZ_LIST_FIELDS]
+            if unknown:
+                return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+        else:
+            fields = list(QUIZ_LIST_DEFAULT_FIELDS)
+        
+        try:
+            limit = min(max(int(request.args.get('limit', QUIZ_LIST_DEFAULT_LIMIT)), 1), QUIZ_LIST_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        # Only the requested scalar columns are selected; id and created_at drive the cursor
+        columns = [Quiz.id, Quiz.created_at] + [
+            getattr(Quiz, f) for f in fields if f not in ('id', 'created_at', 'questions')
+        ]
+        query = db.session.query(*columns).filter(Quiz.user_id == user_id)
         
-        quizzes = Quiz.query.filter_by(user_id=user_id).order_by(Quiz.created_at.desc()).all()
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_keyset_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(db.tuple_(Quiz.created_at, Quiz.id) < db.tuple_(cursor_created_at, cursor_id))
+        
+        rows = query.order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         quiz_list = []
-        for quiz in quizzes:
-            quiz_list.append({
-                'id': quiz.id,
-                'title': quiz.title,
-                'subject': quiz.subject,
-                'topic': quiz.topic,
-                'difficulty': quiz.difficulty,
-                'questions': json.loads(quiz.questions),
-                'created_at': quiz.created_at.isoformat()
-            })
+        for row in rows:
+            item = {}
+            for field in fields:
+                if field == 'questions':
+                    item['questions'] = load_quiz_questions(row.id, include_metadata=True)
+                elif field == 'created_at':
+                    item['created_at'] = row.created_at.isoformat()
+                else:
+                    item[field] = getattr(row, field)
+            quiz_list.append(item)
+        
+        return jsonify({
+            'quizzes': quiz_list,
+            'has_more': has_more,
+            'next_cursor': encode_keyset_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        })
         
-        return jsonify({'quizzes': quiz_list})
+    except Exception as e:
+        log.exception('get quizzes failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/quiz/<int:quiz_id>', methods=['GET'])
+@auth_required
+def get_quiz(quiz_id):
+    """Get a single quiz with its questions (for previews)"""
+    try:
+        user_id = g.principal.user_id
+        
+        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        return jsonify({
+            'id': quiz.id,
+            'title': quiz.title,
+            'subject': quiz.subject,
+            'topic': quiz.topic,
+            'difficulty': quiz.difficulty,
+            'question_count': quiz.question_count,
+            'questions': load_quiz_questions(quiz.id, include_metadata=True),
+            'created_at': quiz.created_at.isoformat()
+        })
         
     except Exception as e:
-        print(f"❌ Get quizzes error: {e}")
+        log.exception('get quiz failed')
         return jsonify({'error': str(e)}), 500
 
 # Add these endpoints after your existing routes
 
-@app.route('/api/quiz/<int:quiz_id>/start', methods=['POST'])
+def session_expiry_timestamp(expires_at):
+    """Convert a naive UTC expires_at column value to a unix timestamp"""
+    return expires_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+def checkpoint_session(session_token, state):
+    """Merge the answers held in the session store into the QuizSession row.
+    
+    The row's answers are updated rather than replaced, so answers another
+    process checkpointed for the same session are never overwritten.
+    """
+    session = QuizSession.query.filter_by(session_token=session_token, is_active=True).first()
+    if session is not None:
+        answers = json.loads(session.answers_so_far or '{}')
+        answers.update(state.answers)
+        session.answers_so_far = json.dumps(answers)
+        session.current_question = max(session.current_question or 0, state.current_question)
+        db.session.commit()
+    session_store.mark_checkpointed(session_token)
+
+session_store = None  # created by init_services()
+
+@api.route('/api/quiz/<int:quiz_id>/start', methods=['POST'])
+@auth_required
 def start_quiz(quiz_id):
     """Start a new quiz session for a student"""
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
         
         # Get the quiz
         quiz = Quiz.query.get(quiz_id)
@@ -1201,11 +2185,12 @@ def start_quiz(quiz_id):
         ).first()
         
         if existing_session and existing_session.expires_at > datetime.datetime.utcnow():
+            state = session_store.get(existing_session.session_token)
             return jsonify({
                 'message': 'Quiz session already active',
                 'session_token': existing_session.session_token,
                 'expires_at': existing_session.expires_at.isoformat(),
-                'current_question': existing_session.current_question
+                'current_question': state.current_question if state else existing_session.current_question
             })
         
         # Create new session
@@ -1214,7 +2199,7 @@ def start_quiz(quiz_id):
             'quiz_id': quiz_id,
             'session_id': random.randint(10000, 99999),
             'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=2)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        }, current_app.config['SECRET_KEY'], algorithm='HS256')
         
         quiz_session = QuizSession(
             user_id=user_id,
@@ -1225,9 +2210,10 @@ def start_quiz(quiz_id):
         
         db.session.add(quiz_session)
         db.session.commit()
+        session_store.start(session_token, {}, 0, session_expiry_timestamp(quiz_session.expires_at))
         
-        # Get quiz questions without showing correct answers
-        questions = json.loads(quiz.questions)
+        # Get quiz questions without showing correct answers (never selected from the DB)
+        questions = load_quiz_questions(quiz.id, include_answers=False)
         quiz_data = {
             'id': quiz.id,
             'title': quiz.title,
@@ -1235,18 +2221,10 @@ def start_quiz(quiz_id):
             'topic': quiz.topic,
             'difficulty': quiz.difficulty,
             'total_questions': len(questions),
-            'questions': [
-                {
-                    'id': q['id'],
-                    'question': q['question'],
-                    'options': q['options']
-                    # Don't include correct_answer or explanation
-                }
-                for q in questions
-            ]
+            'questions': questions
         }
         
-        print(f"🎯 Quiz session started: {quiz.title} for user {user_id}")
+        log.info('quiz session started', extra={'quiz_id': quiz.id, 'user_id': user_id})
         return jsonify({
             'message': 'Quiz session started',
             'session_token': session_token,
@@ -1256,43 +2234,57 @@ def start_quiz(quiz_id):
         })
         
     except Exception as e:
-        print(f"❌ Start quiz error: {e}")
+        log.exception('start quiz failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/quiz/session/<session_token>/answer', methods=['POST'])
+@api.route('/api/quiz/session/<session_token>/answer', methods=['POST'])
 def submit_answer(session_token):
-    """Submit answer for current question"""
+    """Submit answer for current question.
+    
+    Answers go to the session store; the QuizSession row is only written every
+    SESSION_CHECKPOINT_EVERY answers and on submit_quiz.
+    """
     try:
-        # Verify session
-        session = QuizSession.query.filter_by(session_token=session_token, is_active=True).first()
-        if not session or session.expires_at < datetime.datetime.utcnow():
+        # Verify session (the database is only consulted when the store has no state for it)
+        state = session_store.get(session_token)
+        rebuilt = state is None
+        if rebuilt:
+            session = QuizSession.query.filter_by(session_token=session_token, is_active=True).first()
+            if not session or session.expires_at < datetime.datetime.utcnow():
+                return jsonify({'error': 'Invalid or expired session'}), 401
+            state = session_store.start(
+                session_token,
+                json.loads(session.answers_so_far),
+                session.current_question,
+                session_expiry_timestamp(session.expires_at)
+            )
+        elif state.expired:
             return jsonify({'error': 'Invalid or expired session'}), 401
         
         data = request.get_json()
         question_id = data.get('question_id')
         selected_answer = data.get('answer')  # 0, 1, 2, or 3
         
-        # Update session with answer
-        current_answers = json.loads(session.answers_so_far)
-
-        current_answers[str(question_id)] = selected_answer
-        
-        session.answers_so_far = json.dumps(current_answers)
-        session.current_question = max(session.current_question, question_id)
+        state = session_store.record_answer(session_token, question_id, selected_answer)
+        if state is None:
+            return jsonify({'error': 'Invalid or expired session'}), 401
         
-        db.session.commit()
+        # A state rebuilt from the row is checkpointed straight away, so the answer is
+        # durable even if this process holds the session only briefly
+        if rebuilt or state.pending_writes >= current_app.config['SESSION_CHECKPOINT_EVERY']:
+            checkpoint_session(session_token, state)
         
         return jsonify({
             'message': 'Answer submitted',
             'question_id': question_id,
-            'total_answered': len(current_answers)
+            'total_answered': len(state.answers)
         })
         
     except Exception as e:
-        print(f"❌ Submit answer error: {e}")
+        log.exception('submit answer failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/quiz/session/<session_token>/submit', methods=['POST'])
+@api.route('/api/quiz/session/<session_token>/submit', methods=['POST'])
 def submit_quiz(session_token):
     """Submit entire quiz and calculate results"""
     try:
@@ -1303,57 +2295,64 @@ def submit_quiz(session_token):
         
         # Get quiz and questions
         quiz = Quiz.query.get(session.quiz_id)
-        questions = json.loads(quiz.questions)
+        questions = load_quiz_questions(quiz.id)
         user_answers = json.loads(session.answers_so_far)
         
-        # Calculate score
-        correct_count = 0
-        detailed_results = []
-        
-        for question in questions:
-            q_id = str(question['id'])
-            user_answer = user_answers.get(q_id)
-            correct_answer = question['correct_answer']
-            is_correct = user_answer == correct_answer
-            
-            if is_correct:
-                correct_count += 1
-            
-            detailed_results.append({
-                'question_id': question['id'],
-                'question': question['question'],
-                'options': question['options'],
-                'user_answer': user_answer,
-                'correct_answer': correct_answer,
-                'is_correct': is_correct,
-                'explanation': question.get('explanation', ''),
-                'references': question.get('references', [])
-            })
-        
-        # Calculate time taken
+        # Merge answers that have not been checkpointed yet
+        state = session_store.get(session_token)
+        if state is not None:
+            user_answers.update(state.answers)
+            session.current_question = max(session.current_question, state.current_question)
+        answers_json = json.dumps(user_answers)
+        
+        # Calculate score against the cached answer key
+        answer_key = load_answer_key(quiz, questions)
+        correct_count, correct_mask = answer_key.score(user_answers)
+        
+        detailed_results = [{
+            'question_id': question['id'],
+            'question': question['question'],
+            'options': question['options'],
+            'user_answer': user_answers.get(str(question['id'])),
+            'correct_answer': question['correct_answer'],
+            'is_correct': bool(is_correct),
+            'explanation': question.get('explanation', ''),
+            'references': question.get('references', [])
+        } for question, is_correct in zip(questions, correct_mask.tolist())]
+        
+        # Calculate time taken, percentage and grade
         time_taken = int((datetime.datetime.utcnow() - session.started_at).total_seconds())
+        percentage, grade = attempt_grade(correct_count, len(questions))
         
         # Save quiz attempt
         quiz_attempt = QuizAttempt(
             user_id=session.user_id,
             quiz_id=session.quiz_id,
-            answers=session.answers_so_far,
+            answers=answers_json,
             score=correct_count,
             total_questions=len(questions),
-            time_taken=time_taken
+            time_taken=time_taken,
+            percentage=percentage,
+            grade=grade
         )
         
         # Deactivate session
+        session.answers_so_far = answers_json
         session.is_active = False
         
         db.session.add(quiz_attempt)
+        stats_recorded = record_attempt_stats(quiz.id, answer_key, correct_count, correct_mask, time_taken)
         db.session.commit()
+        session_store.discard(session_token)
+        if not stats_recorded:
+            try:
+                rebuild_quiz_stats(quiz.id)
+            except Exception as e:
+                # Another submission rebuilt them concurrently; its rows include this attempt
+                db.session.rollback()
+                log.warning('quiz stats rebuild skipped', extra={'quiz_id': quiz.id, 'error': str(e)})
         
-        # Calculate percentage and grade
-        percentage = round((correct_count / len(questions)) * 100, 1)
-        grade = 'A' if percentage >= 90 else 'B' if percentage >= 80 else 'C' if percentage >= 70 else 'D' if percentage >= 60 else 'F'
-        
-        print(f"🏆 Quiz submitted: {quiz.title} - Score: {correct_count}/{len(questions)} ({percentage}%)")
+        log.info('quiz submitted', extra={'quiz_id': quiz.id, 'score': correct_count, 'total_questions': len(questions)})
         
         return jsonify({
             'message': 'Quiz submitted successfully',
@@ -1374,96 +2373,278 @@ def submit_quiz(session_token):
         })
         
     except Exception as e:
-        print(f"❌ Submit quiz error: {e}")
+        log.exception('submit quiz failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/quiz/<int:quiz_id>/attempts', methods=['GET'])
+ATTEMPTS_DEFAULT_LIMIT = 50
+ATTEMPTS_MAX_LIMIT = 200
+
+def quiz_attempts_query(quiz_id):
+    """One SELECT for a page of a quiz's attempts with the students' names.
+    
+    Stored percentage and grade are read as-is, and ordering on
+    (completed_at, id) follows ix_quiz_attempt_quiz_completed.
+    """
+    return (db.session.query(
+                QuizAttempt.id, QuizAttempt.score, QuizAttempt.total_questions, QuizAttempt.percentage,
+                QuizAttempt.grade, QuizAttempt.time_taken, QuizAttempt.completed_at, User.name, User.email)
+            .join(User, User.id == QuizAttempt.user_id)
+            .filter(QuizAttempt.quiz_id == quiz_id))
+
+@api.route('/api/quiz/<int:quiz_id>/attempts', methods=['GET'])
+@auth_required
 def get_quiz_attempts(quiz_id):
-    """Get all attempts for a specific quiz (for lecturers)"""
+    """Attempts at one of the lecturer's quizzes, newest first, one keyset page at a time.
+    
+    Query parameters: ``limit`` (default 50, max 200) and ``cursor``
+    (``next_cursor`` from the previous page). Aggregates are served by
+    /api/quiz/<id>/stats.
+    """
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
         
         # Check if user is lecturer and owns the quiz
-        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        quiz = db.session.query(Quiz.id, Quiz.title).filter_by(id=quiz_id, user_id=user_id).first()
         if not quiz:
             return jsonify({'error': 'Quiz not found or access denied'}), 403
         
-        attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id).join(User).all()
+        try:
+            limit = min(max(int(request.args.get('limit', ATTEMPTS_DEFAULT_LIMIT)), 1), ATTEMPTS_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        query = quiz_attempts_query(quiz_id)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_completed_at, cursor_id = decode_keyset_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(
+                db.tuple_(QuizAttempt.completed_at, QuizAttempt.id) < db.tuple_(cursor_completed_at, cursor_id)
+            )
+        
+        rows = query.order_by(QuizAttempt.completed_at.desc(), QuizAttempt.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         attempt_list = []
-        for attempt in attempts:
+        for row in rows:
+            percentage, grade = row.percentage, row.grade
+            if percentage is None:
+                percentage, grade = attempt_grade(row.score, row.total_questions)
             attempt_list.append({
-                'id': attempt.id,
-                'student_name': attempt.user.name,
-                'student_email': attempt.user.email,
-                'score': attempt.score,
-                'total_questions': attempt.total_questions,
-                'percentage': round((attempt.score / attempt.total_questions) * 100, 1),
-                'time_taken': attempt.time_taken,
-                'completed_at': attempt.completed_at.isoformat()
+                'id': row.id,
+                'student_name': row.name,
+                'student_email': row.email,
+                'score': row.score,
+                'total_questions': row.total_questions,
+                'percentage': percentage,
+                'grade': grade,
+                'time_taken': row.time_taken,
+                'completed_at': row.completed_at.isoformat()
             })
         
+        total_attempts = db.session.query(QuizStats.attempt_count).filter_by(quiz_id=quiz_id).scalar()
+        if total_attempts is None:
+            total_attempts = db.session.query(db.func.count(QuizAttempt.id)).filter_by(quiz_id=quiz_id).scalar()
+        
         return jsonify({
             'quiz_title': quiz.title,
-            'total_attempts': len(attempt_list),
-            'attempts': attempt_list
+            'total_attempts': total_attempts,
+            'attempts': attempt_list,
+            'has_more': has_more,
+            'next_cursor': encode_keyset_cursor(rows[-1].completed_at, rows[-1].id) if has_more else None
         })
         
     except Exception as e:
-        print(f"❌ Get quiz attempts error: {e}")
+        log.exception('get quiz attempts failed')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/quiz/<int:quiz_id>/stats', methods=['GET'])
+@auth_required
+def get_quiz_stats(quiz_id):
+    """Aggregate results for a quiz (for lecturers), read from the materialised stats tables"""
+    try:
+        user_id = g.principal.user_id
+        
+        quiz = db.session.query(Quiz.id, Quiz.title).filter_by(id=quiz_id, user_id=user_id).first()
+        if not quiz:
+            return jsonify({'error': 'Quiz not found or access denied'}), 403
+        
+        return jsonify({'quiz_id': quiz.id, 'quiz_title': quiz.title, **quiz_stats_payload(quiz_id)})
+        
+    except Exception as e:
+        log.exception('get quiz stats failed')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/my-results', methods=['GET'])
+@api.route('/api/quiz/<int:quiz_id>/item-analysis', methods=['GET'])
+@auth_required
+def get_quiz_item_analysis(quiz_id):
+    """Per-question p-values, discrimination and option selection rates (for lecturers)"""
+    try:
+        user_id = g.principal.user_id
+        
+        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        if not quiz:
+            return jsonify({'error': 'Quiz not found or access denied'}), 403
+        
+        return jsonify({'quiz_id': quiz.id, 'quiz_title': quiz.title, **quiz_item_analysis(quiz)})
+        
+    except Exception as e:
+        log.exception('get item analysis failed')
+        return jsonify({'error': str(e)}), 500
+
+RESULTS_DEFAULT_LIMIT = 20
+RESULTS_MAX_LIMIT = 100
+
+def my_results_query(user_id):
+    """One SELECT for a page of a student's results, newest first.
+    
+    Only the columns the payload needs are selected (quiz details through the
+    join, percentage and grade as stored at submit time), and the total count
+    rides along as a scalar subquery, so a page is a single round trip. Ordering
+    on (completed_at, id) follows ix_quiz_attempt_user_completed.
+    """
+    total_attempts = (db.select(db.func.count(QuizAttempt.id))
+                      .where(QuizAttempt.user_id == user_id)
+                      .scalar_subquery())
+    return (db.session.query(
+                QuizAttempt.id, QuizAttempt.score, QuizAttempt.total_questions, QuizAttempt.percentage,
+                QuizAttempt.grade, QuizAttempt.time_taken, QuizAttempt.completed_at,
+                Quiz.title, Quiz.subject, Quiz.topic, Quiz.difficulty,
+                total_attempts.label('total_attempts'))
+            .join(Quiz, Quiz.id == QuizAttempt.quiz_id)
+            .filter(QuizAttempt.user_id == user_id))
+
+@api.route('/api/my-results', methods=['GET'])
+@auth_required
 def get_my_results():
-    """Get quiz results for current student"""
+    """Get quiz results for current student, newest first, one keyset page at a time.
+    
+    Query parameters: ``limit`` (default 20, max 100) and ``cursor``
+    (``next_cursor`` from the previous page).
+    """
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'No token provided'}), 401
-            
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.principal.user_id
+        
+        try:
+            limit = min(max(int(request.args.get('limit', RESULTS_DEFAULT_LIMIT)), 1), RESULTS_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        query = my_results_query(user_id)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_completed_at, cursor_id = decode_keyset_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(
+                db.tuple_(QuizAttempt.completed_at, QuizAttempt.id) < db.tuple_(cursor_completed_at, cursor_id)
+            )
         
-        attempts = QuizAttempt.query.filter_by(user_id=user_id).join(Quiz).all()
+        rows = query.order_by(QuizAttempt.completed_at.desc(), QuizAttempt.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         result_list = []
-        for attempt in attempts:
-            percentage = round((attempt.score / attempt.total_questions) * 100, 1)
-            grade = 'A' if percentage >= 90 else 'B' if percentage >= 80 else 'C' if percentage >= 70 else 'D' if percentage >= 60 else 'F'
-            
+        for row in rows:
+            percentage, grade = row.percentage, row.grade
+            if percentage is None:
+                percentage, grade = attempt_grade(row.score, row.total_questions)
             result_list.append({
-                'id': attempt.id,
-                'quiz_title': attempt.quiz.title,
-                'quiz_subject': attempt.quiz.subject,
-                'quiz_topic': attempt.quiz.topic,
-                'quiz_difficulty': attempt.quiz.difficulty,
-                'score': attempt.score,
-                'total_questions': attempt.total_questions,
+                'id': row.id,
+                'quiz_title': row.title,
+                'quiz_subject': row.subject,
+                'quiz_topic': row.topic,
+                'quiz_difficulty': row.difficulty,
+                'score': row.score,
+                'total_questions': row.total_questions,
                 'percentage': percentage,
                 'grade': grade,
-                'time_taken': attempt.time_taken,
-                'completed_at': attempt.completed_at.isoformat()
+                'time_taken': row.time_taken,
+                'completed_at': row.completed_at.isoformat()
             })
         
+        if rows:
+            total_attempts = rows[0].total_attempts
+        elif cursor:
+            # A page past the end carries no row to read the count from
+            total_attempts = db.session.query(db.func.count(QuizAttempt.id)).filter_by(user_id=user_id).scalar()
+        else:
+            total_attempts = 0
+        
         return jsonify({
-            'total_attempts': len(result_list),
-            'results': sorted(result_list, key=lambda x: x['completed_at'], reverse=True)
+            'total_attempts': total_attempts,
+            'results': result_list,
+            'has_more': has_more,
+            'next_cursor': encode_keyset_cursor(rows[-1].completed_at, rows[-1].id) if has_more else None
         })
         
     except Exception as e:
-        print(f"❌ Get my results error: {e}")
+        log.exception('get my results failed')
         return jsonify({'error': str(e)}), 500
 
+# Request and database instrumentation, installed on the app by create_app()
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    # Streamed responses (such as ZIP exports) are timed until their body starts
+    REQUEST_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route,
+                            status=response.status_code)
+    REQUEST_DB_QUERIES.observe(g.db_queries, method=request.method, route=route)
+    REQUEST_DB_SECONDS.observe(g.db_seconds, method=request.method, route=route)
+    return response
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+def record_query_metrics(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_started')
+    DB_QUERIES.inc()
+    DB_SECONDS.inc(elapsed)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+@METRICS.collector
+def collect_cache_metrics():
+    caches = [('export', export_cache), ('auth_token', token_cache),
+              ('answer_key', answer_keys), ('item_analysis', item_analyses)]
+    caches = [(name, cache) for name, cache in caches if cache is not None]
+    return [
+        ('quizgenix_cache_hits_total', 'counter', 'Cache lookups served from the cache, by cache',
+         [({'cache': name}, cache.hits) for name, cache in caches]),
+        ('quizgenix_cache_misses_total', 'counter', 'Cache lookups that had to build the value, by cache',
+         [({'cache': name}, cache.misses) for name, cache in caches])
+    ]
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """This process's metrics in the Prometheus text format.
+    
+    Each gunicorn worker keeps its own, so scrape workers individually (or
+    aggregate in Prometheus); only loopback clients may scrape unless
+    METRICS_PUBLIC is set.
+    """
+    if not current_app.config['METRICS_PUBLIC'] and request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    return current_app.response_class(METRICS.render(), content_type=CONTENT_TYPE)
+
 def init_db():
     """Initialize database with sample data"""
-    print("🗄️ Initializing database...")
+    log.info('initializing database')
     
     db.create_all()
+    upgrade_schema()
     
     if not User.query.filter_by(email='lecturer@test.com').first():
         lecturer = User(
@@ -1473,7 +2654,7 @@ def init_db():
             role='lecturer'
         )
         db.session.add(lecturer)
-        print("👨‍🏫 Created test lecturer: lecturer@test.com")
+        log.info('created test user', extra={'email': 'lecturer@test.com'})
     
     if not User.query.filter_by(email='student@test.com').first():
         student = User(
@@ -1483,18 +2664,109 @@ def init_db():
             role='student'
         )
         db.session.add(student)
-        print("🎓 Created test student: student@test.com")
+        log.info('created test user', extra={'email': 'student@test.com'})
     
     db.session.commit()
-    print("✅ Database initialized successfully")
+    
+    migrated = migrate_legacy_questions()
+    if migrated:
+        log.info('migrated legacy quizzes', extra={'quizzes': migrated})
+    backfill_question_counts()
+    backfill_content_hashes()
+    backfill_attempt_grades()
+    rebuilt = backfill_quiz_stats()
+    if rebuilt:
+        log.info('built quiz analytics', extra={'quizzes': rebuilt})
+    log.info('database initialized')
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the schema, seed the test users and run backfills"""
+    init_db()
+
+@api.cli.command('regrade-quiz')
+@click.argument('quiz_id', type=int)
+@click.option('--chunk-size', default=1000, show_default=True, help='Attempts scored per batch')
+def regrade_quiz_command(quiz_id, chunk_size):
+    """Re-score every attempt at QUIZ_ID against its current answer key"""
+    def report(processed, total, changed):
+        print(f"🔁 Re-graded {processed}/{total} attempts ({changed} changed)")
+    
+    result = regrade_quiz_attempts(quiz_id, chunk_size, report)
+    print(f"✅ Re-grade finished: {result['attempts']} attempts, {result['changed']} scores changed")
+
+def init_services(app):
+    """(Re)create this process's services from app.config.
+    
+    Thread pools, SQLite handles and caches must not be shared across a fork,
+    so init_worker() calls this again in every worker process.
+    """
+    global token_cache, export_cache, session_store, _export_executor, _generation_executor
+    configure_logging('quizgenix', level=app.config['LOG_LEVEL'], style=app.config['LOG_FORMAT'])
+    token_cache = TokenCache(
+        decode_token,
+        maxsize=app.config['AUTH_TOKEN_CACHE_SIZE'],
+        max_ttl=app.config['AUTH_TOKEN_CACHE_TTL']
+    )
+    export_cache = ExportCache(
+        app.config['EXPORT_CACHE_DIR'],
+        memory_items=app.config['EXPORT_CACHE_MEMORY_ITEMS'],
+        disk_bytes=app.config['EXPORT_CACHE_DISK_BYTES']
+    )
+    session_store = create_session_store(
+        app.config['SESSION_STORE'],
+        path=app.config['SESSION_STORE_PATH'],
+        on_evict=checkpoint_session
+    )
+    _export_executor = None
+    _generation_executor = None
+    job_queue.init_app(app, workers=app.config['JOB_WORKERS'], lease_seconds=app.config['JOB_LEASE_SECONDS'])
+
+def create_app(config=None):
+    """Application factory: settings, database, routes and per-process services.
+    
+    The schema is not touched here; run init_db() once per deployment
+    (``flask --app wsgi init-db``, or gunicorn's on_starting hook in gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    configure_app(app, config)
+    db.init_app(app)
+    CORS(app)
+    app.register_blueprint(api)
+    app.before_request(start_request_timer)
+    app.after_request(record_request_metrics)
+    
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+        db.event.listen(db.engine, 'before_cursor_execute', start_query_timer)
+        db.event.listen(db.engine, 'after_cursor_execute', record_query_metrics)
+    init_services(app)
+    return app
+
+def init_worker(app):
+    """Per-worker setup after forking from a preloaded app.
+    
+    Drops database connections inherited from the parent (without closing
+    them under it), rebuilds the process's services and picks up pending
+    jobs. Recovery only resets jobs whose lease expired, so a recycled worker
+    never re-queues jobs its live siblings are running.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+        init_services(app)
+        recovered = recover_jobs()
+        if recovered:
+            log.info('rescheduled unfinished jobs', extra={'jobs': recovered})
 
 if __name__ == '__main__':
     print("🚀 Starting Quizgenix Advanced AI Backend...")
     print("🤖 AI Features: Smart Knowledge Base, Logical Questions, Diverse Answers")
-    print("🧠 Supported Domains:", list(TOPIC_FOCUSED_KNOWLEDGE_BASE.keys()))  # Fixed this line
+    print("🧠 Supported Domains:", KNOWLEDGE_BASE.topic_keys())
     
+    app = create_app()
     with app.app_context():
         init_db()
+        recover_jobs()
     
-    print("🌐 Server starting on http://127.0.0.1:5000")
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    print("🌐 Server starting on http://127.0.0.1:5000 (single process; use gunicorn with wsgi.py in production)")
+    app.run(debug=True, host='127.0.0.1', port=5000)
@@ -0,0 +1,66 @@
+import importlib
+import importlib.util
+import logging
+import threading
+
+log = logging.getLogger('quizgenix')
+
+
+class OptionalImports:
+    """Registry of optional dependencies that are imported on first use.
+
+    ``available(name)`` only asks the import system whether the module can be
+    found, so checking for an exporter's dependency costs nothing at startup;
+    ``load(name)`` imports it the first time it is actually needed. A missing
+    dependency is reported once, with its install hint.
+    """
+
+    def __init__(self):
+        self._hints = {}  # module name -> pip install hint
+        self._available = {}
+        self._modules = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, install_hint):
+        self._hints[name] = install_hint
+
+    def names(self):
+        return sorted(self._hints)
+
+    def available(self, name):
+        if name not in self._available:
+            try:
+                found = importlib.util.find_spec(name) is not None
+            except (ImportError, ValueError):
+                found = False
+            if not found:
+                self._warn(name)
+            self._available[name] = found
+        return self._available[name]
+
+    def load(self, name):
+        """Import a registered module, raising ImportError if it is not installed"""
+        module = self._modules.get(name)
+        if module is not None:
+            return module
+        with self._lock:
+            if name not in self._modules:
+                try:
+                    self._modules[name] = importlib.import_module(name)
+                except ImportError:
+                    self._warn(name)
+                    self._available[name] = False
+                    raise
+                self._available[name] = True
+        return self._modules[name]
+
+    def _warn(self, name):
+        if self._available.get(name) is not False:
+            log.warning('optional dependency not available',
+                        extra={'dependency': name, 'install_hint': self._hints.get(name, f'pip install {name}')})
+
+
+OPTIONAL_IMPORTS = OptionalImports()
+OPTIONAL_IMPORTS.register('fpdf', 'pip install fpdf2')
+OPTIONAL_IMPORTS.register('docx', 'pip install python-docx')
+OPTIONAL_IMPORTS.register('openpyxl', 'pip install openpyxl')
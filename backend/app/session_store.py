@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionState:
+    """Answers held for one active quiz session between database checkpoints"""
+
+    def __init__(self, answers, current_question, expires_at, pending_writes=0):
+        self.answers = answers  # {str(question_id): answer}
+        self.current_question = current_question
+        self.expires_at = expires_at  # unix timestamp
+        self.pending_writes = pending_writes  # answers not yet written to QuizSession
+
+    @property
+    def expired(self):
+        return self.expires_at < time.time()
+
+
+class InMemorySessionStore:
+    """Per-process session store: a dict of SessionState with TTL eviction.
+
+    Entries live until their session expires. Expired entries that still have
+    pending writes are handed to ``on_evict`` so they can be checkpointed.
+    """
+
+    def __init__(self, on_evict=None, sweep_interval=60):
+        self._states = {}
+        self._lock = threading.Lock()
+        self._on_evict = on_evict
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def start(self, token, answers, current_question, expires_at):
+        state = SessionState(dict(answers), current_question, expires_at)
+        with self._lock:
+            self._states[token] = state
+        self._maybe_sweep()
+        return state
+
+    def get(self, token):
+        with self._lock:
+            return self._states.get(token)
+
+    def record_answer(self, token, question_id, answer):
+        """Store one answer; returns the updated state, or None if the session is unknown"""
+        with self._lock:
+            state = self._states.get(token)
+            if state is None:
+                return None
+            state.answers[str(question_id)] = answer
+            state.current_question = max(state.current_question, question_id)
+            state.pending_writes += 1
+        self._maybe_sweep()
+        return state
+
+    def mark_checkpointed(self, token):
+        with self._lock:
+            state = self._states.get(token)
+            if state is not None:
+                state.pending_writes = 0
+
+    def discard(self, token):
+        with self._lock:
+            self._states.pop(token, None)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        with self._lock:
+            self._next_sweep = now + self._sweep_interval
+            expired = [(token, state) for token, state in self._states.items() if state.expires_at < now]
+            for token, _ in expired:
+                del self._states[token]
+        if self._on_evict:
+            for token, state in expired:
+                if state.pending_writes:
+                    self._on_evict(token, state)
+
+
+class LocalSharedSessionStore:
+    """Stand-in for a shared store (e.g. Redis) usable by every worker on one node.
+
+    State lives in a small SQLite side file in WAL mode, separate from the main
+    database. Each answer is a single-row upsert, so workers never contend on
+    the main database's writer lock for answer traffic.
+    """
+
+    def __init__(self, path, on_evict=None, sweep_interval=60):
+        self._path = path
+        self._local = threading.local()
+        self._on_evict = on_evict
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS session_state (
+                token TEXT PRIMARY KEY,
+                current_question INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                pending_writes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS session_answer (
+                token TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                PRIMARY KEY (token, question_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_session_state_expires ON session_state (expires_at);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self, token, answers, current_question, expires_at):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM session_answer WHERE token = ?', (token,))
+            conn.execute(
+                'INSERT OR REPLACE INTO session_state (token, current_question, expires_at, pending_writes) '
+                'VALUES (?, ?, ?, 0)',
+                (token, current_question, expires_at)
+            )
+            conn.executemany(
+                'INSERT INTO session_answer (token, question_id, answer) VALUES (?, ?, ?)',
+                [(token, str(q_id), json.dumps(answer)) for q_id, answer in answers.items()]
+            )
+        self._maybe_sweep()
+        return SessionState(dict(answers), current_question, expires_at)
+
+    def get(self, token):
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT current_question, expires_at, pending_writes FROM session_state WHERE token = ?', (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        answers = {
+            q_id: json.loads(answer)
+            for q_id, answer in conn.execute(
+                'SELECT question_id, answer FROM session_answer WHERE token = ?', (token,)
+            )
+        }
+        return SessionState(answers, row[0], row[1], row[2])
+
+    def record_answer(self, token, question_id, answer):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            updated = conn.execute(
+                'UPDATE session_state SET current_question = MAX(current_question, ?), '
+                'pending_writes = pending_writes + 1 WHERE token = ?',
+                (question_id, token)
+            ).rowcount
+            if not updated:
+                return None
+            conn.execute(
+                'INSERT OR REPLACE INTO session_answer (token, question_id, answer) VALUES (?, ?, ?)',
+                (token, str(question_id), json.dumps(answer))
+            )
+        self._maybe_sweep()
+        return self.get(token)
+
+    def mark_checkpointed(self, token):
+        with self._conn() as conn:
+            conn.execute('UPDATE session_state SET pending_writes = 0 WHERE token = ?', (token,))
+
+    def discard(self, token):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM session_answer WHERE token = ?', (token,))
+            conn.execute('DELETE FROM session_state WHERE token = ?', (token,))
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        conn = self._conn()
+        expired = [row[0] for row in conn.execute(
+            'SELECT token FROM session_state WHERE expires_at < ? AND pending_writes > 0', (now,)
+        )]
+        if self._on_evict:
+            for token in expired:
+                state = self.get(token)
+                if state is not None:
+                    self._on_evict(token, state)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'DELETE FROM session_answer WHERE token IN (SELECT token FROM session_state WHERE expires_at < ?)',
+                (now,)
+            )
+            conn.execute('DELETE FROM session_state WHERE expires_at < ?', (now,))
+
+
+SESSION_STORE_BACKENDS = {
+    'memory': InMemorySessionStore,
+    'local-shared': LocalSharedSessionStore,
+}
+
+
+def create_session_store(backend='local-shared', path=None, on_evict=None):
+    """Build the configured session-state backend"""
+    if backend not in SESSION_STORE_BACKENDS:
+        raise ValueError(f"Unknown session store backend: {backend}")
+    if backend == 'local-shared':
+        path = path or os.path.join(os.getcwd(), 'quiz_sessions.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return LocalSharedSessionStore(path, on_evict=on_evict)
+    return InMemorySessionStore(on_evict=on_evict)
@@ -0,0 +1,198 @@
+from collections import deque
+from functools import lru_cache
+
+# Ordered (topic terms, subject terms, topic key) rules for create_topic_key.
+# A rule matches when any topic term occurs in the topic and, unless the subject
+# terms are None, any subject term occurs in the subject. First match wins.
+TOPIC_KEY_RULES = (
+    # JavaScript topics
+    (('function',), ('javascript',), 'javascript_functions'),
+    (('function',), ('computer',), 'javascript_functions'),
+    (('function',), ('programming',), 'javascript_functions'),
+    (('javascript function',), None, 'javascript_functions'),
+
+    # Python topics
+    (('function',), ('python',), 'python_functions'),
+    (('python function',), None, 'python_functions'),
+    (('def',), ('python',), 'python_functions'),
+
+    # Math topics
+    (('algebra',), ('math',), 'algebra_equations'),
+    (('equation',), ('math',), 'algebra_equations'),
+    (('linear equation',), None, 'algebra_equations'),
+    (('quadratic',), ('math',), 'algebra_equations'),
+
+    # Chemistry topics
+    (('compound',), ('chemistry',), 'chemistry_compounds'),
+    (('salt',), ('chemistry',), 'chemistry_compounds'),
+    (('ionic',), ('chemistry',), 'chemistry_compounds'),
+    (('chemical compound',), None, 'chemistry_compounds'),
+
+    # Fallback: general topic matching
+    (('function',), ('javascript', 'js', 'computer', 'programming'), 'javascript_functions'),
+    (('function',), ('python',), 'python_functions'),
+    (('algebra', 'equation'), None, 'algebra_equations'),
+    (('compound', 'chemistry', 'chemical'), None, 'chemistry_compounds'),
+)
+
+# Ordered domain rules for determine_intelligent_domain: (domain, keyword -> subtopic,
+# extra topic terms, extra subject terms, default subtopic). A domain matches when any
+# keyword occurs in the topic or subject, or an extra term occurs in its field.
+DOMAIN_RULES = (
+    ('javascript', (
+        ('function', 'functions'),
+        ('variable', 'variables'),
+        ('array', 'arrays'),
+        ('closure', 'closures'),
+        ('promise', 'promises'),
+        ('async', 'async'),
+        ('dom', 'dom'),
+        ('object', 'objects'),
+    ), ('javascript',), (), 'functions'),
+    ('python', (
+        ('function', 'functions'),
+        ('list', 'basics'),
+        ('dictionary', 'basics'),
+        ('comprehension', 'comprehensions'),
+        ('class', 'oop'),
+        ('module', 'modules'),
+    ), ('python',), (), 'basics'),
+    ('mathematics', (
+        ('algebra', 'algebra'),
+        ('calculus', 'calculus'),
+        ('geometry', 'geometry'),
+        ('arithmetic', 'arithmetic'),
+        ('percentage', 'arithmetic'),
+        ('equation', 'algebra'),
+        ('derivative', 'calculus'),
+        ('integral', 'calculus'),
+    ), (), ('math',), 'arithmetic'),
+    ('science', (
+        ('chemistry', 'chemistry'),
+        ('physics', 'physics'),
+        ('biology', 'biology'),
+        ('cell', 'biology'),
+        ('atom', 'chemistry'),
+        ('force', 'physics'),
+        ('energy', 'physics'),
+    ), (), ('science',), 'chemistry'),
+)
+
+# Used when no domain rule matches: (subject terms, (domain, subtopic))
+DEFAULT_DOMAIN_RULES = (
+    (('computer', 'programming'), ('javascript', 'functions')),
+    (('math',), ('mathematics', 'arithmetic')),
+)
+DEFAULT_DOMAIN = ('science', 'chemistry')
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur anywhere in a text"""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            if keyword not in self._output[state]:
+                self._output[state] += (keyword,)
+
+        # Breadth-first pass to link each state to its longest proper suffix state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """Return the set of keywords that occur as substrings of text, in one pass"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+def _all_keywords():
+    keywords = set()
+    for topic_terms, subject_terms, _ in TOPIC_KEY_RULES:
+        keywords.update(topic_terms)
+        keywords.update(subject_terms or ())
+    for _, mapping, topic_terms, subject_terms, _ in DOMAIN_RULES:
+        keywords.update(keyword for keyword, _ in mapping)
+        keywords.update(topic_terms)
+        keywords.update(subject_terms)
+    for subject_terms, _ in DEFAULT_DOMAIN_RULES:
+        keywords.update(subject_terms)
+    return sorted(keywords)
+
+
+# Built once at import time and shared by both generator paths
+KEYWORD_AUTOMATON = KeywordAutomaton(_all_keywords())
+
+
+def normalize(text):
+    return (text or '').lower().strip()
+
+
+@lru_cache(maxsize=4096)
+def _keyword_hits(topic, subject):
+    return frozenset(KEYWORD_AUTOMATON.find(topic)), frozenset(KEYWORD_AUTOMATON.find(subject))
+
+
+@lru_cache(maxsize=4096)
+def _resolve_topic_key(topic, subject):
+    topic_hits, subject_hits = _keyword_hits(topic, subject)
+    for topic_terms, subject_terms, topic_key in TOPIC_KEY_RULES:
+        if not topic_hits.intersection(topic_terms):
+            continue
+        if subject_terms is None or subject_hits.intersection(subject_terms):
+            return topic_key
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _resolve_domain(topic, subject):
+    topic_hits, subject_hits = _keyword_hits(topic, subject)
+    all_hits = topic_hits | subject_hits
+    for domain, mapping, topic_terms, subject_terms, default_subtopic in DOMAIN_RULES:
+        if (any(keyword in all_hits for keyword, _ in mapping)
+                or topic_hits.intersection(topic_terms)
+                or subject_hits.intersection(subject_terms)):
+            subtopic = next((sub for keyword, sub in mapping if keyword in topic_hits), default_subtopic)
+            return domain, subtopic
+    for subject_terms, resolved in DEFAULT_DOMAIN_RULES:
+        if subject_hits.intersection(subject_terms):
+            return resolved
+    return DEFAULT_DOMAIN
+
+
+def resolve_topic_key(topic, subject):
+    """Knowledge-base topic key for a (topic, subject) pair, or None"""
+    return _resolve_topic_key(normalize(topic), normalize(subject))
+
+
+def resolve_domain(topic, subject):
+    """(domain, subtopic) for a (topic, subject) pair"""
+    return _resolve_domain(normalize(topic), normalize(subject))
@@ -0,0 +1,29 @@
+import re
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+INVALID_SHEET_TITLE_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def sheet_title(title, default='Sheet'):
+    """Excel sheet names are at most 31 characters and cannot contain []:*?/\\"""
+    return INVALID_SHEET_TITLE_CHARS.sub('_', title or '')[:31] or default
+
+
+def write_xlsx(output, sheets):
+    """Write an .xlsx workbook to a path or binary file object, one row at a time.
+
+    ``sheets`` is an iterable of ``(title, header, rows)`` where ``rows`` may be
+    any iterable (typically a generator). The workbook is opened in openpyxl's
+    write-only mode, which spools each row to disk as it is appended instead of
+    keeping a cell tree in memory, so memory stays flat however many rows there are.
+    """
+    workbook = Workbook(write_only=True)
+    for title, header, rows in sheets:
+        worksheet = workbook.create_sheet(sheet_title(title))
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+                              for value in row])
+    workbook.save(output)
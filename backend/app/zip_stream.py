@@ -0,0 +1,97 @@
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipSink:
+    """Unseekable write-only file object; zipfile writes, the generator drains.
+
+    Because it cannot seek, zipfile emits data descriptors after each entry
+    instead of rewriting local headers, so nothing already sent is revisited.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def buffered(self):
+        return bool(self._chunks)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED, compresslevel=1):
+    """Yield a ZIP archive chunk by chunk.
+
+    ``entries`` yields ``(arcname, data)`` where data is bytes or a readable
+    binary file object; file objects are copied in COPY_CHUNK_SIZE pieces and
+    closed. Only the current chunk and zipfile's central-directory records are
+    ever held in memory.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=compression, compresslevel=compresslevel) as archive:
+        for arcname, data in entries:
+            with archive.open(arcname, 'w', force_zip64=True) as entry:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    entry.write(data)
+                else:
+                    try:
+                        for chunk in iter(lambda: data.read(COPY_CHUNK_SIZE), b''):
+                            entry.write(chunk)
+                            if sink.buffered():
+                                yield sink.drain()
+                    finally:
+                        data.close()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def map_as_completed(executor, func, items, max_in_flight, discard=None):
+    """Run func(item) on the executor and yield results in the order they finish.
+
+    At most ``max_in_flight`` calls are outstanding at once, which bounds how
+    many finished-but-unconsumed results can pile up. If the consumer stops
+    early, queued calls are cancelled and every result that was produced but
+    never yielded is passed to ``discard``.
+    """
+    items = iter(items)
+    pending = set()
+    ready = []
+
+    def submit_next():
+        for item in items:
+            pending.add(executor.submit(func, item))
+            return True
+        return False
+
+    try:
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            ready.extend(done)
+            while ready:
+                future = ready.pop(0)
+                submit_next()
+                yield future.result()
+    finally:
+        leftovers = ready + [future for future in pending if not future.cancel()]
+        for future in leftovers:
+            if discard is not None and future.exception() is None:
+                discard(future.result())
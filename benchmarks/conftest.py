@@ -0,0 +1,88 @@
+# Benchmark fixtures
+#
+# Uses pytest-benchmark when it is installed. Otherwise a small stand-in
+# `benchmark` fixture supports the same calls the suite makes (benchmark(func,
+# *args), benchmark.pedantic(...) and benchmark.extra_info), prints a summary
+# table at the end of the run and honours --benchmark-json.
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'app')
+sys.path.insert(0, APP_DIR)
+
+HAVE_PYTEST_BENCHMARK = importlib.util.find_spec('pytest_benchmark') is not None
+DEFAULT_ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', 5))
+
+
+class FallbackBenchmark:
+    """Times a callable over a few rounds, like pytest-benchmark's fixture"""
+
+    def __init__(self, name):
+        self.name = name
+        self.extra_info = {}
+        self.stats = None
+
+    def __call__(self, func, *args, **kwargs):
+        return self.pedantic(func, args=args, kwargs=kwargs, rounds=DEFAULT_ROUNDS, warmup_rounds=1)
+
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1, warmup_rounds=0, iterations=1):
+        kwargs = kwargs or {}
+        timings = []
+        for round_number in range(warmup_rounds + rounds):
+            if setup is not None:
+                prepared = setup()
+                if prepared is not None:
+                    args, kwargs = prepared
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **kwargs)
+            if round_number >= warmup_rounds:
+                timings.append((time.perf_counter() - start) / iterations)
+
+        self.stats = {
+            'rounds': rounds,
+            'min': min(timings),
+            'max': max(timings),
+            'mean': statistics.fmean(timings),
+            'median': statistics.median(timings),
+            'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0
+        }
+        return result
+
+
+_results = []
+
+if not HAVE_PYTEST_BENCHMARK:
+    def pytest_addoption(parser):
+        parser.addoption('--benchmark-json', metavar='PATH', help='write benchmark results to a JSON file')
+
+    @pytest.fixture
+    def benchmark(request):
+        bench = FallbackBenchmark(request.node.name)
+        yield bench
+        if bench.stats is not None:
+            _results.append({'name': bench.name, 'stats': bench.stats, 'extra_info': bench.extra_info})
+
+    def pytest_terminal_summary(terminalreporter, config):
+        if not _results:
+            return
+        terminalreporter.write_sep('-', 'benchmarks (install pytest-benchmark for full statistics)')
+        terminalreporter.write_line(f"{'name':<64}{'min ms':>10}{'median ms':>11}{'peak KiB':>11}")
+        for result in _results:
+            stats = result['stats']
+            peak = result['extra_info'].get('alloc_peak_kib', '')
+            terminalreporter.write_line(
+                f"{result['name']:<64}{stats['min'] * 1000:>10.3f}{stats['median'] * 1000:>11.3f}{peak:>11}"
+            )
+
+        path = config.getoption('--benchmark-json')
+        if path:
+            with open(path, 'w') as f:
+                json.dump({'benchmarks': _results}, f, indent=2)
+            terminalreporter.write_line(f'Benchmark results written to {path}')
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the quiz lifecycle.
+
+Simulates concurrent students (start quiz -> K answers -> submit) and
+lecturers (create quiz -> download it in each export format), either
+in-process through the Flask test client on a fresh SQLite database or
+against a running server, and reports throughput, latency percentiles and
+SQLite write contention. Results are written as JSON; pass a previous result
+file as --baseline to flag regressions.
+
+    python benchmarks/quiz_lifecycle.py --students 20 --rounds 5
+    python benchmarks/quiz_lifecycle.py --output benchmarks/baseline.json
+    python benchmarks/quiz_lifecycle.py --baseline benchmarks/baseline.json
+    python benchmarks/quiz_lifecycle.py --url http://127.0.0.1:5000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'app')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'quiz_lifecycle.json')
+
+# Quiz specs lecturers cycle through; the first matches the bundled knowledge base
+QUIZ_SPECS = [
+    {'subject': 'javascript', 'topic': 'functions', 'difficulty': 'easy'},
+    {'subject': 'python', 'topic': 'loops', 'difficulty': 'medium'},
+    {'subject': 'biology', 'topic': 'photosynthesis', 'difficulty': 'hard'},
+]
+
+
+class InProcessClient:
+    """Requests through the Flask test client (one per simulated user)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.client.open(path, method=method, json=json, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Requests against a running server (one session per simulated user)"""
+
+    def __init__(self, base_url, timeout=120):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.session.request(method, self.base_url + path, json=json, headers=headers,
+                                        timeout=self.timeout)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+
+class Recorder:
+    """Latencies and failures per operation, plus SQLite write statement timings"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+        self.locked_errors = 0
+        self.write_latencies = []
+        self.lifecycles = 0
+        self._lock = threading.Lock()
+
+    def call(self, client, operation, method, path, json=None, headers=None):
+        start = time.perf_counter()
+        status, body = client.request(method, path, json=json, headers=headers)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[operation].append(elapsed)
+            if status >= 400:
+                self.errors[operation] += 1
+                message = (body or {}).get('error', f'HTTP {status}')
+                self.error_samples.setdefault(operation, f'{status}: {message}')
+                if 'database is locked' in message:
+                    self.locked_errors += 1
+        return status, body
+
+    def record_write(self, elapsed):
+        with self._lock:
+            self.write_latencies.append(elapsed)
+
+    def finish_lifecycle(self):
+        with self._lock:
+            self.lifecycles += 1
+
+
+def percentiles_ms(samples):
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def install_write_timer(engine, recorder):
+    """Time INSERT/UPDATE/DELETE statements, which wait on SQLite's write lock"""
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.info['benchmark_write_started'] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('benchmark_write_started', None)
+        if started is not None:
+            recorder.record_write(time.perf_counter() - started)
+
+    event.listen(engine, 'before_cursor_execute', before)
+    event.listen(engine, 'after_cursor_execute', after)
+
+
+def create_in_process_app(workdir):
+    """The app on an empty SQLite database (WAL, as in production) under workdir"""
+    sys.path.insert(0, APP_DIR)
+    import main
+
+    app = main.create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'benchmark.db'),
+        'JOB_RESULTS_DIR': os.path.join(workdir, 'job_results'),
+        'EXPORT_CACHE_DIR': os.path.join(workdir, 'export_cache'),
+        'SESSION_STORE_PATH': os.path.join(workdir, 'quiz_sessions.db'),
+        'LOG_LEVEL': 'WARNING'
+    })
+    with app.app_context():
+        main.init_db()
+    return app, main.db
+
+
+def register(client, role, index, run_id):
+    status, body = client.request('POST', '/api/register', json={
+        'name': f'Benchmark {role.title()} {index}',
+        'email': f'bench-{run_id}-{role}{index}@example.com',
+        'password': 'benchmark-password',
+        'role': role
+    })
+    if status >= 400 or not body or 'token' not in body:
+        raise RuntimeError(f'Could not register benchmark {role} {index}: HTTP {status} {body}')
+    return {'Authorization': 'Bearer ' + body['token']}
+
+
+def quiz_spec(index, question_count):
+    spec = QUIZ_SPECS[index % len(QUIZ_SPECS)]
+    return dict(spec, title=f"Benchmark {spec['topic']} #{index}", questionCount=question_count)
+
+
+def student_session(client, recorder, headers, quiz_ids, index, args):
+    rng = random.Random(args.seed * 100003 + index)
+    for round_number in range(args.rounds):
+        quiz_id = quiz_ids[(index + round_number) % len(quiz_ids)]
+        status, body = recorder.call(client, 'start_quiz', 'POST', f'/api/quiz/{quiz_id}/start', headers=headers)
+        if status >= 400 or 'quiz' not in (body or {}):
+            continue
+
+        token = body['session_token']
+        questions = body['quiz']['questions']
+        for question in questions[:args.answers]:
+            recorder.call(client, 'submit_answer', 'POST', f'/api/quiz/session/{token}/answer', json={
+                'question_id': question['id'],
+                'answer': rng.randrange(len(question['options']))
+            })
+
+        status, _ = recorder.call(client, 'submit_quiz', 'POST', f'/api/quiz/session/{token}/submit')
+        if status < 400:
+            recorder.finish_lifecycle()
+
+
+def lecturer_session(client, recorder, headers, index, args):
+    for round_number in range(args.rounds):
+        spec = quiz_spec(index * args.rounds + round_number, args.questions)
+        status, body = recorder.call(client, 'create_quiz', 'POST', '/api/quiz', json=spec, headers=headers)
+        if status >= 400:
+            continue
+        for format in args.formats:
+            recorder.call(client, 'download_quiz', 'GET', f"/api/quiz/{body['id']}/download/{format}",
+                          headers=headers)
+
+
+def run_benchmark(args):
+    """Run one benchmark and return its JSON-ready report"""
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    with tempfile.TemporaryDirectory(prefix='quizgenix-bench-') as workdir:
+        if args.url:
+            make_client = lambda: HttpClient(args.url)  # noqa: E731
+        else:
+            app, db = create_in_process_app(workdir)
+            with app.app_context():
+                install_write_timer(db.engine, recorder)
+            make_client = lambda: InProcessClient(app)  # noqa: E731
+
+        # Setup (not measured): accounts and the quizzes students take
+        setup = make_client()
+        lecturer_headers = [register(setup, 'lecturer', i, run_id) for i in range(max(args.lecturers, 1))]
+        student_headers = [register(setup, 'student', i, run_id) for i in range(args.students)]
+        quiz_ids = []
+        for i in range(args.quizzes):
+            status, body = setup.request('POST', '/api/quiz', json=quiz_spec(i, args.questions),
+                                         headers=lecturer_headers[0])
+            if status >= 400:
+                raise RuntimeError(f'Could not create benchmark quiz: HTTP {status} {body}')
+            quiz_ids.append(body['id'])
+        recorder.write_latencies.clear()
+
+        # Measured phase: every simulated user runs in its own thread
+        users = [(student_session, (headers, quiz_ids, i)) for i, headers in enumerate(student_headers)]
+        users += [(lecturer_session, (headers, i)) for i, headers in enumerate(lecturer_headers[:args.lecturers])]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            futures = [pool.submit(session, make_client(), recorder, *user_args, args)
+                       for session, user_args in users]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - start
+
+    return build_report(args, recorder, wall)
+
+
+def build_report(args, recorder, wall):
+    operations = {}
+    for operation, samples in sorted(recorder.latencies.items()):
+        operations[operation] = {
+            'count': len(samples),
+            'errors': recorder.errors[operation],
+            'throughput_per_second': round(len(samples) / wall, 2),
+            **percentiles_ms(samples)
+        }
+        if operation in recorder.error_samples:
+            operations[operation]['first_error'] = recorder.error_samples[operation]
+
+    sqlite = {'locked_errors': recorder.locked_errors}
+    if not args.url:
+        writes = recorder.write_latencies
+        threshold = args.slow_write_ms / 1000
+        sqlite.update({
+            'write_statements': len(writes),
+            'slow_write_threshold_ms': args.slow_write_ms,
+            'slow_writes': sum(1 for elapsed in writes if elapsed >= threshold),
+            'write_seconds': round(sum(writes), 4)
+        })
+        if writes:
+            sqlite.update({f'write_{key}': value for key, value in percentiles_ms(writes).items()})
+
+    total_requests = sum(len(samples) for samples in recorder.latencies.values())
+    return {
+        'benchmark': 'quiz_lifecycle',
+        'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'environment': {
+            'target': args.url or 'in-process',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {
+            'students': args.students,
+            'lecturers': args.lecturers,
+            'rounds': args.rounds,
+            'quizzes': args.quizzes,
+            'questions': args.questions,
+            'answers': args.answers,
+            'formats': args.formats,
+            'seed': args.seed
+        },
+        'wall_seconds': round(wall, 3),
+        'requests': total_requests,
+        'requests_per_second': round(total_requests / wall, 2),
+        'lifecycles': recorder.lifecycles,
+        'lifecycles_per_second': round(recorder.lifecycles / wall, 2),
+        'operations': operations,
+        'sqlite': sqlite
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Regression messages for operations slower (p95) or less frequent than the baseline allows"""
+    regressions = []
+    for operation, current in report['operations'].items():
+        previous = baseline.get('operations', {}).get(operation)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{operation}: p95 {previous['p95_ms']:.1f} ms -> {current['p95_ms']:.1f} ms")
+        if current['throughput_per_second'] < previous['throughput_per_second'] * (1 - tolerance):
+            regressions.append(f"{operation}: throughput {previous['throughput_per_second']:.1f}/s -> "
+                               f"{current['throughput_per_second']:.1f}/s")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{operation}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(report):
+    print(f"🏁 {report['requests']} requests in {report['wall_seconds']:.2f}s "
+          f"({report['requests_per_second']:.1f} req/s, {report['lifecycles_per_second']:.1f} quiz lifecycles/s)")
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, stats in report['operations'].items():
+        print(f"{operation:<16}{stats['count']:>8}{stats['errors']:>8}{stats['throughput_per_second']:>9.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    sqlite = report['sqlite']
+    if 'write_statements' in sqlite:
+        print(f"🗄️ SQLite: {sqlite['write_statements']} writes, p95 {sqlite.get('write_p95_ms', 0):.1f} ms, "
+              f"{sqlite['slow_writes']} slower than {sqlite['slow_write_threshold_ms']} ms, "
+              f"{sqlite['locked_errors']} 'database is locked' errors")
+    else:
+        print(f"🗄️ SQLite: {sqlite['locked_errors']} 'database is locked' errors")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='benchmark a running server instead of the app in-process')
+    parser.add_argument('--students', type=int, default=20, help='concurrent students')
+    parser.add_argument('--lecturers', type=int, default=2, help='concurrent lecturers')
+    parser.add_argument('--rounds', type=int, default=3, help='quizzes taken (or created) per user')
+    parser.add_argument('--quizzes', type=int, default=5, help='quizzes created up front for students')
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--answers', type=int, default=None, help='answers per attempt (default: every question)')
+    parser.add_argument('--formats', type=lambda value: value.split(','), default=['pdf', 'docx', 'xlsx'],
+                        help='comma-separated formats lecturers download')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the students\' answers')
+    parser.add_argument('--slow-write-ms', type=float, default=20.0,
+                        help='write statements at least this slow count as waiting on the SQLite lock')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write the JSON results')
+    parser.add_argument('--baseline', help='previous results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p95/throughput change before a regression is reported')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    print_report(report)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != report['parameters']:
+            print("⚠️ The baseline was recorded with different parameters; the comparison is only indicative")
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✅ Within {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Question generation micro-benchmarks
+#
+#   python -m pytest benchmarks -q
+#   python -m pytest benchmarks -q --benchmark-json benchmarks/results/generation.json
+#
+# Every generator runs across question counts and topic/subject pairs that hit
+# each create_topic_key rule (and none). Rounds reseed `random`, so runs do the
+# same work; allocations come from one extra run under tracemalloc.
+import os
+import random
+import tracemalloc
+
+import pytest
+
+import main
+from topic_resolver import TOPIC_KEY_RULES
+
+SEED = 1234
+ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', 5))
+QUESTION_COUNTS = (5, 50, 500)
+
+# (id, topic, subject, index of the first TOPIC_KEY_RULES entry that matches, or None)
+TOPIC_CASES = [
+    ('function-javascript', 'function', 'javascript', 0),
+    ('function-computer', 'function', 'computer science', 1),
+    ('function-programming', 'function', 'programming', 2),
+    ('javascript-function', 'javascript function', 'web development', 3),
+    ('function-python', 'function', 'python', 4),
+    ('python-function', 'python function', 'coding', 5),
+    ('def-python', 'def', 'python', 6),
+    ('algebra-math', 'algebra', 'math', 7),
+    ('equation-math', 'equation', 'mathematics', 8),
+    ('linear-equation', 'linear equation', 'physics', 9),
+    ('quadratic-math', 'quadratic', 'math', 10),
+    ('compound-chemistry', 'compound', 'chemistry', 11),
+    ('salt-chemistry', 'salt', 'chemistry', 12),
+    ('ionic-chemistry', 'ionic', 'chemistry', 13),
+    ('chemical-compound', 'chemical compound', 'science', 14),
+    ('function-js', 'function', 'js', 15),
+    ('equation-any', 'equation', 'physics', 17),
+    ('chemical-any', 'chemical', 'biology', 18),
+    ('no-match', 'photosynthesis', 'biology', None),
+]
+UNREACHABLE_RULES = {16}  # ('function', 'python') is already matched by rule 4
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+topic_cases = [pytest.param(topic, subject, id=case_id) for case_id, topic, subject, _ in TOPIC_CASES]
+
+
+def quiz_data(topic, subject, count, difficulty='medium'):
+    return {'title': 'Benchmark', 'topic': topic, 'subject': subject, 'difficulty': difficulty,
+            'questionCount': count}
+
+
+def seed_random():
+    random.seed(SEED)
+
+
+def allocation_info(func, *args):
+    """Peak and retained (result included) traced allocations of one seeded call"""
+    seed_random()
+    tracemalloc.start()
+    try:
+        func(*args)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'alloc_peak_kib': round(peak / 1024, 1), 'alloc_retained_kib': round(retained / 1024, 1)}
+
+
+def run_case(benchmark, func, *args):
+    questions = benchmark.pedantic(func, args=args, setup=seed_random, rounds=ROUNDS, warmup_rounds=1)
+    benchmark.extra_info.update(allocation_info(func, *args))
+    benchmark.extra_info['questions'] = len(questions)
+    return questions
+
+
+def first_matching_rule(topic, subject):
+    for index, (topic_terms, subject_terms, _) in enumerate(TOPIC_KEY_RULES):
+        if any(term in topic for term in topic_terms) and (
+                subject_terms is None or any(term in subject for term in subject_terms)):
+            return index
+    return None
+
+
+def test_topic_cases_cover_every_rule():
+    for case_id, topic, subject, rule in TOPIC_CASES:
+        assert first_matching_rule(topic, subject) == rule, case_id
+        expected_key = TOPIC_KEY_RULES[rule][2] if rule is not None else None
+        assert main.create_topic_key(topic, subject) == expected_key, case_id
+
+    covered = {rule for *_, rule in TOPIC_CASES if rule is not None}
+    assert covered | UNREACHABLE_RULES == set(range(len(TOPIC_KEY_RULES)))
+
+
+@pytest.mark.parametrize('generate', [
+    lambda: main.generate_topic_focused_questions(quiz_data('function', 'javascript', 50)),
+    lambda: main.generate_intelligent_questions(quiz_data('function', 'javascript', 50)),
+    lambda: main.generate_contextual_topic_questions('equation', 'mathematics', 'easy', 50, 0),
+    lambda: main.generate_fallback_questions(quiz_data('photosynthesis', 'biology', 50)),
+], ids=['topic_focused', 'intelligent', 'contextual_topic', 'fallback'])
+def test_seeded_runs_are_identical(generate):
+    seed_random()
+    first = generate()
+    seed_random()
+    assert generate() == first
+
+
+@pytest.mark.parametrize('count', QUESTION_COUNTS)
+@pytest.mark.parametrize('topic, subject', topic_cases)
+def test_topic_focused(benchmark, topic, subject, count):
+    questions = run_case(benchmark, main.generate_topic_focused_questions, quiz_data(topic, subject, count))
+    assert len(questions) == count
+
+
+@pytest.mark.parametrize('count', QUESTION_COUNTS)
+@pytest.mark.parametrize('topic, subject', topic_cases)
+def test_intelligent(benchmark, topic, subject, count):
+    questions = run_case(benchmark, main.generate_intelligent_questions, quiz_data(topic, subject, count))
+    assert len(questions) == count
+
+
+@pytest.mark.parametrize('count', QUESTION_COUNTS)
+@pytest.mark.parametrize('topic, subject', topic_cases)
+def test_contextual_topic(benchmark, topic, subject, count):
+    questions = run_case(benchmark, main.generate_contextual_topic_questions, topic, subject, 'medium', count, 0)
+    assert len(questions) == count
+
+
+@pytest.mark.parametrize('count', QUESTION_COUNTS)
+@pytest.mark.parametrize('difficulty', DIFFICULTIES)
+def test_fallback(benchmark, difficulty, count):
+    questions = run_case(benchmark, main.generate_fallback_questions,
+                         quiz_data('photosynthesis', 'biology', count, difficulty))
+    assert len(questions) == count
@@ -4,6 +4,7 @@ import './Dashboard.css';
 const Dashboard = ({ user, onLogout }) => {
   const [activeTab, setActiveTab] = useState(user.role === 'lecturer' ? 'create' : 'available');
   const [quizzes, setQuizzes] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
   const [showPreview, setShowPreview] = useState(null);
@@ -77,10 +78,11 @@ const Dashboard = ({ user, onLogout }) => {
     setLoading(false);
   };
 
-  const fetchQuizzes = async () => {
+  const fetchQuizzes = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch('http://127.0.0.1:5000/api/quizzes', {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`http://127.0.0.1:5000/api/quizzes${query}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -88,13 +90,34 @@ const Dashboard = ({ user, onLogout }) => {
 
       const data = await response.json();
       if (response.ok) {
-        setQuizzes(data.quizzes);
+        setQuizzes(previous => cursor ? [...previous, ...data.quizzes] : data.quizzes);
+        setNextCursor(data.next_cursor);
       }
     } catch (error) {
       console.error('Failed to fetch quizzes:', error);
     }
   };
 
+  const handlePreview = async (quiz) => {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`http://127.0.0.1:5000/api/quiz/${quiz.id}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      });
+
+      const data = await response.json();
+      if (response.ok) {
+        setShowPreview(data);
+      } else {
+        setMessage(`❌ Error: ${data.error || 'Failed to load quiz'}`);
+      }
+    } catch (error) {
+      console.error('Failed to load quiz:', error);
+    }
+  };
+
   const handleDownload = async (quiz, format) => {
     try {
       const token = localStorage.getItem('token');
@@ -244,14 +267,14 @@ const Dashboard = ({ user, onLogout }) => {
                       <div className="quiz-info">
                         <p><strong>📖 Subject:</strong> {quiz.subject}</p>
                         <p><strong>🎯 Topic:</strong> {quiz.topic}</p>
-                        <p><strong>❓ Questions:</strong> {quiz.questions?.length || 0}</p>
+                        <p><strong>❓ Questions:</strong> {quiz.question_count || 0}</p>
                         <p><strong>📅 Created:</strong> {new Date(quiz.created_at).toLocaleDateString()}</p>
                       </div>
 
                       <div className="quiz-actions">
                         <button
                           className="action-btn preview"
-                          onClick={() => setShowPreview(quiz)}
+                          onClick={() => handlePreview(quiz)}
                         >
                           👁️ View Quiz
                         </button>
@@ -276,6 +299,14 @@ const Dashboard = ({ user, onLogout }) => {
                       </div>
                     </div>
                   ))}
+                  {nextCursor && (
+                    <button
+                      className="action-btn preview"
+                      onClick={() => fetchQuizzes(nextCursor)}
+                    >
+                      ⬇️ Load More
+                    </button>
+                  )}
                 </div>
               ) : (
                 <div className="empty-state">
@@ -1 +1,1179 @@
-# Basic test placeholder
\ No newline at end of file
+# Backend tests
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'app')
+sys.path.insert(0, APP_DIR)
+
+import main  # noqa: E402
+from main import Option, Question, Quiz, QuizAttempt, QuizSession, User  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def plan_engine():
+    """Empty in-memory database with the current schema, used only for EXPLAIN"""
+    engine = create_engine('sqlite://')
+    main.db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def api(tmp_path):
+    """App on a fresh SQLite database, its test client and lecturer/student auth headers"""
+    app = main.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'quizgenix.db'}",
+        'JOB_RESULTS_DIR': str(tmp_path / 'job_results'),
+        'EXPORT_CACHE_DIR': str(tmp_path / 'export_cache'),
+        'SESSION_STORE_PATH': str(tmp_path / 'quiz_sessions.db'),
+        'LOG_LEVEL': 'WARNING'
+    })
+    with app.app_context():
+        main.init_db()
+    client = app.test_client()
+
+    def login(email):
+        response = client.post('/api/login', json={'email': email, 'password': 'password123'})
+        return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+    yield app, client, login('lecturer@test.com'), login('student@test.com')
+    with app.app_context():
+        main.db.engine.dispose()
+
+
+def create_quiz(client, headers, question_count=4):
+    response = client.post('/api/quiz', headers=headers, json={
+        'title': 'Functions', 'subject': 'javascript', 'topic': 'function', 'difficulty': 'easy',
+        'questionCount': question_count
+    })
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def explain(engine, statement):
+    compiled = statement.compile(dialect=engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return [row[-1] for row in rows]
+
+
+ENDPOINT_QUERIES = {
+    'start_quiz': lambda: select(QuizSession).filter_by(user_id=1, quiz_id=1, is_active=True),
+    'submit_answer': lambda: select(QuizSession).filter_by(session_token='token', is_active=True),
+    'get_quiz_attempts': lambda: (select(QuizAttempt.id, QuizAttempt.percentage, User.name, User.email)
+                                  .join(User, User.id == QuizAttempt.user_id)
+                                  .where(QuizAttempt.quiz_id == 1)
+                                  .order_by(QuizAttempt.completed_at.desc(), QuizAttempt.id.desc())
+                                  .limit(51)),
+    'get_my_results': lambda: (select(QuizAttempt.id, QuizAttempt.percentage, QuizAttempt.grade, Quiz.title)
+                               .join(Quiz, Quiz.id == QuizAttempt.quiz_id)
+                               .where(QuizAttempt.user_id == 1)
+                               .order_by(QuizAttempt.completed_at.desc(), QuizAttempt.id.desc())
+                               .limit(21)),
+    'get_quizzes': lambda: (select(Quiz.id, Quiz.created_at)
+                            .where(Quiz.user_id == 1)
+                            .order_by(Quiz.created_at.desc(), Quiz.id.desc())),
+    'load_quiz_questions': lambda: (select(Question.id, Question.position, Question.text)
+                                    .where(Question.quiz_id == 1)
+                                    .order_by(Question.position)),
+    'load_quiz_options': lambda: (select(Option.question_id, Option.text)
+                                  .join(Question, Option.question_id == Question.id)
+                                  .where(Question.quiz_id == 1)
+                                  .order_by(Option.question_id, Option.position)),
+    'regrade_quiz_attempts': lambda: (select(QuizAttempt.id, QuizAttempt.answers)
+                                      .where(QuizAttempt.quiz_id == 1, QuizAttempt.id > 0)
+                                      .order_by(QuizAttempt.id)
+                                      .limit(1000)),
+}
+
+
+@pytest.mark.parametrize('endpoint', sorted(ENDPOINT_QUERIES))
+def test_endpoint_queries_use_indexes(plan_engine, endpoint):
+    plan = explain(plan_engine, ENDPOINT_QUERIES[endpoint]())
+
+    assert plan, f'{endpoint}: empty query plan'
+    for detail in plan:
+        if detail.startswith('SCAN'):
+            pytest.fail(f'{endpoint}: table scan in query plan: {plan}')
+    assert any('USING' in detail and 'INDEX' in detail for detail in plan), plan
+
+
+def test_quiz_listing_needs_no_sort_step(plan_engine):
+    plan = explain(plan_engine, ENDPOINT_QUERIES['get_quizzes']())
+
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_regrade_scan_needs_no_sort_step(plan_engine):
+    plan = explain(plan_engine, ENDPOINT_QUERIES['regrade_quiz_attempts']())
+
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_results_history_needs_no_sort_step(plan_engine):
+    plan = explain(plan_engine, ENDPOINT_QUERIES['get_my_results']())
+
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_quiz_attempts_need_no_sort_step(plan_engine):
+    plan = explain(plan_engine, ENDPOINT_QUERIES['get_quiz_attempts']())
+
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+# Cold-start budget for `import main`: the recorded baseline (median of ten
+# `python -X importtime` runs with the lazy exporters) plus a tolerance.
+# Re-record the baseline when startup work changes; override it on slow machines.
+IMPORT_TIME_BASELINE_MS = int(os.environ.get('IMPORT_TIME_BASELINE_MS', 600))
+IMPORT_TIME_TOLERANCE = float(os.environ.get('IMPORT_TIME_TOLERANCE', 1.5))
+IMPORT_TIME_BUDGET_MS = IMPORT_TIME_BASELINE_MS * IMPORT_TIME_TOLERANCE
+LAZY_MODULES = ('fpdf', 'docx', 'openpyxl', 'pandas')
+
+
+@pytest.fixture(scope='module')
+def import_profile():
+    """Cumulative import time in microseconds per module, from `python -X importtime -c "import main"`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_exporter_dependencies_are_imported_lazily(import_profile):
+    eager = sorted({name.split('.')[0] for name in import_profile} & set(LAZY_MODULES))
+
+    assert not eager, f'imported at startup: {eager}'
+
+
+def test_cold_import_within_budget(import_profile):
+    elapsed_ms = import_profile['main'] / 1000
+
+    assert elapsed_ms < IMPORT_TIME_BUDGET_MS, (
+        f'import main took {elapsed_ms:.0f} ms, over {IMPORT_TIME_TOLERANCE}x the {IMPORT_TIME_BASELINE_MS} ms baseline')
+
+
+def test_histogram_exposition_is_cumulative():
+    from metrics import Registry
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, route='/api/quiz')
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/api/quiz",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/api/quiz",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/quiz",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/api/quiz"} 4' in lines
+
+
+def test_lifecycle_benchmark_runs_in_process(tmp_path):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+    import quiz_lifecycle
+
+    args = quiz_lifecycle.parse_args([
+        '--students', '2', '--lecturers', '1', '--rounds', '1', '--quizzes', '1',
+        '--questions', '3', '--formats', 'xlsx', '--output', str(tmp_path / 'results.json')
+    ])
+    report = quiz_lifecycle.run_benchmark(args)
+
+    assert report['lifecycles'] == 2
+    assert {'start_quiz', 'submit_answer', 'submit_quiz', 'create_quiz', 'download_quiz'} <= set(report['operations'])
+    assert not any(stats['errors'] for stats in report['operations'].values())
+    assert report['sqlite']['write_statements'] > 0
+    assert quiz_lifecycle.compare(report, report, tolerance=0.25) == []
+
+
+@pytest.fixture(params=['memory', 'local-shared'])
+def session_store_backend(request, tmp_path):
+    from session_store import create_session_store
+
+    evicted = []
+    store = create_session_store(request.param, path=str(tmp_path / 'sessions.db'),
+                                 on_evict=lambda token, state: evicted.append((token, dict(state.answers))))
+    return store, evicted
+
+
+def test_session_store_records_answers(session_store_backend):
+    import time
+    store, _ = session_store_backend
+    store.start('token', {'1': 0}, 1, time.time() + 60)
+
+    state = store.record_answer('token', 2, 3)
+    assert state.answers == {'1': 0, '2': 3}
+    assert state.current_question == 2
+    assert state.pending_writes == 1
+    assert store.record_answer('unknown', 1, 0) is None
+
+    store.mark_checkpointed('token')
+    assert store.get('token').pending_writes == 0
+    store.discard('token')
+    assert store.get('token') is None
+
+
+def test_session_store_evicts_expired_sessions_with_pending_answers(session_store_backend):
+    import time
+    store, evicted = session_store_backend
+    store.start('expired', {}, 0, time.time() - 1)
+    store.record_answer('expired', 1, 2)
+    store.start('checkpointed', {'1': 1}, 1, time.time() - 1)
+    store.start('live', {}, 0, time.time() + 60)
+
+    store._next_sweep = 0
+    store.record_answer('live', 1, 0)
+
+    assert evicted == [('expired', {'1': 2})]
+    assert store.get('expired') is None and store.get('checkpointed') is None
+    assert store.get('live').answers == {'1': 0}
+
+
+def test_checkpoints_merge_answers_held_by_other_processes(api):
+    app, client, _, student = api
+    quiz = create_quiz(client, api[2])
+    started = client.post(f"/api/quiz/{quiz['id']}/start", headers=student).get_json()
+    token = started['session_token']
+    first, second = [question['id'] for question in started['quiz']['questions'][:2]]
+
+    with app.test_request_context():
+        # Two processes each checkpoint the answer they hold; neither overwrites the other
+        main.checkpoint_session(token, main.session_store.start(token, {str(first): 1}, first, 2e9))
+        main.checkpoint_session(token, main.session_store.start(token, {str(second): 2}, second, 2e9))
+        row = main.QuizSession.query.filter_by(session_token=token).one()
+        assert json.loads(row.answers_so_far) == {str(first): 1, str(second): 2}
+
+        # A request that finds no state in the store rebuilds it from the row and checkpoints at once
+        main.session_store.discard(token)
+    response = client.post(f'/api/quiz/session/{token}/answer', json={'question_id': first, 'answer': 3})
+    assert response.get_json()['total_answered'] == 2
+    with app.app_context():
+        row = main.QuizSession.query.filter_by(session_token=token).one()
+        assert json.loads(row.answers_so_far) == {str(first): 3, str(second): 2}
+
+
+def wait_for_status(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        main.db.session.expire_all()
+        job = main.db.session.get(main.Job, job_id)
+        if job.status == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} never became {status}')
+
+
+def test_job_leases_keep_running_jobs_from_being_reclaimed(api):
+    from job_queue import JobQueue
+    app = api[0]
+    queue = JobQueue(app, main.db, main.Job, workers=2, lease_seconds=0.3)
+    release = threading.Event()
+    runs = []
+
+    @queue.handler('slow')
+    def slow(payload, user_id):
+        runs.append(threading.get_ident())
+        release.wait(5)
+        return {'ok': True}
+
+    with app.app_context():
+        job_id = queue.submit('slow', 1, {})
+        claim = wait_for_status(queue, job_id, 'running').claimed_by
+        time.sleep(1)  # several lease periods; the heartbeat keeps renewing
+
+        queue.recover()
+        assert wait_for_status(queue, job_id, 'running').claimed_by == claim
+
+        # The owner dies: renewals stop and the lease runs out
+        queue._heartbeat_stop.set()
+        main.db.session.execute(main.db.update(main.Job).where(main.Job.id == job_id).values(
+            lease_expires_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)))
+        main.db.session.commit()
+        queue.recover()
+        deadline = time.monotonic() + 5
+        while len(runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(runs) == 2
+
+        # Only the current claimant records the outcome
+        release.set()
+        job = queue.wait(job_id, 5)
+        assert job.status == 'succeeded'
+        assert job.claimed_by != claim
+
+
+def test_new_worker_leaves_siblings_running_jobs_alone(api):
+    app = api[0]
+    with app.app_context():
+        main.db.session.add(main.Job(
+            id='sibling', user_id=1, kind='generate_quiz', status='running', payload='{}',
+            started_at=datetime.datetime.utcnow() - datetime.timedelta(hours=1), claimed_by='other-worker',
+            lease_expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=60)
+        ))
+        main.db.session.commit()
+
+    main.init_worker(app)  # e.g. a worker recycled after max_requests
+
+    with app.app_context():
+        job = main.db.session.get(main.Job, 'sibling')
+        assert (job.status, job.claimed_by) == ('running', 'other-worker')
+
+
+def take_quiz(client, headers, quiz_id, answer=0):
+    started = client.post(f'/api/quiz/{quiz_id}/start', headers=headers).get_json()
+    token = started['session_token']
+    for question in started['quiz']['questions']:
+        client.post(f'/api/quiz/session/{token}/answer', json={'question_id': question['id'], 'answer': answer})
+    return client.post(f'/api/quiz/session/{token}/submit').get_json()['results']
+
+
+def count_statements(app):
+    statements = []
+    with app.app_context():
+        engine = main.db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    main.db.event.listen(engine, 'before_cursor_execute', listener)
+    return statements, lambda: main.db.event.remove(engine, 'before_cursor_execute', listener)
+
+
+def test_quiz_attempts_are_paged_with_a_fixed_number_of_queries(api):
+    app, client, lecturer, student = api
+    quiz = create_quiz(client, lecturer)
+    for answer in (0, 1, 2):
+        take_quiz(client, student, quiz['id'], answer)
+
+    statements, stop = count_statements(app)
+    first = client.get(f"/api/quiz/{quiz['id']}/attempts?limit=2", headers=lecturer).get_json()
+    first_page_statements = len(statements)
+    second = client.get(f"/api/quiz/{quiz['id']}/attempts?limit=2&cursor={first['next_cursor']}",
+                        headers=lecturer).get_json()
+    stop()
+
+    assert first['total_attempts'] == 3 and first['has_more'] and not second['has_more']
+    attempts = first['attempts'] + second['attempts']
+    assert [attempt['id'] for attempt in attempts] == sorted((attempt['id'] for attempt in attempts), reverse=True)
+    assert {attempt['student_name'] for attempt in attempts} == {'Test Student'}
+    assert all(attempt['grade'] for attempt in attempts)
+    assert 'stats' not in first
+    # Ownership check, the page itself and the stored attempt count, however many attempts there are
+    assert first_page_statements == 3
+    assert len(statements) == 2 * first_page_statements
+
+
+def test_reads_never_write_and_legacy_blobs_migrate_at_startup(api):
+    app, client, lecturer, _ = api
+    quiz = create_quiz(client, lecturer)
+    legacy_questions = [{'id': 1, 'question': 'Legacy?', 'options': ['yes', 'no'], 'correct_answer': 0}]
+    with app.app_context():
+        assert main.db.session.query(Quiz.questions).filter_by(id=quiz['id']).scalar() is None
+        legacy = Quiz(user_id=1, title='Legacy', subject='math', topic='algebra', difficulty='easy',
+                      questions=json.dumps(legacy_questions), question_count=0)
+        main.db.session.add(legacy)
+        main.db.session.commit()
+        legacy_id = legacy.id
+
+    statements, stop = count_statements(app)
+    for quiz_id in (quiz['id'], legacy_id):
+        assert client.get(f'/api/quiz/{quiz_id}', headers=lecturer).status_code == 200
+        assert client.get(f'/api/quiz/{quiz_id}/download/xlsx', headers=lecturer).status_code == 200
+    stop()
+    assert not [s for s in statements if s.lstrip().split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+
+    with app.app_context():
+        main.init_db()
+        assert main.load_quiz_questions(legacy_id)[0]['question'] == 'Legacy?'
+        assert main.db.session.query(Quiz.questions).filter_by(id=legacy_id).scalar() is None
+
+
+def test_upgrade_relaxes_legacy_not_null_questions_column(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    main.db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'quiz'").scalar()
+        conn.exec_driver_sql('DROP TABLE quiz')
+        conn.exec_driver_sql(ddl.replace('questions TEXT,', 'questions TEXT NOT NULL,'))
+        conn.exec_driver_sql("INSERT INTO quiz (user_id, title, subject, topic, difficulty, questions) "
+                             "VALUES (1, 'Legacy', 'math', 'algebra', 'easy', '[]')")
+    engine.dispose()
+
+    app = main.create_app({'SQLALCHEMY_DATABASE_URI': url, 'JOB_RESULTS_DIR': str(tmp_path / 'job_results'),
+                           'EXPORT_CACHE_DIR': str(tmp_path / 'export_cache'),
+                           'SESSION_STORE_PATH': str(tmp_path / 'quiz_sessions.db'), 'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        main.init_db()
+        columns = {column['name']: column for column in main.db.inspect(main.db.engine).get_columns('quiz')}
+        assert columns['questions']['nullable']
+        assert {index.name for index in Quiz.__table__.indexes} <= {
+            index['name'] for index in main.db.inspect(main.db.engine).get_indexes('quiz')}
+        assert main.db.session.query(Quiz.title).scalar() == 'Legacy'
+        main.db.engine.dispose()
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'email': 'lecturer@test.com', 'password': 'password123'}).get_json()['token']
+    create_quiz(client, {'Authorization': 'Bearer ' + token})
+
+
+def old_loop_score(questions, user_answers):
+    """Scoring as submit_quiz did it before answer keys: a per-question equality check"""
+    return sum(user_answers.get(str(question['id'])) == question['correct_answer'] for question in questions)
+
+
+ANSWER_VALUES = [
+    0, 1, 2, 3,                                     # in range
+    True, False, 1.0, 2.0, 1.5, -0.0,               # bool and float
+    '1', '0', 'B', '', None, [1], {'answer': 1},    # str, null and other JSON values
+    -1, 4, 32767, 32768, 2 ** 40, -2 ** 40,         # out-of-range indices
+    1e300, float('inf'), float('nan'),
+]
+
+
+def test_answer_key_scores_like_the_per_question_loop():
+    from grading import AnswerKey
+
+    questions = [{'id': position, 'correct_answer': position % 4} for position in range(1, 9)]
+    key = AnswerKey([q['id'] for q in questions], [q['correct_answer'] for q in questions])
+
+    submissions = []
+    for offset in range(len(ANSWER_VALUES)):
+        answers = {str(q['id']): ANSWER_VALUES[(offset + index) % len(ANSWER_VALUES)]
+                   for index, q in enumerate(questions)}
+        submissions.append(answers)
+        for question in questions:
+            # every value against every question, alone
+            single = {str(question['id']): ANSWER_VALUES[offset]}
+            assert key.score(single)[0] == old_loop_score(questions, single), single
+    submissions.append({})                                       # nothing answered
+    submissions.append({'1': 1, '99': 0, 'x': 2})                # partial, with unknown question ids
+    submissions.append({str(q['id']): q['correct_answer'] for q in questions})
+
+    expected = [old_loop_score(questions, answers) for answers in submissions]
+    assert [key.score(answers)[0] for answers in submissions] == expected
+    assert key.score_many(submissions).tolist() == expected
+    assert expected[-1] == len(questions)
+
+
+def test_answer_key_mask_matches_the_per_question_loop():
+    from grading import AnswerKey
+
+    questions = [{'id': 1, 'correct_answer': 1}, {'id': 2, 'correct_answer': 0}, {'id': 3, 'correct_answer': 3}]
+    key = AnswerKey([1, 2, 3], [1, 0, 3])
+    answers = {'1': True, '2': False, '3': 3.0}
+
+    score, mask = key.score(answers)
+    assert mask.tolist() == [answers.get(str(q['id'])) == q['correct_answer'] for q in questions] == [True] * 3
+    assert score == 3
+    _, mask = key.score({'1': '1', '3': 7})
+    assert mask.tolist() == [False, False, False]
+
+
+def test_regrade_rescores_attempts_and_rebuilds_stats(api):
+    app, client, lecturer, student = api
+    quiz = create_quiz(client, lecturer)
+    for answer in (0, 1, 2, 3):
+        take_quiz(client, student, quiz['id'], answer)
+    with app.app_context():
+        questions = main.load_quiz_questions(quiz['id'])
+    first = questions[0]
+    corrected_answer = (first['correct_answer'] + 1) % len(first['options'])
+
+    for bad in ({'99': 0}, {str(first['id']): len(first['options'])}, {str(first['id']): '1'}):
+        response = client.post(f"/api/quiz/{quiz['id']}/regrade", headers=lecturer, json={'corrections': bad})
+        assert response.status_code == 400, bad
+    response = client.post(f"/api/quiz/{quiz['id']}/regrade", headers=lecturer,
+                           json={'corrections': {str(first['id']): corrected_answer}, 'chunk_size': 3})
+    assert response.status_code == 202 and response.get_json()['corrected_questions'] == 1
+    job = client.get(response.get_json()['status_url'] + '?wait=10', headers=lecturer).get_json()
+    assert job['status'] == 'succeeded', job
+    result = client.get(f"/api/jobs/{job['job_id']}/result", headers=lecturer).get_json()
+
+    first['correct_answer'] = corrected_answer
+    expected_scores = [old_loop_score(questions, {str(q['id']): answer for q in questions}) for answer in (0, 1, 2, 3)]
+    with app.app_context():
+        attempts = (main.db.session.query(QuizAttempt.score, QuizAttempt.percentage, QuizAttempt.grade)
+                    .filter_by(quiz_id=quiz['id']).order_by(QuizAttempt.id).all())
+    assert [attempt.score for attempt in attempts] == expected_scores
+    assert [(attempt.percentage, attempt.grade) for attempt in attempts] == [
+        main.attempt_grade(score, len(questions)) for score in expected_scores]
+    assert result['attempts'] == 4 and result['changed'] == 2  # the attempts that chose the old and new answer
+
+    stats = client.get(f"/api/quiz/{quiz['id']}/stats", headers=lecturer).get_json()
+    assert stats['attempt_count'] == 4
+    assert stats['mean_score'] == round(sum(expected_scores) / 4, 2)
+    assert {bucket['score']: bucket['count'] for bucket in stats['score_distribution'] if bucket['count']} == {
+        score: expected_scores.count(score) for score in set(expected_scores)}
+    assert [question['correct_count'] for question in stats['questions']] == [1] * len(questions)
+
+
+def test_item_analysis_matches_hand_computed_statistics():
+    import numpy as np
+    from grading import UNANSWERED, AnswerKey
+    from item_analysis import ItemAnalysis
+
+    key = AnswerKey([1, 2, 3], [0, 1, 2])
+    # Correctness per attempt: 111, 110, 100, 010, 000 -> total scores 3, 2, 1, 1, 0
+    encoded = key.encode_many([
+        {'1': 0, '2': 1, '3': 2},
+        {'1': 0, '2': 1, '3': 3},
+        {'1': 0, '2': 2},
+        {'1': 1, '2': 1, '3': 0},
+        {'1': 2, '2': 0, '3': 1},
+    ])
+    assert encoded[2, 2] == UNANSWERED
+    analysis = ItemAnalysis(key, [4, 4, 4])
+    analysis.add(encoded[:2])
+    analysis.add(encoded[2:])  # folding in chunks gives the same sums as one batch
+    result = analysis.result()
+
+    # p = (0.6, 0.6, 0.2); score variance = 15/5 - 1.4^2 = 1.04
+    # KR-20 = 3/2 * (1 - (0.24 + 0.24 + 0.16) / 1.04) = 0.5769
+    assert result['attempt_count'] == 5
+    assert result['mean_score'] == 1.4
+    assert result['reliability_kr20'] == 0.577
+    assert [q['p_value'] for q in result['questions']] == [0.6, 0.6, 0.2]
+    # Point-biserial against the rest score, e.g. question 1: x = 11100, rest = 21010,
+    # cov = 0.12, var(x) = 0.24, var(rest) = 0.56 -> 0.12 / sqrt(0.24 * 0.56) = 0.3273
+    assert [q['discrimination'] for q in result['questions']] == [0.327, 0.327, 0.535]
+
+    first = result['questions'][0]
+    assert [option['count'] for option in first['options']] == [3, 1, 1, 0]
+    assert [option['dead_distractor'] for option in first['options']] == [False, False, False, True]
+    assert 'dead_distractors' in first['flags']
+    assert result['questions'][2]['unanswered_rate'] == 0.2
+
+    # Same statistics straight from the full matrices
+    correct = key.grade(encoded).astype(float)
+    rest = correct.sum(axis=1, keepdims=True) - correct
+    for j, question in enumerate(result['questions']):
+        assert question['discrimination'] == round(np.corrcoef(correct[:, j], rest[:, j])[0, 1], 3)
+
+
+def test_item_analysis_leaves_undefined_statistics_empty():
+    from grading import AnswerKey
+    from item_analysis import ItemAnalysis
+
+    key = AnswerKey([1, 2], [0, 0])
+    analysis = ItemAnalysis(key, [2, 2])
+    assert analysis.result()['reliability_kr20'] is None
+
+    analysis.add(key.encode_many([{'1': 0, '2': 0}, {'1': 0, '2': 0}]))  # no score variance
+    result = analysis.result()
+    assert result['reliability_kr20'] is None
+    assert [q['discrimination'] for q in result['questions']] == [None, None]
+    assert result['questions'][0]['flags'] == ['too_easy', 'dead_distractors']
+
+
+@pytest.fixture
+def token_clock(monkeypatch):
+    """Fake clock for TokenCache: a one-item list holding the current time"""
+    import types
+    import auth
+
+    clock = [1000.0]
+    monkeypatch.setattr(auth, 'time', types.SimpleNamespace(time=lambda: clock[0]))
+    return clock
+
+
+def test_token_cache_reverifies_after_exp_and_max_ttl(token_clock):
+    from auth import Principal, TokenCache
+
+    decoded = []
+    claims = {'short': {'user_id': 1, 'exp': 1010}, 'long': {'user_id': 2, 'exp': 10 ** 9}}
+    cache = TokenCache(lambda token: decoded.append(token) or claims[token], max_ttl=60)
+    roles = {1: 'student', 2: 'student'}
+    load = lambda claims: Principal(claims['user_id'], roles[claims['user_id']])  # noqa: E731
+
+    assert cache.get('short', load) == Principal(1, 'student')
+    assert cache.get('long', load) == Principal(2, 'student')
+    assert decoded == ['short', 'long']
+
+    roles[2] = 'lecturer'
+    token_clock[0] = 1009.9
+    assert cache.get('short', load) == Principal(1, 'student')
+    assert cache.get('long', load) == Principal(2, 'student')  # cached until max_ttl
+    assert decoded == ['short', 'long']
+
+    token_clock[0] = 1010  # the token's exp
+    cache.get('short', load)
+    assert decoded == ['short', 'long', 'short']
+
+    token_clock[0] = 1060  # max_ttl after the long-lived token was cached
+    assert cache.get('long', load) == Principal(2, 'lecturer')
+    assert decoded == ['short', 'long', 'short', 'long']
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_token_cache_invalidates_one_users_tokens(token_clock):
+    from auth import Principal, TokenCache
+
+    decoded = []
+    cache = TokenCache(lambda token: decoded.append(token) or {'user_id': int(token[0]), 'exp': 2000}, maxsize=3)
+    load = lambda claims: Principal(claims['user_id'], 'student')  # noqa: E731
+    for token in ('1a', '1b', '2a'):
+        cache.get(token, load)
+
+    cache.invalidate_user(1)
+    for token in ('1a', '1b', '2a'):
+        cache.get(token, load)
+    assert decoded == ['1a', '1b', '2a', '1a', '1b']
+
+    cache.get('3a', load)  # over maxsize: the least recently used token ('1a') goes
+    cache.get('2a', load)
+    cache.get('1a', load)
+    assert decoded[-2:] == ['3a', '1a']
+
+
+def test_token_cache_does_not_keep_rejected_tokens(token_clock):
+    from auth import TokenCache
+
+    def decode(token):
+        if token == 'forged':
+            raise ValueError('bad signature')
+        return {'user_id': 9, 'exp': 2000}
+
+    cache = TokenCache(decode)
+    with pytest.raises(ValueError):
+        cache.get('forged', lambda claims: claims)
+    assert cache.get('deleted-user', lambda claims: None) is None
+    assert cache.get('deleted-user', lambda claims: 'now exists') == 'now exists'
+    assert cache.misses == 3 and cache.hits == 0
+
+
+def test_downloads_revalidate_with_etags_and_change_after_an_edit(api, monkeypatch):
+    app, client, lecturer, _ = api
+    quiz = create_quiz(client, lecturer)
+    url = f"/api/quiz/{quiz['id']}/download/xlsx"
+    renders = []
+    xlsx = main.EXPORT_ENGINE._formats['xlsx']
+    monkeypatch.setattr(xlsx, 'render', lambda *args, render=xlsx.render: renders.append(1) or render(*args))
+
+    first = client.get(url, headers=lecturer)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+    revalidated = client.get(url, headers={**lecturer, 'If-None-Match': etag})
+    assert revalidated.status_code == 304 and not revalidated.data and revalidated.headers['ETag'] == etag
+    assert client.get(url, headers=lecturer).data == first.data
+    assert len(renders) == 1
+
+    with app.app_context():
+        question = main.load_quiz_questions(quiz['id'])[0]
+    corrected = (question['correct_answer'] + 1) % len(question['options'])
+    response = client.post(f"/api/quiz/{quiz['id']}/regrade", headers=lecturer,
+                           json={'corrections': {str(question['id']): corrected}})
+    assert response.status_code == 202
+
+    edited = client.get(url, headers={**lecturer, 'If-None-Match': etag})
+    assert edited.status_code == 200 and edited.headers['ETag'] != etag
+    assert edited.data != first.data
+    assert len(renders) == 2
+    assert client.get(url, headers={**lecturer, 'If-None-Match': edited.headers['ETag']}).status_code == 304
+
+
+def test_spreadsheet_keeps_answers_that_name_no_option():
+    import io
+    openpyxl = pytest.importorskip('openpyxl')
+    from export_engine import EXPORT_ENGINE
+    from file_service import FileService
+
+    options = ['Nucleus', 'Ribosome', 'Golgi', 'Lysosome']
+    document = FileService()._document({'title': 'Cells', 'subject': 'biology', 'difficulty': 'easy', 'questions': [
+        {'question': 'By index', 'options': options, 'correct_answer': 1},
+        {'question': 'By option text', 'options': options, 'correct_answer': 'Golgi'},
+        {'question': 'By other text', 'options': options, 'correct_answer': 'Mitochondria'},
+        {'question': 'Out of range', 'options': options, 'correct_answer': 7},
+    ]})
+    sheet = openpyxl.load_workbook(io.BytesIO(EXPORT_ENGINE.render_bytes('xlsx', document))).active
+
+    answers = [row[6] for row in sheet.iter_rows(min_row=2, values_only=True)]
+    assert answers == ['B', 'C', 'Mitochondria', None]  # openpyxl reads the blank cell back as None
+
+
+def test_upgrade_drops_obsolete_indexes(api):
+    app, *_ = api
+    with app.app_context():
+        for name in main.OBSOLETE_INDEXES:
+            main.db.session.execute(main.db.text(f'CREATE INDEX {name} ON quiz_session (session_token)'))
+        main.db.session.commit()
+        main.init_db()
+
+        existing = {index['name'] for table in ('quiz_attempt', 'quiz_session')
+                    for index in main.db.inspect(main.db.engine).get_indexes(table)}
+    assert not existing & set(main.OBSOLETE_INDEXES)
+
+
+def test_quiz_batch_reports_each_item_and_commits_once(api):
+    app, client, lecturer, _ = api
+    spec = {'title': 'Batch', 'subject': 'math', 'topic': 'algebra', 'difficulty': 'easy', 'questionCount': 3}
+    specs = [
+        dict(spec, title='Batch 0'),
+        'not an object',
+        dict(spec, title='Batch 2'),
+        {'title': 'No subject', 'topic': 'algebra', 'difficulty': 'easy'},
+        dict(spec, title='Batch 4', questionCount='many'),  # fails during generation
+        dict(spec, title='Batch 5', questionCount=5),
+    ]
+    with app.app_context():
+        engine = main.db.engine
+    commits = []
+    listener = lambda conn: commits.append(1)  # noqa: E731
+    main.db.event.listen(engine, 'commit', listener)
+    statements, stop = count_statements(app)
+    try:
+        response = client.post('/api/quizzes/batch', headers=lecturer, json={'quizzes': specs})
+    finally:
+        stop()
+        main.db.event.remove(engine, 'commit', listener)
+
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert (body['created'], body['failed']) == (3, 3)
+    assert [result['index'] for result in body['results']] == list(range(len(specs)))
+    assert [result['status'] for result in body['results']] == [
+        'created', 'error', 'created', 'error', 'error', 'created']
+    assert body['results'][1]['error'] == 'Quiz spec must be an object'
+    assert body['results'][3]['error'] == 'Missing fields: subject'
+    assert 'many' in body['results'][4]['error']
+    assert [body['results'][i]['question_count'] for i in (0, 2, 5)] == [3, 3, 5]
+
+    # Every created quiz, its questions and its stats rows went in with a single commit
+    assert len(commits) == 1
+    assert sum(statement.lstrip().upper().startswith('INSERT INTO QUIZ ') for statement in statements) <= 3
+    with app.app_context():
+        for index in (0, 2, 5):
+            result = body['results'][index]
+            assert main.db.session.get(Quiz, result['id']).title == specs[index]['title']
+            assert len(main.load_quiz_questions(result['id'])) == result['question_count']
+        assert main.db.session.query(Quiz).filter(Quiz.title.like('Batch%')).count() == 3
+
+    too_many = client.post('/api/quizzes/batch', headers=lecturer, json={'quizzes': [spec] * 101})
+    assert too_many.status_code == 400
+    assert client.post('/api/quizzes/batch', headers=lecturer, json={'quizzes': []}).status_code == 400
+
+
+def test_bulk_export_streams_every_quiz_in_every_format(api):
+    import io
+    import zipfile
+    app, client, lecturer, _ = api
+    quizzes = [create_quiz(client, lecturer, question_count) for question_count in (2, 3, 4)]
+
+    response = client.get('/api/quizzes/export?formats=xlsx,docx', headers=lecturer)
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == sorted(
+            main.export_archive_name(quiz['id'], quiz['title'], format)
+            for quiz in quizzes for format in ('xlsx', 'docx'))
+        assert not any(name.endswith('.error.txt') for name in archive.namelist())
+
+    assert client.get('/api/quizzes/export?formats=xlsx,txt', headers=lecturer).status_code == 400
+
+
+def test_map_as_completed_bounds_calls_in_flight():
+    from concurrent.futures import ThreadPoolExecutor
+    from zip_stream import map_as_completed
+
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def work(item):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.005)
+        with lock:
+            running[0] -= 1
+        return item
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(map_as_completed(executor, work, range(40), max_in_flight=3))
+    assert sorted(results) == list(range(40))
+    assert 1 < peak[0] <= 3
+
+
+def test_map_as_completed_stops_work_when_closed_early():
+    from concurrent.futures import ThreadPoolExecutor
+    from zip_stream import map_as_completed
+
+    started = []
+    discarded = []
+
+    def work(item):
+        started.append(item)
+        time.sleep(0.01)
+        return item
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    results = map_as_completed(executor, work, range(20), max_in_flight=4, discard=discarded.append)
+    first = next(results)
+    results.close()
+    executor.shutdown(wait=True)
+
+    # Queued calls were cancelled; whatever had already run was handed to discard, never lost
+    assert first == 0
+    assert len(started) <= 5
+    assert sorted(started) == [first] + sorted(discarded)
+
+
+def write_topic(directory, topic_key, *questions, mtime_ns=None):
+    path = directory / f'{topic_key}.jsonl'
+    path.write_text(''.join(json.dumps(dict({'options': ['a', 'b', 'c', 'd'], 'correct': 0, 'explanation': '',
+                                             'difficulty': 'easy'}, question=question)) + '\n'
+                            for question in questions))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_knowledge_loader_reloads_changed_files(tmp_path):
+    from knowledge_loader import KnowledgeBaseLoader
+
+    loader = KnowledgeBaseLoader(str(tmp_path), check_interval=0)
+    write_topic(tmp_path, 'cells', 'What is a cell?', mtime_ns=10 ** 18)
+    assert [q.question for q in loader.sample('cells', 'easy', 5)] == ['What is a cell?']
+    first_store = loader.store('cells')
+    assert loader.store('cells') is first_store  # unchanged file: not decoded again
+
+    write_topic(tmp_path, 'cells', 'What is a cell?', 'What is DNA?', mtime_ns=10 ** 18)  # size changed
+    assert sorted(q.question for q in loader.sample('cells', 'easy', 5)) == ['What is DNA?', 'What is a cell?']
+
+    write_topic(tmp_path, 'cells', 'What is a gel?', 'What is RNA?', mtime_ns=10 ** 18 + 1)  # same size, new mtime
+    assert sorted(q.question for q in loader.sample('cells', 'easy', 5)) == ['What is RNA?', 'What is a gel?']
+
+    slow = KnowledgeBaseLoader(str(tmp_path), check_interval=3600)
+    slow.store('cells')
+    write_topic(tmp_path, 'cells', 'Changed', mtime_ns=10 ** 18 + 2)
+    assert [q.question for q in slow.sample('cells', 'easy', 5)] != ['Changed']  # not re-checked yet
+
+    (tmp_path / 'cells.jsonl').unlink()
+    assert loader.store('cells') is None
+    assert loader.sample('cells', 'easy', 5) == [] and len(loader.pool('cells', 'easy', None)) == 0
+    assert loader.store('../cells') is None and loader.store('') is None
+
+
+def test_knowledge_loader_keeps_last_good_content_of_malformed_files(tmp_path):
+    from knowledge_loader import KnowledgeBaseLoader
+
+    loader = KnowledgeBaseLoader(str(tmp_path), check_interval=0)
+    path = write_topic(tmp_path, 'cells', 'What is a cell?', mtime_ns=10 ** 18)
+    assert len(loader.sample('cells', 'easy', 5)) == 1
+
+    for broken in ('{"question": "truncated', '{"question": "no difficulty"}', '[1, 2]'):
+        path.write_text(path.read_text() + broken + '\n')
+        assert [q.question for q in loader.sample('cells', 'easy', 5)] == ['What is a cell?']
+
+    (tmp_path / 'broken.jsonl').write_text('not json\n')
+    assert loader.store('broken') is None
+    assert loader.sample('broken', 'easy', 5) == []
+
+
+def test_knowledge_loader_bounds_cached_topics(tmp_path):
+    from knowledge_loader import KnowledgeBaseLoader
+
+    for index in range(5):
+        write_topic(tmp_path, f'topic{index}', f'Question {index}?')
+    loader = KnowledgeBaseLoader(str(tmp_path), max_shards=2, check_interval=3600)
+    assert loader.topic_keys() == [f'topic{index}' for index in range(5)]
+
+    for topic_key in ('topic0', 'topic1', 'topic0', 'topic2', 'topic3', 'topic0', 'topic4'):
+        assert loader.store(topic_key) is not None
+        assert len(loader._shards) <= 2
+    assert list(loader._shards) == ['topic0', 'topic4']  # least recently used topics were evicted
+
+
+def linear_scan_pick(questions, keywords, used_ids):
+    """The pick the generator made before the index: first unused question whose text contains a keyword"""
+    for question in questions:
+        if question.qid not in used_ids and any(keyword in question.question.lower() for keyword in keywords):
+            return question
+    return None
+
+
+def synthetic_knowledge_base(seed=3):
+    import random
+    rng = random.Random(seed)
+    words = ['function', 'functions', 'call-back', 'array.map()', 'closure', 'scope', 'Hoisting', 'let', 'x',
+             'What', 'is', 'a', 'the', 'returns', '(arrow)', 'async/await', 'Promise']
+
+    def questions(count):
+        return [{'question': ' '.join(rng.choice(words) for _ in range(rng.randint(2, 7))) + '?',
+                 'options': ['a', 'b', 'c', 'd'], 'correct': 0, 'explanation': ''} for _ in range(count)]
+
+    return {'js': {'easy': questions(25), 'medium': {'closures': questions(12), 'promises': questions(9),
+                                                     'scope': questions(4)}}}
+
+
+def test_indexed_pick_matches_the_linear_scan():
+    import itertools
+    import random
+    from knowledge_loader import KnowledgeBaseLoader
+    from knowledge_store import KnowledgeStore
+
+    stores = [KnowledgeStore(synthetic_knowledge_base())]
+    shipped = KnowledgeBaseLoader()
+    stores += [shipped.store(topic_key) for topic_key in shipped.topic_keys()]
+    assert len(stores) > 1
+
+    rng = random.Random(11)
+    checked = 0
+    for store in stores:
+        for topic_key, difficulty in store._shards:
+            shard = store._shards[(topic_key, difficulty)]
+            for subtopic in (list(shard) if isinstance(shard, dict) else []) + [None]:
+                pool = store.pool(topic_key, difficulty, subtopic)
+                vocabulary = sorted({token for q in pool.questions for token in q.question.lower().split()})
+                keyword_sets = [[token] for token in vocabulary] + [
+                    [token[1:-1]] for token in vocabulary if len(token) > 2] + [
+                    ['nomatch'], ['function', 'nomatch'], ['?'], ['map()', 'let'], []]
+                qids = [q.qid for q in pool.questions]
+                used_sets = [set()] + [set(rng.sample(qids, rng.randint(1, len(qids)))) for _ in range(6)]
+                for keywords, used_ids in itertools.product(keyword_sets, used_sets):
+                    expected = linear_scan_pick(pool.questions, keywords, used_ids)
+                    picked = pool.pick(keywords, used_ids, rng=random.Random(0))
+                    if expected is not None:
+                        assert picked == expected, (keywords, used_ids)
+                    else:
+                        # No match: the random fallback still only offers unused questions
+                        assert picked is None if set(qids) <= used_ids else picked.qid not in used_ids
+                    checked += 1
+    assert checked > 1000
+
+
+def test_pick_falls_back_to_seeded_sampling_until_the_pool_is_exhausted():
+    import random
+    from knowledge_store import KnowledgeStore
+
+    store = KnowledgeStore(synthetic_knowledge_base())
+    pool = store.pool('js', 'medium', 'scope')  # 4 scope questions + 2 from each other subtopic
+    qids = [q.qid for q in pool.questions]
+    assert len(pool) == 8
+
+    def draw(seed, used_ids, count):
+        rng = random.Random(seed)
+        used_ids = set(used_ids)
+        picks = []
+        for _ in range(count):
+            picked = pool.pick(['nomatch'], used_ids, rng=rng)
+            picks.append(picked and picked.qid)
+            if picked is not None:
+                used_ids.add(picked.qid)
+        return picks
+
+    picks = draw(5, set(), count=11)  # more picks than the pool holds
+    assert sorted(picks[:8]) == sorted(qids) and picks[8:] == [None] * 3
+    assert draw(5, set(), count=11) == picks
+
+    excluded = set(qids[::2])
+    picks = draw(6, excluded, count=6)
+    assert sorted(picks[:4]) == sorted(set(qids) - excluded) and picks[4:] == [None, None]
+
+    # Every unused question can come first, about equally often
+    firsts = [draw(seed, set(), count=1)[0] for seed in range(4000)]
+    assert {qid: 350 < firsts.count(qid) < 650 for qid in qids} == {qid: True for qid in qids}
+
+
+# The substring-mapping cascade create_topic_key used before topic_resolver, kept as the reference
+OLD_TOPIC_MAPPINGS = [
+    (('function', 'javascript'), 'javascript_functions'),
+    (('function', 'computer'), 'javascript_functions'),
+    (('function', 'programming'), 'javascript_functions'),
+    (('javascript function', 'any'), 'javascript_functions'),
+    (('function', 'python'), 'python_functions'),
+    (('python function', 'any'), 'python_functions'),
+    (('def', 'python'), 'python_functions'),
+    (('algebra', 'math'), 'algebra_equations'),
+    (('equation', 'math'), 'algebra_equations'),
+    (('linear equation', 'any'), 'algebra_equations'),
+    (('quadratic', 'math'), 'algebra_equations'),
+    (('compound', 'chemistry'), 'chemistry_compounds'),
+    (('salt', 'chemistry'), 'chemistry_compounds'),
+    (('ionic', 'chemistry'), 'chemistry_compounds'),
+    (('chemical compound', 'any'), 'chemistry_compounds'),
+]
+
+
+def old_create_topic_key(topic, subject):
+    topic, subject = topic.lower(), subject.lower()
+    for (topic_term, subject_term), result in OLD_TOPIC_MAPPINGS:
+        if topic_term in topic and (subject_term == 'any' or subject_term in subject):
+            return result
+    if 'function' in topic:
+        if any(term in subject for term in ['javascript', 'js', 'computer', 'programming']):
+            return 'javascript_functions'
+        elif 'python' in subject:
+            return 'python_functions'
+    if any(term in topic for term in ['algebra', 'equation']):
+        return 'algebra_equations'
+    if any(term in topic for term in ['compound', 'chemistry', 'chemical']):
+        return 'chemistry_compounds'
+    return None
+
+
+@pytest.mark.parametrize('topic, subject, topic_key', [
+    ('javascript function', 'python', 'javascript_functions'),     # first-listed phrase beats the python rule
+    ('python function', 'javascript', 'javascript_functions'),     # ('function', 'javascript') is listed first
+    ('python function', 'biology', 'python_functions'),            # the longer phrase, any subject
+    ('functional programming', 'JS', 'javascript_functions'),      # substring of a word, fallback 'js'
+    ('def', 'python', 'python_functions'),
+    ('undefined behaviour', 'python', 'python_functions'),         # 'def' inside 'undefined'
+    ('linear equation', 'physics', 'algebra_equations'),
+    ('equation', 'chemistry', 'algebra_equations'),                # general fallback
+    ('chemical compound', 'math', 'chemistry_compounds'),
+    ('ionic salt', 'chemistry', 'chemistry_compounds'),
+    ('Algebraic Equation', 'Mathematics', 'algebra_equations'),
+    ('functions of a compound', 'chemistry', 'chemistry_compounds'),
+    ('function', 'Computer Science', 'javascript_functions'),
+    ('quadratic', 'applied maths', 'algebra_equations'),
+    ('chemistry', 'history', 'chemistry_compounds'),
+    ('function', 'biology', None),
+    ('photosynthesis', 'biology', None),
+    ('', '', None),
+])
+def test_topic_key_resolution_matches_the_old_mapping(topic, subject, topic_key):
+    assert main.create_topic_key(topic, subject) == topic_key
+    assert old_create_topic_key(topic, subject) == topic_key
+
+
+@pytest.mark.parametrize('topic, subject, domain', [
+    ('array functions', 'python', ('javascript', 'functions')),  # javascript listed first; first mapped subtopic
+    ('python list', 'programming', ('python', 'basics')),
+    ('random list', 'python', ('javascript', 'dom')),            # 'dom' inside 'random'
+    ('class', 'computer science', ('python', 'oop')),
+    ('derivative', 'math', ('mathematics', 'calculus')),
+    ('atom energy', 'physics', ('science', 'chemistry')),        # 'atom' is listed before 'energy'
+    ('cell', 'math', ('mathematics', 'arithmetic')),             # mathematics is checked before science
+    ('energy', 'javascript', ('science', 'physics')),            # 'javascript' only counts in the topic
+    ('Closure Scope', 'Programming', ('javascript', 'closures')),
+    ('object', 'science', ('javascript', 'objects')),
+    ('percentage', 'python', ('mathematics', 'arithmetic')),
+    ('history', 'computer', ('javascript', 'functions')),        # defaults by subject
+    ('history', 'maths', ('mathematics', 'arithmetic')),
+    ('history', 'art', ('science', 'chemistry')),
+    ('', '', ('science', 'chemistry')),
+])
+def test_domain_resolution_matches_the_old_mapping(topic, subject, domain):
+    assert main.determine_intelligent_domain(topic, subject) == domain
+
+
+def test_topic_key_resolution_matches_the_old_mapping_on_random_inputs():
+    import random
+    rng = random.Random(2024)
+    fragments = ['function', 'func', 'javascript', 'js', 'python', 'def', 'un', 'algebra', 'equation', 'linear',
+                 'quadratic', 'math', 'compound', 'chemical', 'chemistry', 'salt', 'ionic', 'computer',
+                 'programming', 'any', ' ', 'al', 'ic', 's']
+    for _ in range(20000):
+        topic = ''.join(rng.choice(fragments) for _ in range(rng.randint(0, 4)))
+        subject = ''.join(rng.choice(fragments) for _ in range(rng.randint(0, 3)))
+        assert main.create_topic_key(topic, subject) == old_create_topic_key(topic, subject), (topic, subject)
+
+
+def test_quiz_listing_walks_keyset_pages_and_projects_fields(api):
+    app, client, lecturer, _ = api
+    spec = {'subject': 'math', 'topic': 'algebra', 'difficulty': 'easy'}
+    response = client.post('/api/quizzes/batch', headers=lecturer, json={'quizzes': [
+        dict(spec, title=f'Quiz {index}', questionCount=index + 1) for index in range(7)]})
+    ids = [result['id'] for result in response.get_json()['results']]
+    tied = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    with app.app_context():
+        # Two groups of equal created_at values, so pages have to break ties on id
+        for index, quiz_id in enumerate(ids):
+            created_at = tied if index < 4 else tied + datetime.timedelta(seconds=1)
+            main.db.session.query(Quiz).filter_by(id=quiz_id).update({'created_at': created_at})
+        main.db.session.add(Quiz(user_id=2, title='Not mine', subject='math', topic='algebra', difficulty='easy',
+                                 created_at=tied))
+        main.db.session.commit()
+
+    pages = []
+    cursor = None
+    while True:
+        url = '/api/quizzes?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=lecturer).get_json()
+        pages.append([quiz['id'] for quiz in page['quizzes']])
+        cursor = page['next_cursor']
+        assert page['has_more'] == (cursor is not None)
+        if cursor is None:
+            break
+    assert pages == [ids[6:3:-1], ids[3:0:-1], ids[:1]]  # newest first, higher id first within a tie
+
+    statements, stop = count_statements(app)
+    listed = client.get('/api/quizzes?fields=id,question_count&limit=100', headers=lecturer).get_json()
+    stop()
+    assert [set(quiz) for quiz in listed['quizzes']] == [{'id', 'question_count'}] * 7
+    assert {quiz['id']: quiz['question_count'] for quiz in listed['quizzes']} == {
+        quiz_id: index + 1 for index, quiz_id in enumerate(ids)}
+    assert not any('FROM question' in statement or 'FROM option' in statement for statement in statements)
+
+    default = client.get('/api/quizzes?limit=1', headers=lecturer).get_json()['quizzes'][0]
+    assert set(default) == set(main.QUIZ_LIST_DEFAULT_FIELDS)
+    with_questions = client.get('/api/quizzes?fields=id,questions&limit=1', headers=lecturer).get_json()
+    assert len(with_questions['quizzes'][0]['questions']) == 7
+
+    for query in ('fields=id,answers', 'cursor=not-a-cursor', 'cursor=' + main.encode_keyset_cursor(tied, 1)[:-4],
+                  'limit=many'):
+        assert client.get(f'/api/quizzes?{query}', headers=lecturer).status_code == 400, query
+
+
+def sqlite_pragmas(app):
+    with app.app_context():
+        main.db.engine.dispose()  # the next connection is a new one, set up by the connect hook
+        with main.db.engine.connect() as conn:
+            return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+                    for name in ('journal_mode', 'busy_timeout', 'synchronous', 'mmap_size')}
+
+
+def test_new_sqlite_connections_get_the_configured_pragmas(api):
+    app, *_ = api
+
+    assert sqlite_pragmas(app) == {'journal_mode': 'wal', 'busy_timeout': 5000, 'synchronous': 1,
+                                   'mmap_size': 256 * 1024 * 1024}
+
+
+def test_sqlite_pragmas_follow_environment_overrides(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_JOURNAL_MODE', 'delete')
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'Full')
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '1234')
+    monkeypatch.setenv('SQLITE_MMAP_SIZE', '0')
+    app = main.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'env.db'}",
+                           'SESSION_STORE_PATH': str(tmp_path / 'quiz_sessions.db'), 'LOG_LEVEL': 'WARNING'})
+
+    assert sqlite_pragmas(app) == {'journal_mode': 'delete', 'busy_timeout': 1234, 'synchronous': 2,
+                                   'mmap_size': 0}
+    with app.app_context():
+        main.db.engine.dispose()
+
+
+def test_database_config_parses_environment_values():
+    from db_config import DEFAULT_DATABASE_URI, database_config
+
+    defaults = database_config({})
+    assert defaults['SQLALCHEMY_DATABASE_URI'] == DEFAULT_DATABASE_URI
+    assert defaults['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == 10
+    assert defaults['SQLITE_PRAGMAS'] == {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+                                          'mmap_size': 256 * 1024 * 1024}
+
+    config = database_config({'DATABASE_URL': 'postgres://db/quizgenix', 'DB_POOL_SIZE': '4',
+                              'DB_MAX_OVERFLOW': '', 'SQLITE_JOURNAL_MODE': ' wal '})
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'postgresql://db/quizgenix'
+    options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert (options['pool_size'], options['max_overflow'], options['pool_pre_ping']) == (4, 20, True)
+    assert 'connect_args' not in options
+    assert config['SQLITE_PRAGMAS']['journal_mode'] == 'WAL'
+    assert 'pool_size' not in database_config({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})['SQLALCHEMY_ENGINE_OPTIONS']
+
+    for name, value in (('DB_POOL_SIZE', 'ten'), ('SQLITE_BUSY_TIMEOUT_MS', '5s'), ('SQLITE_JOURNAL_MODE', 'bogus'),
+                        ('SQLITE_SYNCHRONOUS', 'NORMAL; DROP TABLE quiz')):
+        with pytest.raises(ValueError, match=name):
+            database_config({name: value})